@@ -6,15 +6,25 @@ import os
 import sys
 import json
 import time
+import uuid
 import threading
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from loguru import logger
 
-from app.utils.binance_trader import BinanceTrader
+from app.utils.binance_trader import BinanceTrader, symbol_base_asset
+from app.utils.client_pool import client_pool
+from app.utils.rate_governor import rate_governor
 from app.utils.config_manager import ConfigManager
+from app.utils.settings_schema import SettingsError
+from app.utils.alert_executor import AlertExecutor
+from app.utils.symbol_resolver import SymbolResolver
+from app.utils.position_registry import PositionRegistry
+from app.utils.trade_journal import TradeJournal
+from app.utils.metrics import CONTENT_TYPE, registry
+from app.utils.tracing import parse_timestamp, tracer
 
 # Load environment variables
 load_dotenv()
@@ -60,12 +70,16 @@ def before_request():
     protection_result = protect_sensitive_files()
     if protection_result:
         return protection_result
+    
+    # Consultations (tableau de bord) en priorité basse auprès de Binance, actions en priorité ordre
+    rate_governor.set_priority("dashboard" if request.method == "GET" else "order")
 
 # Initialize configuration manager
 config_manager = ConfigManager()
 
 # Initialize main components
 binance_trader = None
+symbol_resolver = None
 
 # Global variables
 last_alert = None
@@ -73,26 +87,82 @@ last_alert_time = None
 last_tweet = None
 last_tweet_time = None
 bot_running = False
-active_shorts = []  # List of active shorts
+active_shorts = PositionRegistry("positions.json")  # Active shorts, indexed by ID, asset and order
+trade_journal = TradeJournal("trade_journal.db")  # Loans, orders and repayments, appended before and after each call
 
 
 def initialize_components():
     """Initialize the main components of the application"""
-    global binance_trader, active_shorts
+    global binance_trader, symbol_resolver
     
     try:
         binance_trader = BinanceTrader(
             os.getenv("BINANCE_API_KEY"),
-            os.getenv("BINANCE_API_SECRET")
+            os.getenv("BINANCE_API_SECRET"),
+            journal=trade_journal
         )
         logger.info("Binance Trader component successfully initialized")
         
-        # Retrieve active short positions
+        # Open the keep-alive connections now so that no request pays a TLS handshake
+        if binance_trader.client:
+            try:
+                client_pool.warm(binance_trader.client)
+            except Exception as e:
+                logger.warning(f"Unable to pre-open Binance connections: {str(e)}")
+        
+        settings = config_manager.get_typed_settings()
+        
+        # Reload edits made directly to config.json
+        config_manager.watch(settings.config_watch_interval)
+        
+        # Build the asset index now so that resolving a tweet to a symbol never hits the API
+        symbol_resolver = SymbolResolver(
+            binance_trader.symbol_cache,
+            binance_trader.client,
+            quote_preference=settings.quote_preference,
+            account_assets=settings.account_assets
+        )
+        try:
+            symbol_resolver.rebuild()
+        except Exception as e:
+            logger.warning(f"Unable to build the symbol index: {str(e)}")
+        
+        # Keep balances and borrowed amounts in memory, updated by the account stream
+        if settings.account_stream_enabled:
+            try:
+                binance_trader.start_account_stream(resync_interval=settings.account_resync_interval)
+            except Exception as e:
+                logger.warning(f"Unable to start the account stream, balances will be read over REST: {str(e)}")
+        
+        # Keep every spot price in memory, updated by the all-market ticker stream
+        if settings.price_stream_enabled:
+            try:
+                binance_trader.start_price_stream(max_age=settings.price_max_age)
+            except Exception as e:
+                logger.warning(f"Unable to start the price stream, prices will be read over REST: {str(e)}")
+        
+        # Keep symbol filters, borrowable limits and balances fresh for the alert path
+        if settings.prewarm_enabled:
+            binance_trader.start_prewarm(
+                settings.prewarm_symbols or [settings.default_symbol],
+                interval=settings.prewarm_interval
+            )
+        
+        # Unwind the shorts interrupted between the loan and the sale by a crash
         try:
-            existing_shorts = binance_trader.get_active_shorts()
-            if existing_shorts:
+            recovered = binance_trader.recover_incomplete_shorts()
+            if recovered:
+                logger.warning(f"Recovered {len(recovered)} interrupted short(s) from the trade journal")
+        except Exception as e:
+            logger.error(f"Unable to recover interrupted shorts: {str(e)}")
+        
+        # Reconcile the registered positions with the ones open on the exchange
+        try:
+            with rate_governor.priority("maintenance"):
+                existing_shorts = binance_trader.get_active_shorts()
+            if existing_shorts is not None:
                 logger.info(f"Retrieved {len(existing_shorts)} active short positions")
-                active_shorts = existing_shorts
+                active_shorts.reconcile(existing_shorts)
         except Exception as e:
             logger.warning(f"Unable to retrieve active short positions: {str(e)}")
         
@@ -102,8 +172,66 @@ def initialize_components():
         return False
 
 
-def process_alert(alert_value, tweet_text=None):
-    """Process an alert received from the external script"""
+def on_settings_changed(settings, changed):
+    """Applique aux composants en cours les paramètres modifiés (API ou fichier)"""
+    if not binance_trader:
+        return
+    settings = config_manager.get_typed_settings()
+    if "price_max_age" in changed:
+        binance_trader.price_book.max_age = settings.price_max_age
+    if changed & {"prewarm_enabled", "prewarm_symbols", "prewarm_interval", "default_symbol"}:
+        if settings.prewarm_enabled:
+            binance_trader.start_prewarm(
+                settings.prewarm_symbols or [settings.default_symbol],
+                interval=settings.prewarm_interval
+            )
+        else:
+            binance_trader.stop_prewarm()
+    logger.info(f"Settings applied: {sorted(changed)}")
+
+
+config_manager.subscribe(on_settings_changed)
+
+
+def resolve_short_symbol(tweet_text=None, account=None, symbol=None):
+    """
+    Détermine le symbole à shorter: symbole explicite, sinon actif cité par le tweet ou
+    associé au compte source, sinon le symbole par défaut de la configuration
+    """
+    default_symbol = config_manager.get_typed_settings().default_symbol
+    if symbol:
+        return symbol.upper()
+    if symbol_resolver:
+        try:
+            started_at = time.perf_counter()
+            resolved = symbol_resolver.resolve(tweet_text, account)
+            elapsed_us = (time.perf_counter() - started_at) * 1e6
+            if resolved:
+                logger.info(f"Symbol resolved to {resolved[0]} from {resolved[2]} in {elapsed_us:.0f} µs")
+                return resolved[0]
+            logger.info(f"No tradeable asset found in the tweet, falling back to {default_symbol}")
+        except Exception as e:
+            logger.warning(f"Symbol resolution failed, falling back to {default_symbol}: {str(e)}")
+    return default_symbol
+
+
+def process_alert(alert_value, tweet_text=None, account=None, alert_id=None, tweet_created_at=None, received_at=None):
+    """
+    Process an alert received from the external script
+    
+    alert_id and tweet_created_at come with the scraper's webhook: every span measured
+    while handling the alert is attached to that alert and timed from the tweet.
+    """
+    with tracer.alert(alert_id, parse_timestamp(tweet_created_at)):
+        if received_at:
+            tracer.mark("alert_received", at=received_at)
+            tracer.record("alert_queue", time.time() - received_at)
+        with tracer.span("process_alert"):
+            return handle_alert(alert_value, tweet_text, account)
+
+
+def handle_alert(alert_value, tweet_text=None, account=None):
+    """Record the alert and place a short if it reports a hack"""
     global last_alert, last_alert_time, last_tweet, last_tweet_time
     
     logger.info(f"===== ALERT PROCESSING START =====")
@@ -132,16 +260,16 @@ def process_alert(alert_value, tweet_text=None):
             return True
         
         # Get current parameters
-        settings = config_manager.get_settings()
-        leverage = settings.get("leverage", 1)
+        settings = config_manager.get_typed_settings()
+        leverage = settings.leverage
         
         # Check if automated trading is enabled
-        if not settings.get("trading_enabled", False):
+        if not settings.trading_enabled:
             logger.warning("Automated trading disabled. No short will be placed.")
             return True
             
-        # Execute short order on BTC
-        logger.info(f"Trading enabled: {settings.get('trading_enabled', True)}")
+        # Execute short order on the hacked coin
+        logger.info(f"Trading enabled: {settings.trading_enabled}")
         if not binance_trader:
             logger.info("Binance Trader not initialized, attempting initialization")
             if not initialize_components():
@@ -149,18 +277,17 @@ def process_alert(alert_value, tweet_text=None):
                 return False
             logger.info("Binance Trader successfully initialized")
             
-        # Use BTC/USDC for margin trading
-        symbol = "BTCUSDC"
+        symbol = resolve_short_symbol(tweet_text, account)
         logger.info(f"===== PLACING A SHORT =====")
         logger.info(f"Symbol: {symbol}")
         logger.info(f"Leverage: {leverage}")
         
         try:
-            success, order_id = binance_trader.place_short_order(
+            success, order_id, quantity = binance_trader.place_short_order(
                 symbol=symbol,
                 leverage=leverage
             )
-            logger.info(f"Order placement result: success={success}, order_id={order_id}")
+            logger.info(f"Order placement result: success={success}, order_id={order_id}, quantity={quantity}")
         except Exception as e:
             import traceback
             logger.error(f"Exception during order placement: {str(e)}")
@@ -169,15 +296,16 @@ def process_alert(alert_value, tweet_text=None):
         
         if success and order_id:
             # Ajouter le short à la liste des shorts actifs
-            global active_shorts
-            short_info = {
-                "id": order_id,
-                "symbol": symbol,
-                "leverage": leverage,
-                "timestamp": datetime.now().isoformat(),
-                "tweet": tweet_text
-            }
-            active_shorts.append(short_info)
+            asset = symbol_base_asset(symbol)
+            short_info = active_shorts.open(
+                asset,
+                symbol,
+                order_id=order_id,
+                quantity=quantity,
+                entry_price=binance_trader.price_book.get(symbol),
+                leverage=leverage,
+                tweet=tweet_text
+            )
             
             logger.success(f"Short order successfully placed for {symbol} with leverage of {leverage}x (ID: {order_id})")
             logger.debug(f"Short added to the list of active shorts: {short_info}")
@@ -190,6 +318,40 @@ def process_alert(alert_value, tweet_text=None):
     return True
 
 
+# Alerts are acknowledged immediately and processed by a dedicated executor thread
+alert_executor = AlertExecutor(process_alert)
+alert_executor.start()
+
+# Metrics exported by /metrics; the gauges are only read when Prometheus scrapes
+ALERTS_RECEIVED = registry.counter(
+    "alerts_received_total", "Alertes reçues, par origine (webhook, manual) et type (hack, other)", ("source", "kind")
+)
+registry.gauge("alert_queue_depth", "Alertes en attente d'exécution", alert_executor.queue_depth)
+registry.gauge("trade_journal_pending", "Événements du journal en attente d'écriture", lambda: trade_journal.get_stats()["pending"])
+registry.gauge("active_shorts", "Shorts ouverts", lambda: len(active_shorts))
+registry.gauge("bot_running", "1 si le bot est démarré", lambda: int(bot_running))
+registry.gauge(
+    "binance_weight_used", "Poids utilisé dans la fenêtre en cours, par compteur Binance",
+    lambda: {name: bucket["used"] for name, bucket in rate_governor.get_stats()["buckets"].items()}, ("bucket",)
+)
+registry.gauge(
+    "binance_weight_limit", "Limite de poids de la fenêtre, par compteur Binance",
+    lambda: {name: bucket["limit"] for name, bucket in rate_governor.get_stats()["buckets"].items()}, ("bucket",)
+)
+registry.gauge("binance_ban_seconds", "Secondes avant que Binance accepte de nouveau les requêtes",
+               lambda: rate_governor.get_stats()["banned_for_s"])
+registry.gauge(
+    "binance_governor_requests_total", "Requêtes passées par le régulateur, par priorité (sent, waited, rejected)",
+    lambda: {
+        (priority, outcome): count
+        for priority, stats in rate_governor.get_stats()["priorities"].items()
+        for outcome, count in stats.items()
+    },
+    ("priority", "outcome"),
+    kind="counter"
+)
+
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     """Route principale - Accepte les requêtes GET pour afficher l'interface et POST pour recevoir les alertes"""
@@ -208,11 +370,28 @@ def index():
             if "alert" in data:
                 alert_value = data["alert"]
                 tweet_text = data.get("tweet", None)
-                logger.info(f"Processing alert: {alert_value} with tweet: {tweet_text}")
-                success = process_alert(alert_value, tweet_text)
-                result = {"success": success, "message": f"Alerte {alert_value} traitée avec succès"}
+                account = data.get("account", None)
+                # Alert ID propagated by the scraper, so both services' spans can be matched
+                alert_id = data.get("alert_id") or uuid.uuid4().hex
+                ALERTS_RECEIVED.inc("webhook", "hack" if alert_value == "1" else "other")
+                logger.info(f"Queuing alert: {alert_value} with tweet: {tweet_text}")
+                job = alert_executor.submit(
+                    alert_value=alert_value,
+                    tweet_text=tweet_text,
+                    account=account,
+                    alert_id=alert_id,
+                    tweet_created_at=data.get("tweet_created_at"),
+                    received_at=time.time()
+                )
+                result = {
+                    "success": True,
+                    "job_id": job["id"],
+                    "alert_id": alert_id,
+                    "status": job["status"],
+                    "message": f"Alerte {alert_value} mise en file d'attente"
+                }
                 logger.info(f"Result: {result}")
-                return jsonify(result)
+                return jsonify(result), 202
             else:
                 logger.warning("Alert data missing in the request")
                 return jsonify({"success": False, "message": "Missing alert data"}), 400
@@ -257,24 +436,53 @@ def get_min_trade_quantity():
     logger.info(f"Retrieving minimum trade quantity for {symbol}")
     
     try:
-        # Initialiser le trader Binance
-        trader = BinanceTrader()
-        if not trader.test_connection():
+        # Utiliser le trader partagé: client et connexions déjà ouverts, test de connexion en cache
+        if not binance_trader and not initialize_components():
             return jsonify({'error': 'Unable to connect to Binance'}), 500
+        success, message = binance_trader.test_connection(max_age=client_pool.health_ttl)
+        if not success:
+            return jsonify({'error': f'Unable to connect to Binance: {message}'}), 500
         
         # Récupérer la quantité minimale de trading
-        result = trader.get_min_trade_quantity(symbol)
+        result = binance_trader.get_min_trade_quantity(symbol)
         return jsonify(result)
     except Exception as e:
         logger.error(f"Error retrieving minimum trade quantity: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route("/api/alerts/<job_id>")
+def get_alert_job(job_id):
+    """Returns the processing status of a queued alert"""
+    job = alert_executor.get_job(job_id)
+    if not job:
+        return jsonify({"success": False, "message": f"Job {job_id} not found"}), 404
+    return jsonify({"success": True, "job": job})
+
+
+@app.route("/api/traces")
+def get_traces():
+    """Returns the latency trace of one alert (?alert_id=), or of the latest alerts"""
+    alert_id = request.args.get("alert_id")
+    if alert_id:
+        trace = tracer.get_trace(alert_id)
+        if not trace:
+            return jsonify({"success": False, "message": f"Alert {alert_id} not found"}), 404
+        return jsonify({"success": True, "trace": trace})
+    return jsonify({"success": True, "traces": tracer.recent(request.args.get("limit", 20, type=int))})
+
+
+@app.route("/metrics")
+def metrics():
+    """Metrics in the Prometheus text format: counters, gauges and latency histograms"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
 @app.route("/api/status")
 def get_status():
     """Returns the current status of the bot"""
     # Debug logs
     logger.debug(f"API Status - Number of active shorts: {len(active_shorts)}")
-    logger.debug(f"API Status - Active shorts details: {active_shorts}")
+    logger.debug(f"API Status - Active shorts details: {active_shorts.all()}")
     logger.debug(f"API Status - Bot running: {bot_running}")
     
     # Format latest tweet for the UI
@@ -288,8 +496,15 @@ def get_status():
     return jsonify({
         "success": True,
         "running": bot_running,
-        "active_shorts": active_shorts,
+        "active_shorts": active_shorts.all(),
         "latest_tweet": latest_tweet,
+        "order_latency": binance_trader.get_order_latency_stats() if binance_trader else None,
+        "alert_queue_depth": alert_executor.queue_depth(),
+        "account_state": binance_trader.account_state.get_stats() if binance_trader else None,
+        "price_book": binance_trader.price_book.get_stats() if binance_trader else None,
+        "trade_journal": trade_journal.get_stats(),
+        "client_pool": client_pool.get_stats(),
+        "rate_governor": rate_governor.get_stats(),
         "settings": config_manager.get_settings()
     })
 
@@ -297,8 +512,12 @@ def get_status():
 @app.route("/api/settings", methods=["POST"])
 def update_settings():
     """Met à jour les paramètres du bot"""
-    new_settings = request.json
-    config_manager.update_settings(new_settings)
+    new_settings = request.get_json(silent=True)
+    try:
+        config_manager.update_settings(new_settings)
+    except SettingsError as e:
+        logger.warning(f"Settings update rejected: {str(e)}")
+        return jsonify({"success": False, "errors": e.errors}), 400
     return jsonify({"success": True, "settings": config_manager.get_settings()})
 
 
@@ -375,7 +594,8 @@ def manual_alert():
         data = request.json
         alert_value = data.get("alert", "0")
         tweet_text = data.get("tweet", "Tweet de test manuel")
-        success = process_alert(alert_value, tweet_text)
+        ALERTS_RECEIVED.inc("manual", "hack" if alert_value == "1" else "other")
+        success = process_alert(alert_value, tweet_text, data.get("account"))
         return jsonify({"success": success, "message": f"Manual alert {alert_value} processed successfully"})
     except Exception as e:
         logger.error(f"Error processing manual alert: {str(e)}")
@@ -384,7 +604,11 @@ def manual_alert():
 
 @app.route("/api/place_short_direct", methods=["POST"])
 def place_short_direct():
-    """Place directement un ordre de short sur ETH sans passer par le traitement d'alerte"""
+    """
+    Place directement un ordre de short sans passer par le traitement d'alerte
+    
+    Le corps JSON optionnel peut préciser "symbol", ou un "tweet" et un "account" à résoudre.
+    """
     logger.info("===== DIRECT CALL TO SHORT FUNCTION =====")
     
     # Vérifier si le bot est en cours d'exécution
@@ -393,10 +617,10 @@ def place_short_direct():
         return jsonify({"success": False, "message": "The bot must be running to place a short"}), 400
     
     # Récupérer les paramètres actuels
-    settings = config_manager.get_settings()
+    settings = config_manager.get_typed_settings()
     
     # Vérifier si le trading automatique est activé
-    if not settings.get("trading_enabled", False):
+    if not settings.trading_enabled:
         logger.warning("Automated trading disabled. Cannot place a short.")
         return jsonify({"success": False, "message": "Automated trading must be enabled to place a short"}), 400
     
@@ -408,28 +632,23 @@ def place_short_direct():
             return jsonify({"success": False, "message": "Unable to initialize Binance trader"}), 500
     
     # Récupérer les paramètres actuels
-    settings = config_manager.get_settings()
-    leverage = settings.get("leverage", 1)
+    leverage = config_manager.get_typed_settings().leverage
     
-    # Utiliser BTC/USDC pour le margin trading
-    symbol = "BTCUSDC"
+    data = request.get_json(silent=True) or {}
+    symbol = resolve_short_symbol(data.get("tweet"), data.get("account"), data.get("symbol"))
     logger.info(f"Direct placement of a short on {symbol} with leverage of {leverage}")
     
     try:
-        # Récupérer le prix actuel du BTC
+        # Récupérer le prix actuel de l'actif
         try:
-            ticker = binance_trader.client.get_symbol_ticker(symbol=symbol)
-            current_price = float(ticker["price"])
+            current_price = binance_trader.price_book.price(binance_trader.client, symbol)
             logger.info(f"Current price of {symbol}: {current_price}")
         except Exception as e:
             logger.error(f"Error getting current price: {str(e)}")
             current_price = 0
         
-        # Quantité fixe pour les shorts directs (comme dans binance_trader.py)
-        quantity = 0.00003
-        
         # Appeler directement la fonction de placement de short
-        success, order_id = binance_trader.place_short_order(
+        success, order_id, quantity = binance_trader.place_short_order(
             symbol=symbol,
             leverage=leverage
         )
@@ -438,16 +657,16 @@ def place_short_direct():
         
         if success and order_id:
             # Ajouter le short à la liste des shorts actifs
-            active_shorts.append({
-                "id": order_id,
-                "symbol": symbol,
-                "quantity": quantity,
-                "entry_price": current_price,
-                "leverage": leverage,
-                "timestamp": datetime.now().isoformat(),
-                "status": "active"
-            })
-            logger.info(f"Short added to active shorts list: {order_id}")
+            asset = symbol_base_asset(symbol)
+            short_info = active_shorts.open(
+                asset,
+                symbol,
+                order_id=order_id,
+                quantity=quantity,
+                entry_price=current_price,
+                leverage=leverage
+            )
+            logger.info(f"Short added to active shorts list: {short_info['id']} (order {order_id})")
             return jsonify({"success": True, "message": f"Short placed successfully (ID: {order_id})"})
         else:
             logger.error("Failed to place short")
@@ -461,7 +680,6 @@ def place_short_direct():
 @app.route("/api/cancel_short", methods=["POST"])
 def cancel_short():
     """Annule un short en le rachetant"""
-    global active_shorts
     
     try:
         data = request.json
@@ -470,12 +688,8 @@ def cancel_short():
         if not short_id:
             return jsonify({"success": False, "message": "Missing short ID"}), 400
         
-        # Rechercher le short dans la liste des shorts actifs
-        short_to_cancel = None
-        for short in active_shorts:
-            if short["id"] == short_id:
-                short_to_cancel = short
-                break
+        # Rechercher le short par son identifiant (ou celui d'un de ses ordres)
+        short_to_cancel = active_shorts.get(short_id)
         
         if not short_to_cancel:
             return jsonify({"success": False, "message": f"Short with ID {short_id} not found"}), 404
@@ -485,12 +699,7 @@ def cancel_short():
             if not initialize_components():
                 return jsonify({"success": False, "message": "Impossible d'initialiser le trader Binance"})
         
-        # Extraire l'asset depuis le short_id (format: margin_BTC_timestamp)
-        asset_symbol = None
-        if short_id.startswith("margin_"):
-            parts = short_id.split("_")
-            if len(parts) >= 2:
-                asset_symbol = parts[1]  # BTC, ETH, etc.
+        asset_symbol = short_to_cancel.get("asset")
         
         if asset_symbol:
             logger.info(f"Attempting to cancel short with force_close_short for {asset_symbol}")
@@ -502,7 +711,7 @@ def cancel_short():
         
         if success:
             # Retirer le short de la liste des shorts actifs
-            active_shorts = [s for s in active_shorts if s["id"] != short_id]
+            active_shorts.remove(short_to_cancel["id"])
             logger.success(f"Short {short_id} canceled successfully")
             return jsonify({"success": True, "message": f"Short {short_id} canceled successfully"})
         else:
@@ -0,0 +1,389 @@
+"""
+Module de l'état local du compte (soldes margin, soldes et positions futures)
+
+L'état est initialisé une fois via REST puis tenu à jour par le flux de compte
+(user data stream) de Binance, ou par un flux rejoué pour les tests hors ligne.
+"""
+import json
+import time
+import threading
+from binance import ThreadedWebsocketManager
+from loguru import logger
+
+from app.utils.rate_governor import rate_governor
+
+MARKETS = ("margin", "futures")
+
+
+def _margin_entry(asset, free=0.0, locked=0.0, borrowed=0.0, interest=0.0):
+    """Entrée d'un actif margin, au format de userAssets avec des valeurs numériques"""
+    return {
+        "asset": asset,
+        "free": float(free),
+        "locked": float(locked),
+        "borrowed": float(borrowed),
+        "interest": float(interest),
+        "netAsset": float(free) + float(locked) - float(borrowed) - float(interest)
+    }
+
+
+def load_events(path):
+    """Charge des événements enregistrés (un objet JSON par ligne)"""
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class AccountState:
+    """
+    Soldes et positions du compte, en mémoire et protégés par un verrou
+
+    Un marché est "live" quand il a été initialisé via REST et qu'un flux le tient à
+    jour: les lectures se font alors en mémoire, sinon l'appelant repasse par REST.
+    Le flux margin de Binance ne transmet pas les montants empruntés: ils sont mis à
+    jour localement par apply_loan/apply_repay et corrigés à chaque resynchronisation.
+    Les soldes libres, eux, ne viennent que du flux ou de REST.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.margin_assets = {}  # actif -> entrée au format userAssets
+        self.futures_balances = {}  # actif -> {"wallet", "cross_wallet", "available"}
+        self.futures_positions = {}  # symbole -> {"amount", "entry_price", "unrealized_pnl"}
+        self.seeded_at = {market: None for market in MARKETS}
+        self.live = {market: False for market in MARKETS}
+        self.events_applied = 0
+        self.last_event_at = None
+        self.listeners = []
+
+    def add_listener(self, listener):
+        """Ajoute une fonction appelée avec (actif, solde libre) à chaque mise à jour d'un solde margin"""
+        self.listeners.append(listener)
+
+    def _notify(self, changes):
+        for asset, free in changes:
+            for listener in self.listeners:
+                try:
+                    listener(asset, free)
+                except Exception as e:
+                    logger.warning(f"Erreur dans un écouteur de l'état du compte: {str(e)}")
+
+    def seed_margin(self, account):
+        """Initialise les soldes margin à partir de la réponse de get_margin_account"""
+        assets = {
+            a["asset"]: _margin_entry(a["asset"], a["free"], a["locked"], a["borrowed"], a["interest"])
+            for a in account["userAssets"]
+        }
+        with self.lock:
+            self.margin_assets = assets
+            self.seeded_at["margin"] = time.time()
+        logger.info(f"État margin initialisé: {len(assets)} actifs")
+
+    def seed_futures(self, balances, positions=None):
+        """
+        Initialise l'état futures
+
+        Args:
+            balances (list): Réponse de futures_account_balance
+            positions (list): Réponse de futures_position_information (optionnelle)
+        """
+        futures_balances = {
+            b["asset"]: {
+                "wallet": float(b["balance"]),
+                "cross_wallet": float(b.get("crossWalletBalance", b["balance"])),
+                "available": float(b["withdrawAvailable"])
+            }
+            for b in balances
+        }
+        futures_positions = {
+            p["symbol"]: {
+                "amount": float(p["positionAmt"]),
+                "entry_price": float(p["entryPrice"]),
+                "unrealized_pnl": float(p.get("unRealizedProfit", 0))
+            }
+            for p in positions or [] if float(p["positionAmt"]) != 0
+        }
+        with self.lock:
+            self.futures_balances = futures_balances
+            if positions is not None:
+                self.futures_positions = futures_positions
+            self.seeded_at["futures"] = time.time()
+        logger.info(f"État futures initialisé: {len(futures_balances)} soldes, {len(futures_positions)} positions")
+
+    def set_live(self, market, live):
+        """Indique si un flux tient actuellement le marché à jour"""
+        with self.lock:
+            self.live[market] = live and self.seeded_at[market] is not None
+
+    def is_live(self, market):
+        """True si les lectures de ce marché peuvent se faire en mémoire"""
+        with self.lock:
+            return self.live[market]
+
+    def apply_event(self, event):
+        """
+        Applique un message du flux de compte
+
+        Messages traités: outboundAccountPosition et balanceUpdate (margin),
+        ACCOUNT_UPDATE (futures). Les autres sont ignorés.
+        """
+        event_type = event.get("e")
+        changes = []
+        with self.lock:
+            if event_type == "outboundAccountPosition":
+                for balance in event.get("B", []):
+                    entry = self.margin_assets.setdefault(balance["a"], _margin_entry(balance["a"]))
+                    entry["free"] = float(balance["f"])
+                    entry["locked"] = float(balance["l"])
+                    self._update_net_asset(entry)
+                    changes.append((balance["a"], entry["free"]))
+            elif event_type == "balanceUpdate":
+                # Toujours suivi d'un outboundAccountPosition qui donne le solde complet
+                pass
+            elif event_type == "ACCOUNT_UPDATE":
+                update = event.get("a", {})
+                for balance in update.get("B", []):
+                    current = self.futures_balances.setdefault(
+                        balance["a"], {"wallet": 0.0, "cross_wallet": 0.0, "available": 0.0}
+                    )
+                    cross_wallet = float(balance["cw"])
+                    # Le flux ne donne pas le disponible: il suit les variations du portefeuille
+                    current["available"] += cross_wallet - current["cross_wallet"]
+                    current["wallet"] = float(balance["wb"])
+                    current["cross_wallet"] = cross_wallet
+                for position in update.get("P", []):
+                    amount = float(position["pa"])
+                    if amount == 0:
+                        self.futures_positions.pop(position["s"], None)
+                    else:
+                        self.futures_positions[position["s"]] = {
+                            "amount": amount,
+                            "entry_price": float(position["ep"]),
+                            "unrealized_pnl": float(position.get("up", 0))
+                        }
+            else:
+                return False
+            self.events_applied += 1
+            self.last_event_at = time.time()
+        self._notify(changes)
+        return True
+
+    def apply_loan(self, asset, amount):
+        """
+        Met à jour localement le montant emprunté après un emprunt margin réussi
+
+        Le solde libre n'est pas modifié: seul le flux de compte (ou une lecture REST)
+        le relève, une fois l'actif réellement crédité par Binance.
+        """
+        with self.lock:
+            entry = self.margin_assets.setdefault(asset, _margin_entry(asset))
+            entry["borrowed"] += float(amount)
+            self._update_net_asset(entry)
+
+    def apply_repay(self, asset, amount):
+        """Met à jour localement le montant emprunté après un remboursement margin réussi (voir apply_loan)"""
+        with self.lock:
+            entry = self.margin_assets.setdefault(asset, _margin_entry(asset))
+            entry["borrowed"] = max(0.0, entry["borrowed"] - float(amount))
+            self._update_net_asset(entry)
+
+    @staticmethod
+    def _update_net_asset(entry):
+        entry["netAsset"] = entry["free"] + entry["locked"] - entry["borrowed"] - entry["interest"]
+
+    def margin_asset(self, asset):
+        """Retourne une copie de l'entrée margin d'un actif, ou None"""
+        with self.lock:
+            entry = self.margin_assets.get(asset)
+            return dict(entry) if entry else None
+
+    def borrowed_assets(self):
+        """Retourne les entrées margin des actifs empruntés"""
+        with self.lock:
+            return [dict(entry) for entry in self.margin_assets.values() if entry["borrowed"] > 0]
+
+    def futures_balance(self, asset="USDT"):
+        """Retourne une copie du solde futures d'un actif, ou None"""
+        with self.lock:
+            balance = self.futures_balances.get(asset)
+            return dict(balance) if balance else None
+
+    def futures_position(self, symbol):
+        """Retourne une copie de la position futures d'un symbole, ou None"""
+        with self.lock:
+            position = self.futures_positions.get(symbol)
+            return dict(position) if position else None
+
+    def get_stats(self):
+        """Retourne l'état des marchés (live, âge de l'initialisation) et le nombre d'événements appliqués"""
+        now = time.time()
+        with self.lock:
+            return {
+                "markets": {
+                    market: {
+                        "live": self.live[market],
+                        "seeded_age_s": round(now - self.seeded_at[market], 1) if self.seeded_at[market] else None
+                    }
+                    for market in MARKETS
+                },
+                "events_applied": self.events_applied,
+                "last_event_age_s": round(now - self.last_event_at, 1) if self.last_event_at else None
+            }
+
+
+class AccountStream:
+    """
+    Flux de compte Binance (user data stream) qui alimente un AccountState
+
+    L'état est initialisé via REST au démarrage puis resynchronisé périodiquement,
+    ce qui corrige les montants empruntés (intérêts) et les messages manqués lors
+    d'une reconnexion. Les messages reçus peuvent être enregistrés pour être rejoués.
+    """
+
+    def __init__(self, state, client, api_key, api_secret, markets=("margin",), resync_interval=300, record_path=None):
+        """
+        Args:
+            state (AccountState): L'état à tenir à jour
+            client: Client Binance utilisé pour l'initialisation REST
+            api_key (str): Clé API (nécessaire au flux)
+            api_secret (str): Secret API
+            markets (tuple): Marchés suivis ("margin" et/ou "futures")
+            resync_interval (float): Délai en secondes entre deux resynchronisations REST
+            record_path (str): Fichier où enregistrer les messages reçus (un JSON par ligne)
+        """
+        self.state = state
+        self.client = client
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.markets = tuple(markets)
+        self.resync_interval = resync_interval
+        self.record_path = record_path
+        self.record_lock = threading.Lock()
+        self.manager = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def seed(self, market):
+        """Initialise un marché via REST"""
+        if market == "margin":
+            self.state.seed_margin(self.client.get_margin_account())
+        else:
+            self.state.seed_futures(self.client.futures_account_balance(), self.client.futures_position_information())
+
+    def start(self):
+        """Initialise l'état via REST puis démarre le flux et la resynchronisation périodique"""
+        for market in self.markets:
+            self.seed(market)
+
+        self.stop_event.clear()
+        self.manager = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret)
+        self.manager.start()
+        for market in self.markets:
+            callback = self._make_callback(market)
+            if market == "margin":
+                self.manager.start_margin_socket(callback=callback)
+            else:
+                self.manager.start_futures_user_socket(callback=callback)
+            self.state.set_live(market, True)
+
+        self.thread = threading.Thread(target=self._resync_loop, name="account-resync")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Flux de compte démarré pour {', '.join(self.markets)}")
+
+    def stop(self):
+        """Arrête le flux; les lectures repassent par REST"""
+        self.stop_event.set()
+        for market in self.markets:
+            self.state.set_live(market, False)
+        if self.manager:
+            self.manager.stop()
+            self.manager = None
+        logger.info("Flux de compte arrêté")
+
+    def _make_callback(self, market):
+        def callback(message):
+            if message.get("e") == "error":
+                # Reconnexions épuisées: revenir au REST jusqu'à la prochaine resynchronisation
+                logger.error(f"Flux de compte {market} interrompu: {message.get('m')}")
+                self.state.set_live(market, False)
+                return
+            self._record(message)
+            self.state.apply_event(message)
+        return callback
+
+    def _record(self, message):
+        if not self.record_path:
+            return
+        with self.record_lock:
+            with open(self.record_path, "a") as f:
+                f.write(json.dumps(message) + "\n")
+
+    def _resync_loop(self):
+        """Resynchronise régulièrement l'état via REST"""
+        rate_governor.set_priority("maintenance")
+        while not self.stop_event.wait(self.resync_interval):
+            for market in self.markets:
+                try:
+                    self.seed(market)
+                    self.state.set_live(market, True)
+                except Exception as e:
+                    logger.warning(f"Erreur lors de la resynchronisation {market}: {str(e)}")
+
+
+class ReplayStream:
+    """
+    Flux de compte rejoué à partir d'événements enregistrés, pour les tests hors ligne
+
+    Même interface que AccountStream: l'état est initialisé à partir des instantanés
+    fournis puis les événements sont appliqués dans l'ordre.
+    """
+
+    def __init__(self, state, events, margin_account=None, futures_balances=None, futures_positions=None, interval=0.0):
+        """
+        Args:
+            state (AccountState): L'état à alimenter
+            events (list): Messages du flux, ou chemin d'un fichier enregistré par AccountStream
+            margin_account (dict): Instantané initial au format de get_margin_account
+            futures_balances (list): Instantané initial au format de futures_account_balance
+            futures_positions (list): Instantané initial au format de futures_position_information
+            interval (float): Délai en secondes entre deux événements (0 pour tout appliquer d'un coup)
+        """
+        self.state = state
+        self.events = load_events(events) if isinstance(events, str) else list(events)
+        self.margin_account = margin_account
+        self.futures_balances = futures_balances
+        self.futures_positions = futures_positions
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.done = threading.Event()
+
+    def start(self):
+        """Initialise l'état puis rejoue les événements dans un thread"""
+        if self.margin_account is not None:
+            self.state.seed_margin(self.margin_account)
+            self.state.set_live("margin", True)
+        if self.futures_balances is not None:
+            self.state.seed_futures(self.futures_balances, self.futures_positions)
+            self.state.set_live("futures", True)
+
+        self.stop_event.clear()
+        self.done.clear()
+        self.thread = threading.Thread(target=self._replay, name="account-replay")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Arrête le rejeu"""
+        self.stop_event.set()
+        for market in MARKETS:
+            self.state.set_live(market, False)
+
+    def _replay(self):
+        for event in self.events:
+            if self.stop_event.is_set():
+                break
+            self.state.apply_event(event)
+            if self.interval and self.stop_event.wait(self.interval):
+                break
+        self.done.set()
@@ -0,0 +1,114 @@
+"""
+Module d'exécution asynchrone des alertes: file d'attente en mémoire et exécuteur dédié
+"""
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from loguru import logger
+
+
+class AlertExecutor:
+    """
+    File d'attente des alertes traitées par un thread dédié
+
+    La réception d'une alerte se limite à l'ajout d'un job dans la file: la requête HTTP
+    est acquittée immédiatement et le placement de l'ordre se fait hors de la requête.
+    Les alertes sont traitées une par une, dans leur ordre d'arrivée.
+    """
+
+    def __init__(self, handler, max_jobs=1000):
+        """
+        Args:
+            handler (callable): Fonction appelée avec les paramètres de l'alerte, retourne un booléen
+            max_jobs (int): Nombre de jobs terminés conservés pour la consultation du statut
+        """
+        self.handler = handler
+        self.max_jobs = max_jobs
+        self.queue = queue.Queue()
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        """Démarre le thread d'exécution"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._worker, name="alert-executor")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info("Exécuteur d'alertes démarré")
+
+    def submit(self, **params):
+        """
+        Ajoute une alerte à la file d'attente
+
+        Returns:
+            dict: Le job créé (id, statut "queued", date de soumission)
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "params": params,
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "duration_ms": None,
+            "success": None,
+            "error": None
+        }
+        with self.lock:
+            self.jobs[job["id"]] = job
+            self._evict()
+        self.queue.put(job["id"])
+        logger.info(f"Alerte mise en file d'attente (job {job['id']}, {self.queue.qsize()} en attente)")
+        return dict(job)
+
+    def get_job(self, job_id):
+        """Retourne une copie du job, ou None s'il est inconnu"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def queue_depth(self):
+        """Nombre d'alertes en attente d'exécution"""
+        return self.queue.qsize()
+
+    def _worker(self):
+        """Boucle du thread d'exécution"""
+        while True:
+            job_id = self.queue.get()
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    continue
+                job["status"] = "running"
+                job["started_at"] = datetime.now().isoformat()
+            started_at = time.perf_counter()
+
+            try:
+                success = self.handler(**job["params"])
+                status, error = ("succeeded" if success else "failed"), None
+            except Exception as e:
+                logger.error(f"Erreur lors de l'exécution du job {job_id}: {str(e)}")
+                success, status, error = False, "failed", str(e)
+
+            with self.lock:
+                job["status"] = status
+                job["success"] = bool(success)
+                job["error"] = error
+                job["finished_at"] = datetime.now().isoformat()
+                job["duration_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+            logger.info(f"Job {job_id} terminé: {status} en {job['duration_ms']} ms")
+
+    def _evict(self):
+        """Supprime les jobs terminés les plus anciens au-delà de max_jobs"""
+        excess = len(self.jobs) - self.max_jobs
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id]["status"] in ("succeeded", "failed"):
+                del self.jobs[job_id]
+                excess -= 1
@@ -3,16 +3,63 @@ Module pour interagir avec l'API Binance et placer des ordres de trading
 """
 import os
 import time
+import threading
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from binance.client import Client
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
 from binance.exceptions import BinanceAPIException
 from loguru import logger
 
+from app.utils.symbol_cache import symbol_cache as shared_symbol_cache
+from app.utils.client_pool import client_pool
+from app.utils.rate_governor import rate_governor
+from app.utils.account_state import AccountState, AccountStream
+from app.utils.price_book import PriceBook, PriceStream
+from app.utils.position_registry import position_id
+from app.utils.tracing import tracer
+from app.utils.metrics import registry
+
+# Actifs de cotation reconnus, du plus long au plus court pour éviter les ambiguïtés (ex: USDC/USD)
+QUOTE_ASSETS = ("FDUSD", "USDT", "USDC", "BUSD", "BTC", "ETH", "BNB")
+
+# Shorts tentés, et placés (emprunt et vente acceptés) selon le mode de préparation
+SHORTS_ATTEMPTED = registry.counter("short_orders_attempted_total", "Shorts tentés")
+SHORTS_SUCCEEDED = registry.counter("short_orders_succeeded_total", "Shorts placés, par mode (prewarm, cold)", ("mode",))
+
+
+def symbol_base_asset(symbol):
+    """Extrait l'actif de base d'un symbole (ex: "BTCUSDC" -> "BTC")"""
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)]
+    return symbol
+
+
+def adjust_to_step(qty, step, rounding=ROUND_DOWN):
+    """Arrondit une quantité (vers le bas par défaut) au multiple de step_size le plus proche"""
+    step_str = f"{step:g}"  # Notation courte pour éliminer les zéros de fin
+    return float(Decimal(str(qty)).quantize(Decimal(step_str), rounding=rounding))
+
+
+def timed_call(func, *args, **kwargs):
+    """Exécute un appel et retourne son résultat avec sa durée en millisecondes"""
+    started_at = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started_at) * 1000
+
+
 class BinanceTrader:
     """Classe pour interagir avec l'API Binance et placer des ordres de trading"""
     
-    def __init__(self, api_key=None, api_secret=None):
-        """Initialise le trader Binance"""
+    def __init__(self, api_key=None, api_secret=None, symbol_cache=None, journal=None):
+        """
+        Initialise le trader Binance
+        
+        Args:
+            journal (TradeJournal): Journal des emprunts, ordres et remboursements (optionnel)
+        """
         self.api_key = api_key or os.getenv("BINANCE_API_KEY")
         self.api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
         
@@ -20,19 +67,76 @@ class BinanceTrader:
             logger.warning("Clés API Binance non trouvées dans les variables d'environnement")
         
         self.client = self._init_client()
+        self.symbol_cache = symbol_cache or shared_symbol_cache
+        self.journal = journal
+        
+        # Pool utilisé pour envoyer en parallèle les requêtes indépendantes d'un short
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="binance")
+        
+        # Données pré-chargées pour le short (voir start_prewarm)
+        self.prewarm_symbols = []
+        self.prewarm_interval = 5.0
+        self.prewarm_max_age = 15.0
+        self._prewarm_cache = {}
+        self._prewarm_lock = threading.Lock()
+        self._prewarm_stop = threading.Event()
+        self._prewarm_wakeup = threading.Event()
+        self._prewarm_thread = None
+        
+        # Confirmation de l'emprunt: sondage borné avec backoff, réveillé par notify_balance_update
+        self.loan_confirm_timeout = 3.0
+        self.loan_poll_interval = 0.05
+        self.loan_poll_max_interval = 0.5
+        self._balance_updates = {}  # asset -> (solde libre, timestamp) poussés par un flux de compte
+        self._balance_condition = threading.Condition()
+        
+        # Soldes et positions tenus à jour en mémoire par le flux de compte (voir start_account_stream)
+        self.account_state = AccountState()
+        self.account_state.add_listener(self.notify_balance_update)
+        self.account_stream = None
+        
+        # Prix tenus à jour en mémoire par le flux de tickers (voir start_price_stream)
+        self.price_book = PriceBook()
+        self.price_stream = None
+        
+        # Délais alerte -> ordre, avec ("prewarm") et sans ("cold") pré-chargement
+        self.order_latencies = {
+            mode: {"count": 0, "total_ms": 0.0, "last_ms": None}
+            for mode in ("prewarm", "cold")
+        }
     
     def _init_client(self):
-        """Initialise le client Binance"""
+        """Récupère le client Binance partagé du pool (créé au premier appel pour ces clés)"""
         try:
-            client = Client(self.api_key, self.api_secret)
+            client = client_pool.get_client(self.api_key, self.api_secret)
             logger.info("Client Binance initialisé avec succès")
             return client
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation du client Binance: {str(e)}")
             return None
     
-    def test_connection(self):
-        """Teste la connexion à l'API Binance"""
+    def test_connection(self, max_age=0):
+        """
+        Teste la connexion à l'API Binance
+        
+        Args:
+            max_age (float): Réutiliser le résultat d'un test de moins de max_age secondes (0: toujours tester)
+        
+        Returns:
+            tuple: (succès, message)
+        """
+        if max_age and self.client:
+            cached = client_pool.cached_health(self.client, max_age)
+            if cached:
+                return cached
+        
+        success, message = self._check_connection()
+        if self.client:
+            client_pool.record_health(self.client, success, message)
+        return success, message
+    
+    def _check_connection(self):
+        """Vérifie le statut du système Binance et l'accès au compte margin"""
         try:
             if not self.client:
                 return False, "Client Binance non initialisé"
@@ -61,10 +165,14 @@ class BinanceTrader:
                 logger.error("Client Binance non initialisé")
                 return None
             
-            balances = self.client.futures_account_balance()
-            
-            # Filtrer pour obtenir le solde USDT
-            usdt_balance = next((b for b in balances if b["asset"] == "USDT"), None)
+            if self.account_state.is_live("futures"):
+                usdt_balance = self.account_state.futures_balance("USDT")
+                usdt_balance = {"withdrawAvailable": usdt_balance["available"]} if usdt_balance else None
+            else:
+                balances = self.client.futures_account_balance()
+                
+                # Filtrer pour obtenir le solde USDT
+                usdt_balance = next((b for b in balances if b["asset"] == "USDT"), None)
             
             if usdt_balance:
                 available_balance = float(usdt_balance["withdrawAvailable"])
@@ -128,10 +236,8 @@ class BinanceTrader:
                 logger.error("Client Binance non initialisé")
                 return None
             
-            account = self.client.get_margin_account()
-            
             # Récupérer le solde de l'asset spécifié
-            asset_balance = next((a for a in account["userAssets"] if a["asset"] == asset), None)
+            asset_balance = self._get_margin_asset(asset)
             
             if asset_balance:
                 available_balance = float(asset_balance["free"])
@@ -147,288 +253,137 @@ class BinanceTrader:
     def get_usdc_margin_balance(self):
         """Récupère le solde USDC du compte margin"""
         return self.get_margin_balance("USDC")
+    
+    def _get_margin_asset(self, asset):
+        """Retourne l'entrée userAssets d'un actif margin: en mémoire si le flux est actif, sinon via REST"""
+        if self.account_state.is_live("margin"):
+            return self.account_state.margin_asset(asset)
+        account = self.client.get_margin_account()
+        return next((a for a in account["userAssets"] if a["asset"] == asset), None)
+    
+    def get_borrowed_amount(self, asset):
+        """Retourne le montant emprunté d'un actif margin (en mémoire si le flux de compte est actif)"""
+        asset_info = self._get_margin_asset(asset)
+        return float(asset_info["borrowed"]) if asset_info else 0.0
+    
+    def _get_borrowed_assets(self):
+        """Retourne les actifs margin empruntés: en mémoire si le flux est actif, sinon via REST"""
+        if self.account_state.is_live("margin"):
+            return self.account_state.borrowed_assets()
+        account = self.client.get_margin_account()
+        return [asset for asset in account["userAssets"] if float(asset["borrowed"]) > 0]
+    
+    def start_account_stream(self, markets=("margin",), resync_interval=300, record_path=None):
+        """
+        Initialise l'état du compte via REST puis le tient à jour avec le flux de compte Binance
+        
+        Tant que le flux est actif, soldes et positions sont lus en mémoire.
+        
+        Args:
+            markets (tuple): Marchés à suivre ("margin" et/ou "futures")
+            resync_interval (float): Délai en secondes entre deux resynchronisations REST
+            record_path (str): Fichier où enregistrer les messages reçus, pour les rejouer (optionnel)
+        """
+        self.stop_account_stream()
+        self.account_stream = AccountStream(
+            self.account_state, self.client, self.api_key, self.api_secret,
+            markets=markets, resync_interval=resync_interval, record_path=record_path
+        )
+        self.account_stream.start()
+    
+    def stop_account_stream(self):
+        """Arrête le flux de compte; les lectures repassent par REST"""
+        if self.account_stream:
+            self.account_stream.stop()
+            self.account_stream = None
+    
+    def start_price_stream(self, markets=("spot",), max_age=5.0):
+        """
+        Alimente le carnet de prix avec le flux des tickers de tous les symboles
+        
+        Args:
+            markets (tuple): Marchés suivis ("spot" et/ou "futures")
+            max_age (float): Âge maximum en secondes d'un prix utilisable sans appel REST
+        """
+        self.stop_price_stream()
+        self.price_book.max_age = max_age
+        self.price_stream = PriceStream(self.price_book, self.client, markets=markets)
+        self.price_stream.start()
+    
+    def stop_price_stream(self):
+        """Arrête le flux de prix; les prix repassent par REST"""
+        if self.price_stream:
+            self.price_stream.stop()
+            self.price_stream = None
             
     def place_short_order(self, symbol, leverage=1):
         """
         Place un ordre de vente à découvert (short) sur le marché margin
         
+        Si le pré-chargement est actif (voir start_prewarm) et que les données du symbole
+        sont fraîches, seuls l'emprunt et la vente sont envoyés à Binance.
+        
         Args:
             symbol (str): Le symbole à shorter (ex: "BTCUSDT")
             leverage (int): Le levier à utiliser (1-10)
             
         Returns:
-            tuple: (success, order_id) où success est un booléen indiquant si l'ordre a été placé avec succès,
-                  et order_id est l'identifiant de l'ordre (ou None en cas d'échec)
+            tuple: (success, order_id, quantity) où success est un booléen indiquant si l'ordre a été placé
+                  avec succès, order_id est l'identifiant de l'ordre et quantity la quantité vendue par cet
+                  ordre (None en cas d'échec)
         """
+        alert_started_at = time.perf_counter()
         logger.info(f"\n\n===== DÉBUT PLACE_SHORT_ORDER =====")
         logger.info(f"Symbole: {symbol}")
         logger.info(f"Levier: {leverage}")
         try:
             if not self.client:
                 logger.error("Client Binance non initialisé")
-                return False
+                return False, None, None
             
-            # Vérifier si le margin trading est disponible
-            try:
-                # Tester l'accès au compte margin
-                logger.info("Vérification de l'accès au compte margin...")
-                margin_account = self.client.get_margin_account()
-                logger.info("Accès au compte margin vérifié")
-                logger.info(f"Type de compte: {margin_account.get('accountType', 'Inconnu')}")
-                logger.info(f"Niveau de risque: {margin_account.get('marginLevel', 'Inconnu')}")
-            except Exception as e:
-                logger.error(f"Impossible d'accéder au compte margin: {str(e)}")
-                logger.error("L'ordre de short ne peut pas être placé sans accès au margin trading")
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                return False, None
-            
-            # Récupérer le solde USDC pour l'utiliser comme collatéral
-            logger.info("Récupération du solde USDC margin disponible...")
-            usdc_balance = self.get_usdc_margin_balance()
-            logger.info(f"Solde USDC margin disponible: {usdc_balance} USDC")
-            
-            # Récupérer aussi le solde USDT
-            usdt_balance = self.get_margin_balance("USDT")
-            logger.info(f"Solde USDT margin disponible: {usdt_balance} USDT")
-            
-            # Vérifier les soldes disponibles
-            if usdt_balance > 0:
-                logger.info("Utilisation du solde USDT pour le trading")
-                available_balance = usdt_balance
-                quote_asset = "USDT"
-            elif usdc_balance > 0:
-                logger.info("Utilisation du solde USDC comme collatéral, mais trading sur ETHUSDT")
-                available_balance = usdc_balance
-                quote_asset = "USDT"  # On utilise quand même USDT pour le symbole
-            else:
-                logger.error("Aucun solde USDC ou USDT disponible pour placer un ordre")
-                return False, None
-                
-            # Utiliser BTCUSDC pour le trading
-            symbol = "BTCUSDC"
-            logger.info(f"Utilisation du symbole {symbol} pour le margin trading")
-                
-            # Limiter le montant à 3 USDC/USDT maximum
-            if available_balance > 3.0:
-                logger.info(f"Limitation du montant à 3 {quote_asset} comme demandé")
-                available_balance = 3.0
+            SHORTS_ATTEMPTED.inc()
+            symbol_meta = self.symbol_cache.get(self.client, symbol)
+            asset = symbol_meta["base_asset"] if symbol_meta else symbol_base_asset(symbol)
+            logger.info(f"Utilisation du symbole {symbol} pour le margin trading (actif emprunté: {asset})")
             
-            # Récupérer le prix actuel du symbole
-            logger.info(f"Récupération du prix actuel de {symbol}...")
-            try:
-                ticker = self.client.get_symbol_ticker(symbol=symbol)
-                current_price = float(ticker["price"])
-                logger.info(f"Prix actuel de {symbol}: {current_price} USDC")
-            except Exception as e:
-                logger.error(f"Erreur lors de la récupération du prix pour {symbol}: {str(e)}")
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                return False, None
-            
-            # Fixer la quantité de BTC à 0.00003
-            quantity = 0.00003
-            # Calculer le montant de la transaction
-            trade_amount = quantity * current_price
-            logger.info(f"Quantité fixée à {quantity} BTC (valeur: {trade_amount} {quote_asset})")
-            
-            # Augmenter la quantité pour éviter l'erreur NOTIONAL (valeur minimale)
-            # La plupart des paires ont une valeur minimale de 10 USDT
-            min_notional = 10.0  # Valeur minimale typique pour Binance
-            if trade_amount < min_notional:
-                logger.warning(f"Montant de trading ({trade_amount} {quote_asset}) inférieur au minimum recommandé ({min_notional} {quote_asset})")
-                logger.warning("Augmentation de la quantité pour atteindre le minimum requis")
-                quantity = min_notional / current_price
-                trade_amount = min_notional
-                
-            logger.info(f"Quantité calculée pour le short: {quantity} BTC (valeur: {trade_amount} {quote_asset})")
+            # Durée de chaque étape, en millisecondes
+            stages = {}
             
-            # Ajuster la quantité selon les règles de LOT_SIZE
-            try:
-                # Récupérer les informations sur le symbole
-                symbol_info = self.client.get_symbol_info(symbol)
-                if not symbol_info:
-                    logger.error(f"Symbole {symbol} non trouvé dans les informations de l'échange")
-                    return False, None
-                    
-                # Trouver le filtre LOT_SIZE
-                lot_size_filter = next((f for f in symbol_info["filters"] if f["filterType"] == "LOT_SIZE"), None)
-                if lot_size_filter:
-                    min_qty = float(lot_size_filter["minQty"])
-                    step_size = float(lot_size_filter["stepSize"])
-                    
-                    # Vérifier si la quantité est supérieure au minimum requis
-                    if quantity < min_qty:
-                        logger.warning(f"Quantité {quantity} inférieure au minimum requis {min_qty}")
-                        quantity = min_qty
-                        logger.info(f"Quantité ajustée au minimum: {quantity}")
-                    
-                    # Arrondir selon le step_size
-                    from decimal import Decimal, ROUND_DOWN
-                    
-                    def adjust_to_step(qty, step):
-                        step_str = f"{step:g}"  # Convertir en notation scientifique pour éliminer les zéros de fin
-                        precision = len(step_str.split('.')[-1]) if '.' in step_str else 0
-                        return float(Decimal(qty).quantize(Decimal(step_str), rounding=ROUND_DOWN))
-                    
-                    original_quantity = quantity
-                    quantity = adjust_to_step(quantity, step_size)
-                    logger.info(f"Quantité ajustée selon step_size: {original_quantity} -> {quantity}")
-            except Exception as e:
-                logger.warning(f"Erreur lors de l'ajustement de la quantité: {str(e)}")
-                # Arrondir à 4 décimales par défaut si l'ajustement échoue
-                quantity = round(quantity, 4)
-            
-            # La quantité a déjà été ajustée selon les règles de LOT_SIZE plus haut
-            
-            # 1. Emprunter la crypto que nous voulons shorter
-            try:
-                # Pour un short, on emprunte seulement la partie base (BTC), pas le symbole complet
-                # Extraire BTC de BTCUSDC
-                asset = "BTC"
-                logger.info(f"\n===== EMPRUNT DE CRYPTO =====")
-                logger.info(f"Asset: {asset}")
-                logger.info(f"Quantité: {quantity}")
-                
-                # Vérifier si l'asset est disponible pour l'emprunt
-                margin_account = self.client.get_margin_account()
-                available_assets = {asset_data["asset"]: asset_data for asset_data in margin_account["userAssets"]}
-                
-                logger.info(f"Recherche de l'asset {asset} dans le compte margin")
-                
-                if asset in available_assets:
-                    asset_info = available_assets[asset]
-                    logger.info(f"Informations sur l'asset {asset}:")
-                    logger.info(f"  - Free: {asset_info.get('free', 'N/A')}")
-                    logger.info(f"  - Locked: {asset_info.get('locked', 'N/A')}")
-                    logger.info(f"  - Borrowed: {asset_info.get('borrowed', 'N/A')}")
-                    logger.info(f"  - Interest: {asset_info.get('interest', 'N/A')}")
-                else:
-                    logger.warning(f"L'asset {asset} n'est pas disponible dans le compte margin")
-                    # Afficher tous les assets disponibles pour aider au débogage
-                    logger.info("Assets disponibles dans le compte margin:")
-                    for available_asset in available_assets.keys():
-                        logger.info(f"  - {available_asset}")
-                
-                # Vérifier les assets disponibles pour l'emprunt
-                logger.info("Vérification des assets disponibles pour l'emprunt...")
-                try:
-                    max_borrowable = self.client.get_max_margin_loan(asset=asset)
-                    logger.info(f"Montant maximum empruntable pour {asset}: {max_borrowable}")
-                except Exception as e:
-                    logger.error(f"Erreur lors de la vérification du montant maximum empruntable: {str(e)}")
-                    max_borrowable = {"amount": "0", "borrowLimit": "0"}
-                
-                # Ajuster la quantité si nécessaire
-                try:
-                    max_amount = float(max_borrowable.get('amount', 0))
-                    if max_amount <= 0:
-                        logger.warning(f"Impossible d'emprunter {asset} (montant maximum: {max_amount})")
-                        logger.info("Tentative avec un autre symbole...")
-                        return False, None
-                    
-                    if max_amount < quantity:
-                        logger.warning(f"Quantité ajustée de {quantity} à {max_amount} (maximum empruntable)")
-                        quantity = max_amount
-                except Exception as e:
-                    logger.warning(f"Impossible de déterminer le montant maximum empruntable: {str(e)}")
-                
-                # Effectuer l'emprunt
-                logger.info(f"Tentative d'emprunt de {quantity} {asset}...")
-                loan = self.client.create_margin_loan(
-                    asset=asset,
-                    amount=quantity
-                )
-                logger.info(f"Emprunt réussi: {loan}")
-            except Exception as e:
-                logger.error(f"Erreur lors de l'emprunt pour le short: {str(e)}")
-                import traceback
-                logger.error(f"Traceback de l'erreur d'emprunt: {traceback.format_exc()}")
-                return False, None
-            
-            # 2. Vendre la crypto empruntée (ordre de marché)
-            try:
-                logger.info(f"\n===== VENTE DE LA CRYPTO EMPRUNTÉE =====")
-                logger.info(f"Symbole: {symbol}")
-                logger.info(f"Quantité: {quantity}")
-                logger.info(f"Type d'ordre: MARKET")
-                
-                # Vérifier les règles de trading pour ce symbole
-                try:
-                    exchange_info = self.client.get_exchange_info()
-                    symbol_info = next((s for s in exchange_info["symbols"] if s["symbol"] == symbol), None)
-                    if symbol_info:
-                        logger.info(f"Règles de trading pour {symbol}:")
-                        logger.info(f"  - Status: {symbol_info.get('status', 'N/A')}")
-                        logger.info(f"  - Permissions: {symbol_info.get('permissions', 'N/A')}")
-                        
-                        # Vérifier si le margin trading est autorisé
-                        if 'MARGIN' not in symbol_info.get('permissions', []):
-                            logger.warning(f"Le margin trading n'est pas autorisé pour {symbol}!")
-                except Exception as e:
-                    logger.warning(f"Impossible de vérifier les règles de trading: {str(e)}")
-                
-                # Essayer d'abord de vendre sur le marché margin
-                logger.info(f"Tentative de vente sur {symbol} (marché MARGIN)...")
+            # Utiliser les données pré-chargées si elles sont fraîches, sinon tout récupérer maintenant
+            context = self._get_prewarmed_context(symbol)
+            if context:
+                mode = "prewarm"
+                # Le prix du carnet est plus récent que celui du pré-chargement
+                fresh_price = self.price_book.get(symbol)
+                if fresh_price is not None:
+                    context = dict(context, price=fresh_price)
+                logger.info(f"Données pré-chargées utilisées pour {symbol} (âge: {time.time() - context['fetched_at']:.2f}s)")
+            else:
+                mode = "cold"
                 try:
-                    # Vérifier si le symbole existe sur Binance
-                    exchange_info = self.client.get_exchange_info()
-                    symbol_exists = any(s["symbol"] == symbol for s in exchange_info["symbols"])
-                    
-                    if not symbol_exists:
-                        logger.error(f"Le symbole {symbol} n'existe pas sur Binance")
-                        return False, None
-                    
-                    # Ajouter un délai pour s'assurer que l'ETH emprunté est disponible
-                    import time
-                    logger.info("Attente de 2 secondes pour s'assurer que le BTC emprunté est disponible...")
-                    time.sleep(2)
-                    
-                    # Vérifier que le BTC est bien disponible dans le compte margin
-                    margin_account = self.client.get_margin_account()
-                    btc_asset = next((asset for asset in margin_account["userAssets"] if asset["asset"] == "BTC"), None)
-                    
-                    if btc_asset:
-                        free_btc = float(btc_asset["free"])
-                        logger.info(f"BTC disponible dans le compte margin: {free_btc}")
-                        
-                        if free_btc < quantity:
-                            logger.warning(f"BTC disponible ({free_btc}) inférieur à la quantité à vendre ({quantity})")
-                            quantity = free_btc
-                            logger.info(f"Quantité ajustée au BTC disponible: {quantity}")
-                    
-                    # Vendre directement sur le marché margin
-                    logger.info(f"Vente de {quantity} BTC sur le marché margin...")
-                    order = self.client.create_margin_order(
-                        symbol=symbol,
-                        side="SELL",
-                        type="MARKET",
-                        quantity=quantity,
-                        sideEffectType="NO_SIDE_EFFECT"  # Pas d'emprunt automatique
-                    )
-                    logger.info(f"Vente réussie sur le marché margin: {order}")
+                    context = self._fetch_short_context(symbol, asset)
+                    stages.update(context["stages"])
                 except Exception as e:
-                    logger.error(f"Erreur lors de la création de l'ordre: {str(e)}")
+                    logger.error(f"Impossible de préparer le short pour {symbol}: {str(e)}")
                     import traceback
                     logger.error(f"Traceback: {traceback.format_exc()}")
-                    return False, None
-                
-                # Récupérer l'ID de l'ordre
-                order_id = order.get("orderId", str(order.get("clientOrderId", "unknown")))
-                
-                logger.info(f"Ordre de short placé avec succès pour {symbol}")
-                logger.info(f"  - Quantité: {quantity} {symbol.replace('USDT', '')}")
-                logger.info(f"  - Prix: ~{current_price} USDT")
-                logger.info(f"  - ID de l'ordre: {order_id}")
-                logger.info(f"  - Détails: {order}")
-                
-                return True, order_id
-            except Exception as e:
-                logger.error(f"Erreur lors du placement de l'ordre de short pour {symbol}: {str(e)}")
-                # Afficher plus de détails sur l'erreur
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                return False, None
+                    return False, None, None
+            
+            quantity = self._compute_short_quantity(symbol, asset, context)
+            if quantity is None:
+                return False, None, None
+            
+            trade_id = uuid.uuid4().hex
+            self._journal(trade_id, "intent", symbol=symbol, asset=asset, quantity=quantity, price=context["price"])
+            success, order_id, filled_quantity = self._execute_short(symbol, asset, quantity, context, stages, trade_id)
+            stages["total"] = (time.perf_counter() - alert_started_at) * 1000
+            logger.info(f"Détail du délai ({mode}): " + ", ".join(f"{stage}={ms:.0f}ms" for stage, ms in stages.items()))
+            for stage, ms in stages.items():
+                tracer.record("place_short_order" if stage == "total" else f"short.{stage}", ms / 1000)
+            if success:
+                SHORTS_SUCCEEDED.inc(mode)
+                self._record_order_latency(mode, time.perf_counter() - alert_started_at)
+            return success, order_id, filled_quantity
                 
         except Exception as e:
             logger.error(f"\n===== ERREUR GÉNÉRALE =====")
@@ -436,26 +391,522 @@ class BinanceTrader:
             # Afficher plus de détails sur l'erreur
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
-            return False, None
+            return False, None, None
         finally:
+            # Les soldes et limites d'emprunt ont changé, rafraîchir le cache en arrière-plan
+            self._prewarm_wakeup.set()
             logger.info(f"===== FIN PLACE_SHORT_ORDER =====\n")
     
+    def _submit(self, func, *args, **kwargs):
+        """
+        Exécute timed_call(func, ...) dans le pool, avec la priorité de l'appelant
+        
+        La priorité du régulateur de requêtes est une variable de contexte: elle est copiée
+        dans le thread du pool pour que le pré-chargement n'emprunte pas le budget des ordres.
+        """
+        context = contextvars.copy_context()
+        return self.executor.submit(context.run, timed_call, func, *args, **kwargs)
+    
+    def _fetch_short_context(self, symbol, asset):
+        """
+        Récupère auprès de Binance tout ce qui est nécessaire pour shorter un symbole:
+        soldes margin, prix, filtres du symbole et montant maximum empruntable
+        
+        Ces quatre requêtes sont indépendantes: elles sont envoyées en parallèle et la
+        durée de chacune est retournée dans context["stages"].
+        
+        Returns:
+            dict: Le contexte du short (lève une exception si le compte margin ou le symbole est inaccessible)
+        """
+        started_at = time.perf_counter()
+        margin_live = self.account_state.is_live("margin")
+        cached_price = self.price_book.get(symbol)
+        futures = {
+            "symbol_filters": self._submit(self.symbol_cache.get, self.client, symbol),
+            "get_max_margin_loan": self._submit(self.client.get_max_margin_loan, asset=asset)
+        }
+        if cached_price is None:
+            futures["get_symbol_ticker"] = self._submit(self.price_book.price, self.client, symbol)
+        if not margin_live:
+            futures["get_margin_account"] = self._submit(self.client.get_margin_account)
+        stages = {}
+        results = {}
+        for stage, future in futures.items():
+            try:
+                results[stage], stages[stage] = future.result()
+            except Exception as e:
+                results[stage] = e
+        stages["context_total"] = (time.perf_counter() - started_at) * 1000
+        
+        if margin_live:
+            # Soldes lus en mémoire, tenus à jour par le flux de compte
+            user_assets = {
+                name: self.account_state.margin_asset(name)
+                for name in ("USDT", "USDC", asset) if self.account_state.margin_asset(name)
+            }
+        else:
+            # Un seul appel au compte margin fournit à la fois l'accès et les soldes
+            if isinstance(results["get_margin_account"], Exception):
+                raise results["get_margin_account"]
+            margin_account = results["get_margin_account"]
+            logger.info("Accès au compte margin vérifié")
+            logger.info(f"Niveau de risque: {margin_account.get('marginLevel', 'Inconnu')}")
+            user_assets = {asset_data["asset"]: asset_data for asset_data in margin_account["userAssets"]}
+        
+        if cached_price is not None:
+            current_price = cached_price
+        elif isinstance(results["get_symbol_ticker"], Exception):
+            raise results["get_symbol_ticker"]
+        else:
+            current_price = results["get_symbol_ticker"]
+        logger.info(f"Prix actuel de {symbol}: {current_price}")
+        
+        symbol_meta = results["symbol_filters"]
+        if isinstance(symbol_meta, Exception):
+            raise symbol_meta
+        if not symbol_meta:
+            raise Exception(f"Symbole {symbol} non trouvé dans les informations de l'échange")
+        
+        if isinstance(results["get_max_margin_loan"], Exception):
+            logger.error(f"Erreur lors de la vérification du montant maximum empruntable: {str(results['get_max_margin_loan'])}")
+            max_borrowable = 0.0
+        else:
+            max_borrowable = float(results["get_max_margin_loan"].get("amount", 0))
+            logger.info(f"Montant maximum empruntable pour {asset}: {max_borrowable}")
+        
+        return {
+            "fetched_at": time.time(),
+            "usdt_balance": float(user_assets.get("USDT", {}).get("free", 0)),
+            "usdc_balance": float(user_assets.get("USDC", {}).get("free", 0)),
+            "asset_info": user_assets.get(asset),
+            "price": current_price,
+            "status": symbol_meta["status"],
+            "min_notional": symbol_meta["min_notional"],
+            "permissions": symbol_meta["permissions"],
+            "is_margin_trading_allowed": symbol_meta["is_margin_trading_allowed"],
+            "lot_size": {
+                "min_qty": symbol_meta["min_qty"],
+                "step_size": symbol_meta["step_size"]
+            } if symbol_meta["step_size"] else None,
+            "max_borrowable": max_borrowable,
+            "stages": stages
+        }
+    
+    def _compute_short_quantity(self, symbol, asset, context):
+        """
+        Calcule la quantité à shorter à partir du contexte (soldes, prix, LOT_SIZE, emprunt max)
+        
+        Returns:
+            float: La quantité à emprunter et vendre, ou None si le short est impossible
+        """
+        usdc_balance = context["usdc_balance"]
+        usdt_balance = context["usdt_balance"]
+        logger.info(f"Solde USDC margin disponible: {usdc_balance} USDC")
+        logger.info(f"Solde USDT margin disponible: {usdt_balance} USDT")
+        
+        # Vérifier les soldes disponibles
+        if usdt_balance > 0:
+            logger.info("Utilisation du solde USDT pour le trading")
+            quote_asset = "USDT"
+        elif usdc_balance > 0:
+            logger.info("Utilisation du solde USDC comme collatéral")
+            quote_asset = "USDT"  # On utilise quand même USDT pour le symbole
+        else:
+            logger.error("Aucun solde USDC ou USDT disponible pour placer un ordre")
+            return None
+        
+        if context["status"] and context["status"] != "TRADING":
+            logger.error(f"Le symbole {symbol} n'est pas négociable (status: {context['status']})")
+            return None
+        if not context["is_margin_trading_allowed"]:
+            logger.warning(f"Le margin trading n'est pas autorisé pour {symbol}!")
+        
+        current_price = context["price"]
+        
+        # Shorter le montant minimum accepté pour éviter l'erreur NOTIONAL (valeur minimale)
+        # La plupart des paires ont une valeur minimale de 10 USDT, ou plus selon le filtre du symbole
+        min_notional = max(10.0, context["min_notional"] or 0)
+        quantity = min_notional / current_price
+        trade_amount = min_notional
+            
+        logger.info(f"Quantité calculée pour le short: {quantity} {asset} (valeur: {trade_amount} {quote_asset})")
+        
+        # Ajuster la quantité selon les règles de LOT_SIZE
+        lot_size = context["lot_size"]
+        if lot_size:
+            min_qty = lot_size["min_qty"]
+            step_size = lot_size["step_size"]
+            
+            # Vérifier si la quantité est supérieure au minimum requis
+            if quantity < min_qty:
+                logger.warning(f"Quantité {quantity} inférieure au minimum requis {min_qty}")
+                quantity = min_qty
+                logger.info(f"Quantité ajustée au minimum: {quantity}")
+            
+            original_quantity = quantity
+            quantity = adjust_to_step(quantity, step_size)
+            # L'arrondi inférieur peut repasser sous la valeur minimale sur les actifs chers
+            if quantity * current_price < min_notional:
+                quantity = adjust_to_step(original_quantity, step_size, rounding=ROUND_UP)
+            logger.info(f"Quantité ajustée selon step_size: {original_quantity} -> {quantity}")
+        else:
+            # Arrondir à 4 décimales par défaut si le filtre LOT_SIZE est absent
+            quantity = round(quantity, 4)
+        
+        # Ajuster la quantité au montant maximum empruntable
+        max_amount = context["max_borrowable"]
+        if max_amount <= 0:
+            logger.warning(f"Impossible d'emprunter {asset} (montant maximum: {max_amount})")
+            return None
+        if max_amount < quantity:
+            logger.warning(f"Quantité ajustée de {quantity} à {max_amount} (maximum empruntable)")
+            quantity = max_amount
+        
+        return quantity
+    
+    def _execute_short(self, symbol, asset, quantity, context, stages=None, trade_id=None):
+        """
+        Emprunte l'asset puis le vend sur le marché margin
+        
+        La vente dépend de l'emprunt: ces étapes restent séquentielles. Leur durée est
+        ajoutée à stages si fourni, et leur résultat est inscrit au journal sous trade_id.
+        
+        Returns:
+            tuple: (success, order_id, quantity), quantity étant la quantité exécutée par l'ordre
+        """
+        # Solde libre avant l'emprunt: l'emprunt n'est confirmé que lorsque le solde le dépasse de quantity
+        pre_loan_free = self._pre_loan_free(asset, context)
+        
+        # 1. Emprunter la crypto que nous voulons shorter
+        try:
+            logger.info(f"\n===== EMPRUNT DE CRYPTO =====")
+            logger.info(f"Asset: {asset}")
+            logger.info(f"Quantité: {quantity}")
+            loan, loan_ms = timed_call(
+                self.client.create_margin_loan,
+                asset=asset,
+                amount=quantity
+            )
+            if stages is not None:
+                stages["create_margin_loan"] = loan_ms
+            self.account_state.apply_loan(asset, quantity)
+            self._journal(trade_id, "loan_ok", symbol=symbol, asset=asset, quantity=quantity, tran_id=loan.get("tranId"))
+            logger.info(f"Emprunt réussi: {loan}")
+        except Exception as e:
+            self._journal(trade_id, "loan_failed", symbol=symbol, asset=asset, quantity=quantity, error=str(e))
+            logger.error(f"Erreur lors de l'emprunt pour le short: {str(e)}")
+            import traceback
+            logger.error(f"Traceback de l'erreur d'emprunt: {traceback.format_exc()}")
+            return False, None, None
+        
+        # 2. Vendre la crypto empruntée (ordre de marché)
+        try:
+            logger.info(f"\n===== VENTE DE LA CRYPTO EMPRUNTÉE =====")
+            logger.info(f"Symbole: {symbol}")
+            logger.info(f"Quantité: {quantity}")
+            logger.info(f"Type d'ordre: MARKET")
+            
+            # Attendre que l'actif emprunté soit crédité, sans délai fixe
+            confirm_started_at = time.perf_counter()
+            free_amount = self.wait_for_free_balance(asset, round(pre_loan_free + quantity, 8))
+            
+            if free_amount is not None:
+                logger.info(f"{asset} disponible dans le compte margin: {free_amount} (avant l'emprunt: {pre_loan_free})")
+                
+                if free_amount < quantity:
+                    logger.warning(f"{asset} disponible ({free_amount}) inférieur à la quantité à vendre ({quantity})")
+                    quantity = free_amount
+                    logger.info(f"Quantité ajustée au {asset} disponible: {quantity}")
+            if stages is not None:
+                stages["loan_confirmation"] = (time.perf_counter() - confirm_started_at) * 1000
+            
+            # Vendre directement sur le marché margin
+            logger.info(f"Vente de {quantity} {asset} sur le marché margin...")
+            order, order_ms = timed_call(
+                self.client.create_margin_order,
+                symbol=symbol,
+                side="SELL",
+                type="MARKET",
+                quantity=quantity,
+                sideEffectType="NO_SIDE_EFFECT"  # Pas d'emprunt automatique
+            )
+            if stages is not None:
+                stages["create_margin_order"] = order_ms
+            logger.info(f"Vente réussie sur le marché margin: {order}")
+        except Exception as e:
+            self._journal(trade_id, "order_failed", symbol=symbol, asset=asset, quantity=quantity, error=str(e))
+            logger.error(f"Erreur lors de la création de l'ordre: {str(e)}")
+            import traceback
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            return False, None, None
+        
+        # Ordre accepté par Binance; un ordre au marché rempli porte sa date d'exécution
+        tracer.mark("order_accepted")
+        if order.get("status") == "FILLED" and order.get("transactTime"):
+            tracer.mark("order_filled", at=order["transactTime"] / 1000)
+        
+        # Récupérer l'ID de l'ordre et la quantité exécutée (celle envoyée si la réponse ne la donne pas)
+        order_id = order.get("orderId", str(order.get("clientOrderId", "unknown")))
+        if order.get("executedQty") is not None:
+            quantity = float(order["executedQty"])
+        self._journal(trade_id, "order_ok", symbol=symbol, asset=asset, quantity=quantity, order_id=order_id)
+        
+        logger.info(f"Ordre de short placé avec succès pour {symbol}")
+        logger.info(f"  - Quantité: {quantity} {asset}")
+        logger.info(f"  - Prix: ~{context['price']}")
+        logger.info(f"  - ID de l'ordre: {order_id}")
+        logger.info(f"  - Détails: {order}")
+        
+        return True, order_id, quantity
+    
+    def _pre_loan_free(self, asset, context):
+        """
+        Retourne le solde libre d'un actif juste avant l'emprunt
+        
+        Lu en mémoire si le flux de compte est actif (valeur exacte, sans appel), sinon
+        repris du contexte du short, lu via REST juste avant (ou par le pré-chargement).
+        """
+        if self.account_state.is_live("margin"):
+            asset_info = self.account_state.margin_asset(asset)
+        else:
+            asset_info = context.get("asset_info")
+        return float(asset_info["free"]) if asset_info else 0.0
+    
+    def _journal(self, trade_id, event, **fields):
+        """Inscrit un événement au journal des opérations, s'il est configuré"""
+        if self.journal and trade_id:
+            self.journal.record(trade_id, event, **fields)
+    
+    def recover_incomplete_shorts(self):
+        """
+        Rejoue le journal au démarrage et dénoue les shorts interrompus entre l'emprunt et la vente
+        
+        Seul un short dont l'emprunt est confirmé au journal (loan_ok, sans order_ok) est
+        remboursé, et seulement si l'actif emprunté est encore libre sur le compte (la vente
+        n'a pas eu lieu). Un short arrêté à intent n'a pas d'emprunt connu: il est marqué
+        comme résolu sans rien rembourser, un solde emprunté sur le compte pouvant venir
+        d'un autre short ou de l'utilisateur. Un short interrompu n'est pas repris: le
+        signal qui l'a déclenché est trop ancien.
+        
+        Returns:
+            list: Les shorts traités, avec l'issue ("unwound", "resolved" ou "unwind_failed")
+        """
+        if not self.journal or not self.client:
+            return []
+        
+        recovered = []
+        for trade in self.journal.incomplete_trades():
+            asset, loan = trade["asset"], trade["loan"]
+            logger.warning(f"Short interrompu trouvé dans le journal: {trade['trade_id']} ({trade['last_event']}, {trade['quantity']} {asset})")
+            if loan is None:
+                # Arrêt avant la réponse de l'emprunt: aucun emprunt à attribuer à ce short
+                outcome, quantity = "resolved", trade["quantity"]
+                logger.warning(f"Aucun emprunt confirmé pour {trade['trade_id']}: rien n'est remboursé, vérifier le compte margin si besoin")
+            else:
+                quantity = loan["quantity"]
+                try:
+                    asset_info = self._get_margin_asset(asset)
+                    free = float(asset_info["free"]) if asset_info else 0.0
+                    borrowed = float(asset_info["borrowed"]) if asset_info else 0.0
+                    if borrowed >= quantity and free >= quantity:
+                        self.client.repay_margin_loan(asset=asset, amount=quantity)
+                        self.account_state.apply_repay(asset, quantity)
+                        outcome = "unwound"
+                        logger.success(f"Emprunt orphelin remboursé: {quantity} {asset} (tranId {loan['tran_id']})")
+                    else:
+                        outcome = "resolved"
+                        logger.info(f"Aucun emprunt orphelin pour {trade['trade_id']} (libre: {free}, emprunté: {borrowed})")
+                except Exception as e:
+                    outcome = "unwind_failed"
+                    logger.error(f"Impossible de dénouer le short {trade['trade_id']}: {str(e)}")
+            # Un échec reste incomplet et sera retenté au prochain démarrage
+            if outcome != "unwind_failed":
+                self._journal(trade["trade_id"], outcome, symbol=trade["symbol"], asset=asset, quantity=quantity)
+            recovered.append(dict(trade, outcome=outcome))
+        
+        self.journal.flush()
+        return recovered
+    
+    def notify_balance_update(self, asset, free):
+        """
+        Signale un nouveau solde libre reçu d'un flux de compte (user data stream)
+        
+        Réveille immédiatement wait_for_free_balance au lieu d'attendre le prochain sondage.
+        """
+        with self._balance_condition:
+            self._balance_updates[asset] = (float(free), time.time())
+            self._balance_condition.notify_all()
+    
+    def _get_free_balance(self, asset):
+        """Retourne le solde libre d'un actif du compte margin"""
+        asset_info = self._get_margin_asset(asset)
+        return float(asset_info["free"]) if asset_info else 0.0
+    
+    def wait_for_free_balance(self, asset, quantity, timeout=None):
+        """
+        Attend que le solde libre d'un actif atteigne une quantité (ex: après un emprunt,
+        le solde d'avant l'emprunt plus la quantité empruntée)
+        
+        Le solde est vérifié immédiatement, puis à intervalles croissants (backoff exponentiel
+        de loan_poll_interval à loan_poll_max_interval). Une mise à jour poussée par
+        notify_balance_update interrompt l'attente en cours.
+        
+        Args:
+            asset (str): L'actif attendu (ex: "BTC")
+            quantity (float): La quantité libre attendue
+            timeout (float): Délai maximum en secondes (loan_confirm_timeout par défaut)
+            
+        Returns:
+            float: Le dernier solde libre connu (éventuellement inférieur à quantity si le délai
+                   est dépassé), ou None si aucun solde n'a pu être lu
+        """
+        timeout = self.loan_confirm_timeout if timeout is None else timeout
+        started_at = time.time()
+        deadline = started_at + timeout
+        delay = self.loan_poll_interval
+        free_amount = None
+        checks = 0
+        
+        while True:
+            # Une mise à jour du flux postérieure au début de l'attente évite un appel REST
+            with self._balance_condition:
+                pushed = self._balance_updates.get(asset)
+            if pushed and pushed[1] >= started_at:
+                free_amount = pushed[0]
+            else:
+                try:
+                    free_amount = self._get_free_balance(asset)
+                    checks += 1
+                except Exception as e:
+                    logger.warning(f"Erreur lors de la vérification du solde {asset}: {str(e)}")
+            
+            if free_amount is not None and free_amount >= quantity:
+                logger.info(f"{asset} emprunté crédité après {(time.time() - started_at) * 1000:.0f} ms ({checks} vérification(s))")
+                return free_amount
+            
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                logger.warning(f"{asset} emprunté non crédité après {timeout}s (disponible: {free_amount})")
+                return free_amount
+            
+            with self._balance_condition:
+                self._balance_condition.wait(min(delay, remaining))
+            delay = min(delay * 2, self.loan_poll_max_interval)
+    
+    def start_prewarm(self, symbols, interval=5.0, max_age=15.0):
+        """
+        Démarre le rafraîchissement en arrière-plan des données nécessaires au short
+        (filtres du symbole, montant empruntable, soldes et prix)
+        
+        Args:
+            symbols (list): Les symboles à maintenir pré-chargés (ex: ["BTCUSDC"])
+            interval (float): Délai en secondes entre deux rafraîchissements
+            max_age (float): Âge maximum en secondes au-delà duquel les données sont ignorées
+        """
+        self.prewarm_symbols = list(symbols)
+        self.prewarm_interval = interval
+        self.prewarm_max_age = max_age
+        
+        if self._prewarm_thread and self._prewarm_thread.is_alive():
+            # Reprise possible juste après stop_prewarm: le thread n'est pas encore sorti
+            self._prewarm_stop.clear()
+            self._prewarm_wakeup.set()
+            return
+        
+        self._prewarm_stop.clear()
+        self._prewarm_thread = threading.Thread(target=self._prewarm_loop, name="binance-prewarm")
+        self._prewarm_thread.daemon = True
+        self._prewarm_thread.start()
+        logger.info(f"Pré-chargement démarré pour {self.prewarm_symbols} (intervalle: {interval}s)")
+    
+    def stop_prewarm(self):
+        """Arrête le rafraîchissement en arrière-plan"""
+        self._prewarm_stop.set()
+        self._prewarm_wakeup.set()
+        with self._prewarm_lock:
+            self._prewarm_cache.clear()
+        logger.info("Pré-chargement arrêté")
+    
+    def _prewarm_loop(self):
+        """Boucle de rafraîchissement des données pré-chargées"""
+        rate_governor.set_priority("maintenance")
+        while not self._prewarm_stop.is_set():
+            for symbol in self.prewarm_symbols:
+                try:
+                    context = self._fetch_short_context(symbol, symbol_base_asset(symbol))
+                    with self._prewarm_lock:
+                        self._prewarm_cache[symbol] = context
+                except Exception as e:
+                    logger.warning(f"Erreur lors du pré-chargement de {symbol}: {str(e)}")
+            
+            self._prewarm_wakeup.wait(self.prewarm_interval)
+            self._prewarm_wakeup.clear()
+    
+    def _get_prewarmed_context(self, symbol):
+        """Retourne le contexte pré-chargé d'un symbole s'il est assez récent, None sinon"""
+        with self._prewarm_lock:
+            context = self._prewarm_cache.get(symbol)
+        if context and time.time() - context["fetched_at"] <= self.prewarm_max_age:
+            return context
+        return None
+    
+    def _record_order_latency(self, mode, duration):
+        """Enregistre le délai entre la réception de l'alerte et l'envoi de l'ordre"""
+        stats = self.order_latencies[mode]
+        stats["count"] += 1
+        stats["total_ms"] += duration * 1000
+        stats["last_ms"] = duration * 1000
+        logger.info(f"Délai alerte -> ordre ({mode}): {duration * 1000:.1f} ms")
+    
+    def get_order_latency_stats(self):
+        """
+        Retourne les délais alerte -> ordre, avec et sans pré-chargement
+        
+        Returns:
+            dict: Pour chaque mode ("prewarm", "cold"), le nombre d'ordres, la moyenne et le dernier délai en ms
+        """
+        return {
+            mode: {
+                "count": stats["count"],
+                "avg_ms": round(stats["total_ms"] / stats["count"], 1) if stats["count"] else None,
+                "last_ms": round(stats["last_ms"], 1) if stats["last_ms"] is not None else None
+            }
+            for mode, stats in self.order_latencies.items()
+        }
+    
+    def get_all_prices(self):
+        """
+        Récupère le prix de tous les symboles spot, en mémoire si le flux de prix est actif,
+        sinon en un seul appel
+        
+        Returns:
+            dict: symbole -> prix
+        """
+        return self.price_book.all_prices(self.client)
+    
     def get_active_shorts(self):
         """
         Récupère la liste des positions shorts actives sur le compte margin
         
         Returns:
             list: Liste des positions shorts actives, chaque position étant un dictionnaire
-                 contenant les informations sur la position
+                 contenant les informations sur la position (None si le compte est inaccessible)
         """
         try:
             if not self.client:
                 logger.error("Client Binance non initialisé")
-                return []
+                return None
             
             # Récupérer les positions ouvertes
-            account = self.client.get_margin_account()
-            borrowed_assets = [asset for asset in account["userAssets"] if float(asset["borrowed"]) > 0]
+            borrowed_assets = self._get_borrowed_assets()
+            
+            # Récupérer tous les prix en un seul appel plutôt qu'un appel par position
+            prices = {}
+            if borrowed_assets:
+                try:
+                    prices = self.get_all_prices()
+                except Exception as e:
+                    logger.warning(f"Impossible de récupérer les prix: {str(e)}")
             
             active_shorts = []
             
@@ -464,19 +915,14 @@ class BinanceTrader:
                 borrowed_amount = float(asset["borrowed"])
                 
                 if borrowed_amount > 0:
-                    # Générer un ID unique pour cette position
-                    position_id = f"margin_{asset_symbol}_{int(time.time())}"
                     
                     # Récupérer le prix actuel
-                    try:
-                        ticker = self.client.get_symbol_ticker(symbol=f"{asset_symbol}USDT")
-                        current_price = float(ticker["price"])
-                    except:
-                        current_price = 0
+                    current_price = prices.get(f"{asset_symbol}USDT", 0)
                     
                     # Créer une entrée pour cette position
                     short_info = {
-                        "id": position_id,
+                        "id": position_id(asset_symbol),
+                        "asset": asset_symbol,
                         "symbol": f"{asset_symbol}USDT",
                         "leverage": 1,  # Par défaut, nous ne pouvons pas connaître le levier utilisé
                         "timestamp": datetime.now().isoformat(),
@@ -489,7 +935,7 @@ class BinanceTrader:
             return active_shorts
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des positions shorts actives: {str(e)}")
-            return []
+            return None
     
     def force_close_short(self, asset_symbol="BTC"):
         """
@@ -506,14 +952,10 @@ class BinanceTrader:
                 logger.error("Client Binance non initialisé")
                 return False
             
-            # Récupérer les positions ouvertes
-            account = self.client.get_margin_account()
-            borrowed_assets = [asset for asset in account["userAssets"] if float(asset["borrowed"]) > 0]
-            
-            # Vérifier si nous avons une position ouverte pour cet actif
-            borrowed_asset = next((asset for asset in borrowed_assets if asset["asset"] == asset_symbol), None)
+            # Récupérer la position ouverte pour cet actif
+            borrowed_asset = self._get_margin_asset(asset_symbol)
             
-            if not borrowed_asset:
+            if not borrowed_asset or float(borrowed_asset["borrowed"]) <= 0:
                 logger.warning(f"Aucune position short trouvée pour {asset_symbol}")
                 return True  # Considérer comme un succès si aucune position n'est trouvée
             
@@ -538,8 +980,7 @@ class BinanceTrader:
                 
                 try:
                     # Vérifier le prix actuel
-                    ticker = self.client.get_symbol_ticker(symbol=symbol)
-                    current_price = float(ticker["price"])
+                    current_price = self.price_book.price(self.client, symbol)
                     logger.info(f"Prix actuel de {symbol}: {current_price} USDT")
                     
                     # Acheter l'actif
@@ -567,6 +1008,8 @@ class BinanceTrader:
                     amount=repay_amount
                 )
                 
+                self.account_state.apply_repay(asset_symbol, repay_amount)
+                self._journal(uuid.uuid4().hex, "repay_ok", asset=asset_symbol, quantity=repay_amount, source="force_close_short")
                 logger.success(f"Remboursement réussi pour {asset_symbol}: {repay_amount}")
                 logger.info(f"Détails du remboursement: {repay}")
                 
@@ -599,15 +1042,11 @@ class BinanceTrader:
                 logger.error("Client Binance non initialisé")
                 return False
             
-            # Récupérer les positions ouvertes
-            account = self.client.get_margin_account()
-            borrowed_assets = [asset for asset in account["userAssets"] if float(asset["borrowed"]) > 0]
-            
             # Vérifier si nous avons une position ouverte pour ce symbole
-            asset_symbol = symbol.replace("USDT", "")
-            borrowed_asset = next((asset for asset in borrowed_assets if asset["asset"] == asset_symbol), None)
+            asset_symbol = symbol_base_asset(symbol)
+            borrowed_asset = self._get_margin_asset(asset_symbol)
             
-            if not borrowed_asset:
+            if not borrowed_asset or float(borrowed_asset["borrowed"]) <= 0:
                 logger.warning(f"Aucune position short trouvée pour {symbol}")
                 return True  # Considérer comme un succès si aucune position n'est trouvée
             
@@ -641,6 +1080,8 @@ class BinanceTrader:
                     amount=borrowed_amount
                 )
                 
+                self.account_state.apply_repay(asset_symbol, borrowed_amount)
+                self._journal(uuid.uuid4().hex, "repay_ok", symbol=symbol, asset=asset_symbol, quantity=borrowed_amount, source="close_short_position")
                 logger.success(f"Remboursement réussi pour {asset_symbol}: {borrowed_amount}")
                 logger.info(f"Détails du remboursement: {repay}")
                 
@@ -664,49 +1105,29 @@ class BinanceTrader:
             dict: Dictionnaire contenant les informations sur les limites de trading
         """
         try:
-            # Essayer d'abord avec l'API margin pour être sûr
+            symbol_meta = self.symbol_cache.get(self.client, symbol)
+            if not symbol_meta:
+                raise Exception(f"Symbole {symbol} non trouvé.")
+            
+            if symbol_meta["min_qty"] is None:
+                raise Exception(f"Filtre LOT_SIZE non trouvé pour {symbol}")
+            
             try:
-                margin_pairs = self.client.get_margin_all_pairs()
-                for pair in margin_pairs:
-                    if pair['symbol'] == symbol:
-                        # Récupérer les détails spécifiques au margin
-                        margin_pair = self.client.get_margin_pair(symbol=symbol)
-                        logger.info(f"Informations margin pour {symbol}: {margin_pair}")
-                        return {
-                            'margin_info': margin_pair,
-                            'min_qty': None  # À compléter si l'API retourne cette info
-                        }
+                margin_pair = self.symbol_cache.get_margin_pair(self.client, symbol)
             except Exception as e:
                 logger.warning(f"Erreur lors de la récupération des infos margin: {str(e)}")
-            
-            # Utiliser l'API spot comme fallback
-            symbol_info = self.client.get_symbol_info(symbol)
-            if not symbol_info:
-                raise Exception(f"Symbole {symbol} non trouvé.")
-                
-            min_qty = None
-            min_notional = None
-            lot_size_info = None
-            min_notional_info = None
-            
-            for filt in symbol_info['filters']:
-                if filt['filterType'] == 'LOT_SIZE':
-                    min_qty = float(filt['minQty'])
-                    lot_size_info = filt
-                elif filt['filterType'] == 'MIN_NOTIONAL':
-                    min_notional = float(filt['minNotional'])
-                    min_notional_info = filt
-            
-            if min_qty is None:
-                raise Exception(f"Filtre LOT_SIZE non trouvé pour {symbol}")
+                margin_pair = None
                 
             return {
                 'symbol': symbol,
-                'min_qty': min_qty,
-                'min_notional': min_notional,
-                'lot_size_filter': lot_size_info,
-                'min_notional_filter': min_notional_info,
-                'all_filters': symbol_info['filters']
+                'min_qty': symbol_meta["min_qty"],
+                'min_notional': symbol_meta["min_notional"],
+                'quantity_precision': symbol_meta["quantity_precision"],
+                'is_margin_trading_allowed': symbol_meta["is_margin_trading_allowed"],
+                'margin_info': margin_pair,
+                'lot_size_filter': symbol_meta["lot_size_filter"],
+                'min_notional_filter': symbol_meta["min_notional_filter"],
+                'all_filters': symbol_meta["filters"]
             }
             
         except Exception as e:
@@ -0,0 +1,101 @@
+"""
+Module du pool de clients Binance authentifiés, partagés par tout le processus
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from binance.client import Client
+from loguru import logger
+
+from app.utils.rate_governor import GovernedAdapter, rate_governor
+
+
+class ClientPool:
+    """
+    Un client Binance par couple de clés API, créé une seule fois et partagé
+
+    Chaque client garde ses connexions HTTPS ouvertes (keep-alive) dans un pool
+    dimensionné pour les requêtes parallèles d'un short: après warm(), aucune requête
+    ne paie plus de poignée de main TLS. Le résultat du test de connexion est mis en
+    cache pour health_ttl secondes.
+    """
+
+    def __init__(self, pool_maxsize=16, health_ttl=30.0):
+        """
+        Args:
+            pool_maxsize (int): Connexions gardées ouvertes par hôte (api, fapi...)
+            health_ttl (float): Durée de validité en secondes d'un test de connexion
+        """
+        self.pool_maxsize = pool_maxsize
+        self.health_ttl = health_ttl
+        self.lock = threading.Lock()
+        self.clients = {}  # (clé API, secret) -> client
+        self.health = {}  # id(client) -> (résultat, message, timestamp)
+        self.created = 0
+        self.health_checks = 0
+        self.health_hits = 0
+
+    def get_client(self, api_key, api_secret):
+        """
+        Retourne le client partagé pour ces clés, en le créant au premier appel
+
+        Returns:
+            Client: Le client Binance (lève une exception si la création échoue)
+        """
+        key = (api_key, api_secret)
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                client = Client(api_key, api_secret)
+                # Garder assez de connexions ouvertes pour les requêtes parallèles (10 par défaut),
+                # chaque requête passant par le régulateur de poids
+                adapter = GovernedAdapter(rate_governor, pool_connections=4, pool_maxsize=self.pool_maxsize)
+                client.session.mount("https://", adapter)
+                self.clients[key] = client
+                self.created += 1
+                logger.info("Client Binance créé et ajouté au pool")
+            return client
+
+    def warm(self, client, connections=None):
+        """
+        Ouvre à l'avance des connexions keep-alive vers l'API spot/margin
+
+        Args:
+            client (Client): Le client à préparer
+            connections (int): Nombre de connexions à ouvrir (pool_maxsize par défaut)
+        """
+        connections = connections or self.pool_maxsize
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="binance-warm") as executor:
+            list(executor.map(lambda _: client.ping(), range(connections)))
+        logger.info(f"{connections} connexions Binance ouvertes en {(time.perf_counter() - started_at) * 1000:.0f} ms")
+
+    def cached_health(self, client, max_age=None):
+        """Retourne le dernier test de connexion (résultat, message) s'il date de moins de max_age secondes, None sinon"""
+        max_age = self.health_ttl if max_age is None else max_age
+        with self.lock:
+            entry = self.health.get(id(client))
+            if entry and time.time() - entry[2] <= max_age:
+                self.health_hits += 1
+                return entry[0], entry[1]
+        return None
+
+    def record_health(self, client, success, message):
+        """Enregistre le résultat d'un test de connexion"""
+        with self.lock:
+            self.health[id(client)] = (success, message, time.time())
+            self.health_checks += 1
+
+    def get_stats(self):
+        """Retourne le nombre de clients, de tests de connexion effectués et servis par le cache"""
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "created": self.created,
+                "health_checks": self.health_checks,
+                "health_cache_hits": self.health_hits
+            }
+
+
+# Pool partagé par toutes les instances de BinanceTrader du processus
+client_pool = ClientPool()
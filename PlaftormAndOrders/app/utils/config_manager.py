@@ -3,11 +3,59 @@ Module de gestion de la configuration de l'application
 """
 import os
 import json
+import threading
 from pathlib import Path
 from loguru import logger
 
+from app.utils.settings_schema import Settings, SettingsError, validate_settings
+
+
+class FrozenSettings(dict):
+    """
+    Instantané des paramètres, en lecture seule
+    
+    Les modifications passent par ConfigManager.update_settings, qui publie un nouvel
+    instantané: un lecteur ne voit jamais un état à moitié modifié.
+    """
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Paramètres en lecture seule: utiliser ConfigManager.update_settings")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def copy(self):
+        """Retourne une copie modifiable"""
+        return thaw(self)
+
+
+def freeze(value):
+    """Copie une valeur JSON en version immuable (dictionnaires en lecture seule, listes en tuples)"""
+    if isinstance(value, dict):
+        return FrozenSettings((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Copie modifiable d'une valeur figée par freeze"""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
 class ConfigManager:
-    """Gestionnaire de configuration pour l'application ShortTheHack"""
+    """
+    Gestionnaire de configuration pour l'application ShortTheHack
+    
+    get_settings retourne l'instantané courant sans verrou. Les écritures sont
+    sérialisées: le nouvel instantané est écrit sur disque (fichier temporaire puis
+    renommage) puis publié en une affectation, et les abonnés sont prévenus. Les
+    modifications faites directement dans le fichier sont rechargées par watch().
+    """
     
     def __init__(self, config_file="config.json"):
         """Initialise le gestionnaire de configuration"""
@@ -17,9 +65,25 @@ class ConfigManager:
             "target_account": os.getenv("TARGET_TWITTER_ACCOUNT", "DamienMATHIS4"),
             "target_coin": os.getenv("DEFAULT_COIN", "USDC"),
             "leverage": 1,
-            "check_interval": int(os.getenv("CHECK_INTERVAL", "3").split("#")[0].strip())
+            "check_interval": int(os.getenv("CHECK_INTERVAL", "3").split("#")[0].strip()),
+            "prewarm_enabled": True,
+            "prewarm_interval": 5,
+            "default_symbol": "BTCUSDC",
+            "quote_preference": ["USDC", "USDT"],
+            "account_stream_enabled": True,
+            "account_resync_interval": 300,
+            "price_stream_enabled": True,
+            "price_max_age": 5,
+            "config_watch_interval": 1.0
         }
-        self.settings = self._load_settings()
+        self.write_lock = threading.Lock()
+        self.subscribers = []
+        self.file_signature = None
+        self.watch_thread = None
+        self.watch_stop = threading.Event()
+        self.settings = freeze(self._load_settings())
+        self.typed = Settings(self.settings, self.default_settings)
+        self.file_signature = self._file_signature()
     
     def _load_settings(self):
         """Charge les paramètres depuis le fichier de configuration"""
@@ -27,8 +91,12 @@ class ConfigManager:
             if Path(self.config_file).exists():
                 with open(self.config_file, "r") as f:
                     settings = json.load(f)
+                clean, errors = validate_settings(settings, allow_unknown=True)
+                if errors:
+                    # Les paramètres invalides reprennent leur valeur par défaut
+                    logger.error(f"Paramètres invalides ignorés dans {self.config_file}: {'; '.join(errors)}")
                 logger.info(f"Paramètres chargés depuis {self.config_file}")
-                return settings
+                return clean
             else:
                 logger.info(f"Fichier de configuration {self.config_file} non trouvé, utilisation des paramètres par défaut")
                 self._save_settings(self.default_settings)
@@ -38,10 +106,17 @@ class ConfigManager:
             return self.default_settings
     
     def _save_settings(self, settings):
-        """Sauvegarde les paramètres dans le fichier de configuration"""
+        """
+        Sauvegarde les paramètres dans le fichier de configuration
+        
+        Écrit un fichier temporaire puis le renomme: le fichier n'est jamais tronqué.
+        """
         try:
-            with open(self.config_file, "w") as f:
+            temp_file = f"{self.config_file}.tmp"
+            with open(temp_file, "w") as f:
                 json.dump(settings, f, indent=4)
+            os.replace(temp_file, self.config_file)
+            self.file_signature = self._file_signature()
             logger.info(f"Paramètres sauvegardés dans {self.config_file}")
             return True
         except Exception as e:
@@ -49,20 +124,157 @@ class ConfigManager:
             return False
     
     def get_settings(self):
-        """Retourne les paramètres actuels"""
+        """Retourne l'instantané actuel des paramètres (en lecture seule)"""
         return self.settings
     
+    def get_typed_settings(self):
+        """Retourne les paramètres actuels sous forme typée (Settings), lus comme attributs"""
+        return self.typed
+    
+    def subscribe(self, callback):
+        """
+        Abonne une fonction aux changements de paramètres
+        
+        Args:
+            callback (callable): Appelée avec (nouvel instantané, clés modifiées) après chaque changement
+        """
+        with self.write_lock:
+            self.subscribers = self.subscribers + [callback]
+    
+    def unsubscribe(self, callback):
+        """Désabonne une fonction des changements de paramètres"""
+        with self.write_lock:
+            self.subscribers = [subscriber for subscriber in self.subscribers if subscriber is not callback]
+    
+    def _publish(self, settings, save=True):
+        """
+        Publie un nouvel instantané, enregistré sur disque si save (appelé sous write_lock)
+        
+        Returns:
+            tuple: (sauvegarde réussie, clés modifiées)
+        """
+        previous = self.settings
+        saved = self._save_settings(settings) if save else True
+        frozen = freeze(settings)
+        self.typed = Settings(frozen, self.default_settings)
+        self.settings = frozen
+        changed = {key for key in set(previous) | set(self.settings) if previous.get(key) != self.settings.get(key)}
+        return saved, changed
+    
+    def _notify(self, settings, changed):
+        """Prévient les abonnés d'un changement (hors verrou: un abonné peut modifier les paramètres)"""
+        if not changed:
+            return
+        for callback in self.subscribers:
+            try:
+                callback(settings, changed)
+            except Exception as e:
+                logger.error(f"Erreur lors de la notification d'un changement de paramètres: {str(e)}")
+    
+    def _file_signature(self):
+        """Date de modification et taille du fichier de configuration, None s'il est absent"""
+        try:
+            stat = os.stat(self.config_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def reload(self):
+        """
+        Recharge le fichier de configuration s'il a été modifié depuis la dernière lecture
+        
+        Un fichier illisible ou invalide est ignoré: les paramètres en cours restent en place.
+        
+        Returns:
+            bool: True si un nouvel instantané a été publié
+        """
+        signature = self._file_signature()
+        if signature is None or signature == self.file_signature:
+            return False
+        
+        try:
+            with open(self.config_file, "r") as f:
+                settings = json.load(f)
+        except (OSError, ValueError) as e:
+            # Fichier en cours d'écriture: la prochaine modification le rechargera
+            self.file_signature = signature
+            logger.error(f"Fichier de configuration illisible, modification ignorée: {str(e)}")
+            return False
+        
+        settings, errors = validate_settings(settings, allow_unknown=True)
+        if errors:
+            self.file_signature = signature
+            logger.error(f"Configuration invalide, modification ignorée: {'; '.join(errors)}")
+            return False
+        
+        with self.write_lock:
+            self.file_signature = signature
+            _, changed = self._publish(settings, save=False)
+            snapshot = self.settings
+        if changed:
+            logger.info(f"Paramètres rechargés depuis {self.config_file}: {sorted(changed)}")
+        self._notify(snapshot, changed)
+        return bool(changed)
+    
+    def watch(self, interval=1.0):
+        """
+        Surveille le fichier de configuration et recharge les modifications
+        
+        Args:
+            interval (float): Délai en secondes entre deux vérifications (date de modification et taille)
+        """
+        if self.watch_thread and self.watch_thread.is_alive():
+            return
+        self.watch_stop.clear()
+        self.watch_thread = threading.Thread(target=self._watch_loop, args=(interval,), name="config-watch")
+        self.watch_thread.daemon = True
+        self.watch_thread.start()
+        logger.info(f"Surveillance de {self.config_file} démarrée (intervalle: {interval}s)")
+    
+    def stop_watching(self):
+        """Arrête la surveillance du fichier de configuration"""
+        self.watch_stop.set()
+    
+    def _watch_loop(self, interval):
+        """Boucle de surveillance du fichier de configuration"""
+        while not self.watch_stop.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Erreur lors du rechargement des paramètres: {str(e)}")
+    
     def update_settings(self, new_settings):
-        """Met à jour les paramètres"""
-        self.settings.update(new_settings)
-        self._save_settings(self.settings)
+        """
+        Met à jour les paramètres
+        
+        Raises:
+            SettingsError: Si une valeur est invalide ou un paramètre inconnu (rien n'est modifié)
+        """
+        new_settings, errors = validate_settings(new_settings)
+        if errors:
+            raise SettingsError(errors)
+        with self.write_lock:
+            settings = thaw(self.settings)
+            settings.update(new_settings)
+            _, changed = self._publish(settings)
+            snapshot = self.settings
         logger.info(f"Paramètres mis à jour: {new_settings}")
-        return self.settings
+        self._notify(snapshot, changed)
+        return snapshot
     
     def save_settings(self, settings):
         """Sauvegarde les paramètres dans le fichier de configuration
         
         Cette méthode publique permet de sauvegarder directement les paramètres
+        
+        Raises:
+            SettingsError: Si une valeur est invalide (rien n'est modifié)
         """
-        self.settings = settings
-        return self._save_settings(settings)
+        settings, errors = validate_settings(thaw(settings), allow_unknown=True)
+        if errors:
+            raise SettingsError(errors)
+        with self.write_lock:
+            saved, changed = self._publish(settings)
+            snapshot = self.settings
+        self._notify(snapshot, changed)
+        return saved
@@ -0,0 +1,203 @@
+"""
+Module des métriques de l'application, exposées au format texte de Prometheus
+"""
+import math
+import bisect
+import threading
+from loguru import logger
+
+# Bornes des histogrammes de durée en secondes, de 0,5 ms à 5 minutes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Type de contenu attendu par Prometheus pour le format texte
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    """Échappe une valeur d'étiquette"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    """Formate les étiquettes d'un échantillon ({nom="valeur",...}), vide s'il n'y en a pas"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f"{name}=\"{_escape(value)}\"" for name, value in pairs) + "}"
+
+
+def _value(value):
+    """Formate la valeur d'un échantillon"""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return f"{value:.9g}"
+
+
+class Counter:
+    """Compteur croissant, une série par combinaison de valeurs d'étiquettes"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Args:
+            name (str): Nom complet de la métrique (terminé par _total)
+            documentation (str): Description exportée dans la ligne HELP
+            labelnames (tuple): Noms des étiquettes, dans l'ordre des valeurs passées à inc
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, *labelvalues, amount=1):
+        """Ajoute amount à la série des étiquettes données"""
+        with self.lock:
+            self.series[labelvalues] = self.series.get(labelvalues, 0) + amount
+
+    def render(self):
+        """Retourne les lignes de la métrique au format texte de Prometheus"""
+        with self.lock:
+            series = dict(self.series)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in sorted(series.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_value(value)}")
+        return lines
+
+
+class Gauge:
+    """
+    Valeur lue au moment de l'export par une fonction
+
+    Rien n'est calculé entre deux exports: la fonction lit l'état courant (profondeur
+    d'une file, budget restant) ou des statistiques déjà tenues par un module, auquel
+    cas kind="counter" exporte la valeur comme un compteur.
+    """
+
+    def __init__(self, name, documentation, collect, labelnames=(), kind="gauge"):
+        """
+        Args:
+            name (str): Nom complet de la métrique
+            documentation (str): Description exportée dans la ligne HELP
+            collect (callable): Retourne un nombre, un dictionnaire {valeurs des étiquettes: nombre},
+                ou None quand la valeur n'est pas disponible
+            labelnames (tuple): Noms des étiquettes des clés retournées par collect
+            kind (str): Type exporté, "gauge" ou "counter"
+        """
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self):
+        """Retourne les lignes de la métrique au format texte de Prometheus"""
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture de la métrique {self.name}: {str(e)}")
+            values = None
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if values is None:
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in sorted(values.items()):
+            if value is not None:
+                labelvalues = labelvalues if isinstance(labelvalues, tuple) else (labelvalues,)
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Histogramme à seaux cumulés, une série par combinaison de valeurs d'étiquettes
+
+    observe() ne fait qu'une recherche dichotomique et deux additions sous verrou;
+    les cumuls ne sont calculés qu'au moment de l'export.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): Nom complet de la métrique
+            documentation (str): Description exportée dans la ligne HELP
+            labelnames (tuple): Noms des étiquettes, dans l'ordre des valeurs passées à observe
+            buckets (tuple): Bornes supérieures des seaux (le seau +Inf est ajouté)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.series = {}  # valeurs des étiquettes -> [compte de chaque seau..., compte +Inf, somme]
+
+    def observe(self, value, *labelvalues):
+        """Ajoute une observation (en secondes pour une durée) à la série des étiquettes données"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labelvalues)
+            if series is None:
+                series = self.series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        """Retourne les lignes de la métrique au format texte de Prometheus"""
+        with self.lock:
+            series = {labelvalues: list(values) for labelvalues, values in self.series.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (None,), values[:-1]):
+                cumulative += count
+                le = "+Inf" if bound is None else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_value(values[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exportées par /metrics, préfixées par un espace de noms"""
+
+    def __init__(self, namespace="shortthehack"):
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _register(self, metric):
+        """Ajoute une métrique, ou retourne celle déjà enregistrée sous ce nom"""
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Retourne l'histogramme name (créé au premier appel)"""
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    def counter(self, name, documentation, labelnames=()):
+        """Retourne le compteur name (créé au premier appel)"""
+        return self._register(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def gauge(self, name, documentation, collect, labelnames=(), kind="gauge"):
+        """Enregistre une valeur lue par collect à chaque export (voir Gauge)"""
+        return self._register(Gauge(f"{self.namespace}_{name}", documentation, collect, labelnames, kind))
+
+    def render(self):
+        """Retourne toutes les métriques au format texte de Prometheus"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registre partagé par tous les modules du processus
+registry = MetricsRegistry()
@@ -0,0 +1,207 @@
+"""
+Module du registre des positions short, indexé et persisté sur disque
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from loguru import logger
+
+
+def position_id(asset):
+    """
+    Identifiant stable d'une position margin
+
+    Binance regroupe les emprunts par actif: une position par actif emprunté, dont
+    l'identifiant reste le même d'un redémarrage à l'autre.
+    """
+    return f"margin_{asset.upper()}"
+
+
+class PositionRegistry:
+    """
+    Positions short actives, indexées par identifiant, par actif et par ordre
+
+    Toutes les modifications se font sous un verrou et sont enregistrées sur disque
+    (fichier temporaire puis renommage), ce qui permet de retrouver les positions
+    et leur historique (date d'ouverture, tweet, ordres) après un redémarrage.
+    """
+
+    def __init__(self, path="positions.json"):
+        """
+        Args:
+            path (str): Fichier de persistance (None pour rester en mémoire)
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.positions = OrderedDict()  # identifiant -> position
+        self.by_asset = {}  # actif -> identifiant
+        self.by_order = {}  # identifiant d'ordre -> identifiant de position
+        self._load()
+
+    def _index(self, position):
+        self.by_asset[position["asset"]] = position["id"]
+        for order_id in position["order_ids"]:
+            self.by_order[str(order_id)] = position["id"]
+
+    def _unindex(self, position):
+        self.by_asset.pop(position["asset"], None)
+        for order_id in position["order_ids"]:
+            self.by_order.pop(str(order_id), None)
+
+    def open(self, asset, symbol, order_id=None, quantity=None, entry_price=None, leverage=1, tweet=None):
+        """
+        Enregistre un short placé; s'ajoute à la position existante sur le même actif
+
+        Args:
+            quantity (float): Quantité vendue par cet ordre (et non la dette totale de l'actif)
+
+        Returns:
+            dict: Une copie de la position
+        """
+        asset = asset.upper()
+        with self.lock:
+            position = self.positions.get(position_id(asset))
+            if position is None:
+                position = {
+                    "id": position_id(asset),
+                    "asset": asset,
+                    "symbol": symbol,
+                    "quantity": quantity,
+                    "entry_price": entry_price,
+                    "leverage": leverage,
+                    "timestamp": datetime.now().isoformat(),
+                    "tweet": tweet,
+                    "order_ids": [],
+                    "status": "active"
+                }
+                self.positions[position["id"]] = position
+            else:
+                if quantity is not None:
+                    # Chaque short ajoute la quantité vendue par son propre ordre (8 décimales, la précision de Binance)
+                    position["quantity"] = round((position["quantity"] or 0) + quantity, 8)
+                position["tweet"] = tweet or position["tweet"]
+            if order_id is not None and order_id not in position["order_ids"]:
+                position["order_ids"].append(order_id)
+            self._index(position)
+            self._save()
+            return dict(position)
+
+    def get(self, short_id):
+        """Retourne une copie de la position par son identifiant ou celui d'un de ses ordres, ou None"""
+        with self.lock:
+            position = self.positions.get(short_id) or self.positions.get(self.by_order.get(str(short_id)))
+            return dict(position) if position else None
+
+    def get_by_asset(self, asset):
+        """Retourne une copie de la position sur un actif, ou None"""
+        with self.lock:
+            position = self.positions.get(self.by_asset.get(asset.upper()))
+            return dict(position) if position else None
+
+    def remove(self, short_id):
+        """
+        Retire une position (par son identifiant ou celui d'un de ses ordres)
+
+        Returns:
+            bool: True si la position existait
+        """
+        with self.lock:
+            position = self.positions.get(short_id) or self.positions.get(self.by_order.get(str(short_id)))
+            if position is None:
+                return False
+            del self.positions[position["id"]]
+            self._unindex(position)
+            self._save()
+        return True
+
+    def all(self):
+        """Retourne une copie de toutes les positions, dans l'ordre d'ouverture"""
+        with self.lock:
+            return [dict(position) for position in self.positions.values()]
+
+    def __len__(self):
+        with self.lock:
+            return len(self.positions)
+
+    def reconcile(self, exchange_positions):
+        """
+        Met à jour le registre à partir des positions lues sur l'échange
+
+        Seules les différences sont appliquées: les positions nouvelles sont ajoutées,
+        les quantités modifiées sont mises à jour (en conservant date d'ouverture, tweet
+        et ordres) et les positions disparues de l'échange sont retirées.
+
+        Args:
+            exchange_positions (list): Positions au format de BinanceTrader.get_active_shorts
+
+        Returns:
+            dict: Nombre de positions ajoutées, mises à jour et retirées
+        """
+        seen = {position["asset"].upper(): position for position in exchange_positions}
+        added = updated = removed = 0
+        with self.lock:
+            for asset, exchange_position in seen.items():
+                position = self.positions.get(self.by_asset.get(asset))
+                if position is None:
+                    position = {
+                        "id": position_id(asset),
+                        "asset": asset,
+                        "symbol": exchange_position["symbol"],
+                        "quantity": exchange_position["quantity"],
+                        "entry_price": exchange_position.get("entry_price"),
+                        "leverage": exchange_position.get("leverage", 1),
+                        "timestamp": exchange_position.get("timestamp", datetime.now().isoformat()),
+                        "tweet": None,
+                        "order_ids": [],
+                        "status": "active"
+                    }
+                    self.positions[position["id"]] = position
+                    self._index(position)
+                    added += 1
+                elif position["quantity"] != exchange_position["quantity"]:
+                    position["quantity"] = exchange_position["quantity"]
+                    if position["entry_price"] is None:
+                        position["entry_price"] = exchange_position.get("entry_price")
+                    updated += 1
+
+            for position in [p for p in self.positions.values() if p["asset"] not in seen]:
+                del self.positions[position["id"]]
+                self._unindex(position)
+                removed += 1
+
+            if added or updated or removed:
+                self._save()
+        logger.info(f"Positions rapprochées avec l'échange: {added} ajoutée(s), {updated} mise(s) à jour, {removed} retirée(s)")
+        return {"added": added, "updated": updated, "removed": removed}
+
+    def _load(self):
+        """Charge les positions enregistrées"""
+        if not self.path or not Path(self.path).exists():
+            return
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+            for position in stored:
+                self.positions[position["id"]] = position
+                self._index(position)
+            logger.info(f"{len(self.positions)} positions chargées depuis {self.path}")
+        except Exception as e:
+            logger.warning(f"Impossible de charger les positions: {str(e)}")
+
+    def _save(self):
+        """
+        Écrit les positions dans un fichier temporaire puis le renomme, pour ne jamais laisser
+        un fichier tronqué (appelé sous le verrou, les écritures restent ordonnées)
+        """
+        if not self.path:
+            return
+        try:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(list(self.positions.values()), f, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Impossible d'enregistrer les positions: {str(e)}")
@@ -0,0 +1,242 @@
+"""
+Module du carnet de prix local, alimenté par le flux de tickers de tous les symboles
+"""
+import time
+import threading
+from binance import ThreadedWebsocketManager
+from loguru import logger
+
+MARKETS = ("spot", "futures")
+
+
+class PriceBook:
+    """
+    Derniers prix connus de chaque symbole, en mémoire
+
+    Un prix est utilisable s'il a été mis à jour il y a moins de max_age secondes, ou si
+    le flux du marché est actif et a envoyé un message depuis moins de max_age secondes
+    (le flux n'envoie que les symboles dont le prix a changé). Sinon le prix est
+    récupéré via REST et conservé.
+    """
+
+    def __init__(self, max_age=5.0):
+        """
+        Args:
+            max_age (float): Âge maximum en secondes d'un prix utilisable sans appel REST
+        """
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.prices = {market: {} for market in MARKETS}  # symbole -> (prix, timestamp)
+        self.live = {market: False for market in MARKETS}
+        self.last_message_at = {market: None for market in MARKETS}
+        self.hits = 0
+        self.fallbacks = 0
+
+    def update(self, market, ticks, received_at=None):
+        """
+        Enregistre des prix reçus
+
+        Args:
+            market (str): "spot" ou "futures"
+            ticks (iterable): Couples (symbole, prix)
+            received_at (float): Date de réception (maintenant par défaut)
+        """
+        received_at = received_at or time.time()
+        with self.lock:
+            book = self.prices[market]
+            for symbol, price in ticks:
+                book[symbol] = (float(price), received_at)
+            self.last_message_at[market] = received_at
+
+    def set_live(self, market, live):
+        """Indique si un flux tient actuellement le marché à jour"""
+        with self.lock:
+            self.live[market] = live
+
+    def _is_fresh(self, market, updated_at, now):
+        if now - updated_at <= self.max_age:
+            return True
+        last_message_at = self.last_message_at[market]
+        return self.live[market] and last_message_at is not None and now - last_message_at <= self.max_age
+
+    def get(self, symbol, market="spot"):
+        """Retourne le prix en mémoire s'il est utilisable, None sinon"""
+        now = time.time()
+        with self.lock:
+            entry = self.prices[market].get(symbol)
+            if entry and self._is_fresh(market, entry[1], now):
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def price(self, client, symbol, market="spot"):
+        """
+        Retourne le prix d'un symbole, en mémoire s'il est utilisable, sinon via REST
+
+        Returns:
+            float: Le prix (lève une exception si l'appel REST échoue)
+        """
+        price = self.get(symbol, market)
+        if price is not None:
+            return price
+
+        if market == "spot":
+            ticker = client.get_symbol_ticker(symbol=symbol)
+        else:
+            ticker = client.futures_symbol_ticker(symbol=symbol)
+        price = float(ticker["price"])
+        with self.lock:
+            self.fallbacks += 1
+            self.prices[market][symbol] = (price, time.time())
+        return price
+
+    def all_prices(self, client, market="spot"):
+        """
+        Retourne les prix de tous les symboles d'un marché
+
+        Lus en mémoire si le flux est actif, sinon récupérés en un seul appel REST.
+
+        Returns:
+            dict: symbole -> prix
+        """
+        now = time.time()
+        with self.lock:
+            last_message_at = self.last_message_at[market]
+            if self.live[market] and last_message_at is not None and now - last_message_at <= self.max_age:
+                self.hits += 1
+                return {symbol: price for symbol, (price, _) in self.prices[market].items()}
+
+        if market == "spot":
+            tickers = client.get_all_tickers()
+        else:
+            tickers = client.futures_symbol_ticker()
+        self.update(market, ((ticker["symbol"], ticker["price"]) for ticker in tickers))
+        with self.lock:
+            self.fallbacks += 1
+        return {ticker["symbol"]: float(ticker["price"]) for ticker in tickers}
+
+    def get_stats(self):
+        """Retourne l'état des flux, le nombre de symboles et les lectures en mémoire / via REST"""
+        now = time.time()
+        with self.lock:
+            return {
+                "markets": {
+                    market: {
+                        "live": self.live[market],
+                        "symbols": len(self.prices[market]),
+                        "last_message_age_s": round(now - self.last_message_at[market], 1) if self.last_message_at[market] else None
+                    }
+                    for market in MARKETS
+                },
+                "hits": self.hits,
+                "rest_fallbacks": self.fallbacks
+            }
+
+
+def ticks_from_message(message):
+    """Extrait les couples (symbole, prix) d'un message du flux de tickers"""
+    if isinstance(message, dict):
+        if message.get("e") == "error":
+            return None
+        # Messages multiplexés ({"stream": ..., "data": [...]})
+        message = message.get("data", [message])
+    return [(tick["s"], tick["c"]) for tick in message if "s" in tick and "c" in tick]
+
+
+class PriceStream:
+    """Flux Binance des mini-tickers de tous les symboles, qui alimente un PriceBook"""
+
+    def __init__(self, book, client, markets=("spot",)):
+        """
+        Args:
+            book (PriceBook): Le carnet à alimenter
+            client: Client Binance utilisé pour charger tous les prix au démarrage
+            markets (tuple): Marchés suivis ("spot" et/ou "futures")
+        """
+        self.book = book
+        self.client = client
+        self.markets = tuple(markets)
+        self.manager = None
+
+    def start(self):
+        """Charge tous les prix via REST puis démarre le flux"""
+        for market in self.markets:
+            self.book.all_prices(self.client, market)
+
+        self.manager = ThreadedWebsocketManager()
+        self.manager.start()
+        for market in self.markets:
+            callback = self._make_callback(market)
+            if market == "spot":
+                self.manager.start_miniticker_socket(callback=callback)
+            else:
+                self.manager.start_all_ticker_futures_socket(callback=callback)
+            self.book.set_live(market, True)
+        logger.info(f"Flux de prix démarré pour {', '.join(self.markets)}")
+
+    def stop(self):
+        """Arrête le flux; les prix repassent par REST"""
+        for market in self.markets:
+            self.book.set_live(market, False)
+        if self.manager:
+            self.manager.stop()
+            self.manager = None
+        logger.info("Flux de prix arrêté")
+
+    def _make_callback(self, market):
+        def callback(message):
+            ticks = ticks_from_message(message)
+            if ticks is None:
+                # Reconnexions épuisées: revenir au REST
+                logger.error(f"Flux de prix {market} interrompu: {message.get('m')}")
+                self.book.set_live(market, False)
+                return
+            self.book.update(market, ticks)
+        return callback
+
+
+class ReplayPriceSource:
+    """
+    Flux de prix rejoué à partir de messages enregistrés, pour les tests hors ligne
+
+    Même interface que PriceStream.
+    """
+
+    def __init__(self, book, messages, market="spot", interval=0.0):
+        """
+        Args:
+            book (PriceBook): Le carnet à alimenter
+            messages (list): Messages au format du flux (listes de mini-tickers)
+            market (str): Le marché rejoué
+            interval (float): Délai en secondes entre deux messages
+        """
+        self.book = book
+        self.messages = list(messages)
+        self.market = market
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Rejoue les messages dans un thread"""
+        self.book.set_live(self.market, True)
+        self.stop_event.clear()
+        self.done.clear()
+        self.thread = threading.Thread(target=self._replay, name="price-replay")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Arrête le rejeu"""
+        self.stop_event.set()
+        self.book.set_live(self.market, False)
+
+    def _replay(self):
+        for message in self.messages:
+            if self.stop_event.is_set():
+                break
+            self.book.update(self.market, ticks_from_message(message) or [])
+            if self.interval and self.stop_event.wait(self.interval):
+                break
+        self.done.set()
@@ -0,0 +1,251 @@
+"""
+Module de régulation des requêtes Binance selon les limites de poids de l'échange
+"""
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qs
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from app.utils.metrics import registry
+
+# Compteurs de l'échange: en-tête renvoyé par Binance, limite et fenêtre en secondes
+BUCKETS = {
+    "api": ("x-mbx-used-weight-1m", 6000, 60),
+    "orders": ("x-mbx-order-count-10s", 100, 10),
+    "sapi_ip": ("x-sapi-used-ip-weight-1m", 12000, 60),
+    "sapi_uid": ("x-sapi-used-uid-weight-1m", 180000, 60),
+    "fapi": ("x-mbx-used-weight-1m", 2400, 60)
+}
+
+# Poids des appels utilisés par l'application (les autres comptent 1 dans le compteur de leur API)
+WEIGHTS = {
+    ("GET", "/api/v3/exchangeInfo"): {"api": 20},
+    ("GET", "/api/v3/ticker/price"): {"api": 2},
+    ("GET", "/api/v3/account"): {"api": 20},
+    ("POST", "/api/v3/order"): {"api": 1, "orders": 1},
+    ("GET", "/sapi/v1/margin/account"): {"sapi_ip": 10},
+    ("GET", "/sapi/v1/margin/maxBorrowable"): {"sapi_ip": 50},
+    ("GET", "/sapi/v1/margin/allPairs"): {"sapi_ip": 1},
+    ("POST", "/sapi/v1/margin/loan"): {"sapi_uid": 3000},
+    ("POST", "/sapi/v1/margin/repay"): {"sapi_uid": 3000},
+    ("POST", "/sapi/v1/margin/order"): {"sapi_uid": 6},
+    ("GET", "/fapi/v1/exchangeInfo"): {"fapi": 1},
+    ("GET", "/fapi/v2/account"): {"fapi": 5}
+}
+
+# Part de chaque limite utilisable et attente maximale (en secondes) par priorité:
+# le chemin des ordres garde toujours une réserve que le tableau de bord ne peut pas consommer
+PRIORITIES = {
+    "order": (1.0, 10.0),
+    "maintenance": (0.7, 60.0),
+    "dashboard": (0.5, 0.0)
+}
+
+current_priority = contextvars.ContextVar("binance_priority", default="order")
+
+# Durée des requêtes envoyées à Binance (sans l'attente du régulateur) et réponses en erreur
+REQUEST_DURATION = registry.histogram(
+    "binance_request_seconds", "Durée des requêtes Binance, par point d'accès", ("method", "endpoint")
+)
+REQUEST_ERRORS = registry.counter("binance_request_errors_total", "Réponses Binance en erreur, par code HTTP", ("status",))
+
+
+class RateLimitExceeded(Exception):
+    """Requête non envoyée: budget de la priorité épuisé ou accès suspendu par Binance"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def request_weights(method, url):
+    """Retourne le poids d'une requête dans chaque compteur ({compteur: poids})"""
+    parts = urlsplit(url)
+    path = parts.path
+    weights = WEIGHTS.get((method, path))
+    if weights is None:
+        prefix = path.split("/")[1] if path.count("/") > 1 else ""
+        weights = {"fapi": 1} if prefix == "fapi" else {"sapi_ip": 1} if prefix == "sapi" else {"api": 1}
+    if path == "/api/v3/ticker/price" and "symbol" not in parse_qs(parts.query):
+        weights = {"api": 4}
+    return weights
+
+
+class RateGovernor:
+    """
+    Budget de poids partagé par toutes les requêtes Binance du processus
+
+    Chaque requête réserve son poids dans les compteurs de son API avant d'être
+    envoyée; les compteurs sont ensuite corrigés par les en-têtes X-MBX-USED-WEIGHT-*
+    et X-SAPI-USED-*-WEIGHT-* (qui incluent aussi les requêtes des autres processus).
+    Une priorité ne peut utiliser qu'une part de chaque limite: au-delà, la requête
+    attend la fenêtre suivante ou est refusée (RateLimitExceeded). Après une réponse
+    429 ou 418, plus rien n'est envoyé avant la fin du délai Retry-After.
+    """
+
+    def __init__(self, buckets=None, priorities=None):
+        """
+        Args:
+            buckets (dict): Compteurs (en-tête, limite, fenêtre), BUCKETS par défaut
+            priorities (dict): Part de limite et attente maximale par priorité, PRIORITIES par défaut
+        """
+        self.buckets = dict(buckets or BUCKETS)
+        self.priorities = dict(priorities or PRIORITIES)
+        self.condition = threading.Condition()
+        self.used = {name: 0 for name in self.buckets}
+        self.windows = {name: None for name in self.buckets}
+        self.banned_until = 0.0
+        self.stats = {priority: {"sent": 0, "waited": 0, "rejected": 0} for priority in self.priorities}
+        self.bans = 0
+
+    @contextmanager
+    def priority(self, name):
+        """Applique une priorité aux requêtes envoyées dans ce bloc (et ce thread)"""
+        token = current_priority.set(name)
+        try:
+            yield
+        finally:
+            current_priority.reset(token)
+
+    def set_priority(self, name):
+        """Fixe la priorité de toutes les requêtes du thread courant (threads de fond)"""
+        current_priority.set(name)
+
+    def _roll_windows(self, now):
+        """Remet à zéro les compteurs dont la fenêtre est passée (appelé sous le verrou)"""
+        for name, (_, _, window) in self.buckets.items():
+            window_id = int(now // window)
+            if self.windows[name] != window_id:
+                self.windows[name] = window_id
+                self.used[name] = 0
+
+    def _wait_time(self, weights, share, now):
+        """Délai avant que les poids tiennent dans le budget, 0 s'ils tiennent déjà (appelé sous le verrou)"""
+        wait = 0.0
+        for name, weight in weights.items():
+            _, limit, window = self.buckets[name]
+            if self.used[name] + weight > limit * share:
+                wait = max(wait, window - now % window)
+        return wait
+
+    def acquire(self, method, url):
+        """
+        Réserve le poids d'une requête, en attendant si nécessaire
+
+        Returns:
+            dict: Les poids réservés
+
+        Raises:
+            RateLimitExceeded: Si la requête ne peut pas être envoyée dans l'attente permise
+        """
+        priority = current_priority.get()
+        if priority not in self.priorities:
+            priority = "order"
+        share, max_wait = self.priorities[priority]
+        weights = {name: weight for name, weight in request_weights(method, url).items() if name in self.buckets}
+        deadline = time.time() + max_wait
+        waited = False
+
+        with self.condition:
+            while True:
+                now = time.time()
+                if now < self.banned_until:
+                    self.stats[priority]["rejected"] += 1
+                    raise RateLimitExceeded(
+                        f"Accès suspendu par Binance pendant encore {self.banned_until - now:.0f}s",
+                        retry_after=self.banned_until - now
+                    )
+                self._roll_windows(now)
+                wait = self._wait_time(weights, share, now)
+                if not wait:
+                    for name, weight in weights.items():
+                        self.used[name] += weight
+                    self.stats[priority]["sent"] += 1
+                    self.stats[priority]["waited"] += waited
+                    return weights
+                if now + wait > deadline:
+                    self.stats[priority]["rejected"] += 1
+                    raise RateLimitExceeded(
+                        f"Budget de poids {priority} épuisé ({urlsplit(url).path})",
+                        retry_after=wait
+                    )
+                waited = True
+                self.condition.wait(wait)
+
+    def record(self, response):
+        """Met à jour les compteurs à partir des en-têtes d'une réponse, et suspend l'envoi après un 429 / 418"""
+        now = time.time()
+        headers = response.headers
+        with self.condition:
+            self._roll_windows(now)
+            for name, (header, _, _) in self.buckets.items():
+                value = headers.get(header)
+                if value is not None and self._bucket_matches(name, response):
+                    self.used[name] = max(self.used[name], int(value))
+
+            if response.status_code in (429, 418):
+                retry_after = float(headers.get("Retry-After") or 60)
+                self.banned_until = max(self.banned_until, now + retry_after)
+                self.bans += 1
+                logger.error(f"Limite Binance atteinte (HTTP {response.status_code}), envoi suspendu pendant {retry_after:.0f}s")
+            self.condition.notify_all()
+
+    @staticmethod
+    def _bucket_matches(name, response):
+        """Les en-têtes X-MBX-* des API spot et futures portent le même nom: les attribuer à la bonne API"""
+        path = urlsplit(response.url or "").path
+        if name == "fapi":
+            return path.startswith("/fapi")
+        if name in ("api", "orders"):
+            return not path.startswith("/fapi")
+        return True
+
+    def get_stats(self):
+        """Retourne l'usage de chaque compteur, les requêtes par priorité et l'état de suspension"""
+        now = time.time()
+        with self.condition:
+            self._roll_windows(now)
+            return {
+                "buckets": {
+                    name: {"used": self.used[name], "limit": limit, "window_s": window}
+                    for name, (_, limit, window) in self.buckets.items()
+                },
+                "priorities": {priority: dict(stats) for priority, stats in self.stats.items()},
+                "bans": self.bans,
+                "banned_for_s": round(max(0.0, self.banned_until - now), 1)
+            }
+
+
+class GovernedAdapter(HTTPAdapter):
+    """Adaptateur HTTP qui fait passer chaque requête par un RateGovernor"""
+
+    def __init__(self, governor, transport=None, **kwargs):
+        """
+        Args:
+            governor (RateGovernor): Le régulateur à appliquer
+            transport (HTTPAdapter): Adaptateur qui envoie réellement la requête (lui-même par défaut)
+            **kwargs: Paramètres de HTTPAdapter (pool_connections, pool_maxsize...)
+        """
+        super().__init__(**kwargs)
+        self.governor = governor
+        self.transport = transport
+
+    def send(self, request, **kwargs):
+        self.governor.acquire(request.method, request.url)
+        started_at = time.perf_counter()
+        if self.transport is not None:
+            response = self.transport.send(request, **kwargs)
+        else:
+            response = super().send(request, **kwargs)
+        REQUEST_DURATION.observe(time.perf_counter() - started_at, request.method, urlsplit(request.url).path)
+        if response.status_code >= 400:
+            REQUEST_ERRORS.inc(str(response.status_code))
+        self.governor.record(response)
+        return response
+
+
+# Régulateur partagé par tous les clients du processus (les limites sont par IP et par compte)
+rate_governor = RateGovernor()
@@ -0,0 +1,141 @@
+"""
+Module du schéma des paramètres: types et bornes de chaque paramètre, accès typé
+"""
+import math
+from collections import namedtuple
+
+Field = namedtuple("Field", ["kind", "default", "minimum", "maximum", "choices"])
+
+
+def field(kind, default=None, minimum=None, maximum=None, choices=None):
+    """Décrit un paramètre: type (bool, int, float, str, list de str, dict str -> str), défaut et bornes"""
+    return Field(kind, default, minimum, maximum, choices)
+
+
+FIELDS = {
+    "trading_enabled": field(bool, False),
+    "target_account": field(str, ""),
+    "target_coin": field(str, "USDC"),
+    "leverage": field(int, 1, minimum=1, maximum=20),
+    "check_interval": field(int, 3, minimum=1),
+    "prewarm_enabled": field(bool, True),
+    "prewarm_interval": field(float, 5.0, minimum=0.1),
+    "prewarm_symbols": field(list, None),
+    "default_symbol": field(str, "BTCUSDC"),
+    "quote_preference": field(list, ("USDC", "USDT")),
+    "account_assets": field(dict, None),
+    "account_stream_enabled": field(bool, True),
+    "account_resync_interval": field(float, 300.0, minimum=1),
+    "price_stream_enabled": field(bool, True),
+    "price_max_age": field(float, 5.0, minimum=0),
+    "config_watch_interval": field(float, 1.0, minimum=0.05)
+}
+
+
+class SettingsError(ValueError):
+    """Paramètres refusés par le schéma; errors contient un message par paramètre invalide"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _check(spec, value):
+    """Retourne la valeur normalisée d'un paramètre, ou lève ValueError"""
+    kind = spec.kind
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise ValueError("booléen attendu")
+    elif kind in (int, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("nombre attendu")
+        # JSON accepte Infinity et NaN, que les bornes ne peuvent pas arrêter
+        if not math.isfinite(value):
+            raise ValueError("nombre fini attendu")
+        if kind is int:
+            if value != int(value):
+                raise ValueError("entier attendu")
+            value = int(value)
+        else:
+            value = float(value)
+        if spec.minimum is not None and value < spec.minimum:
+            raise ValueError(f"minimum {spec.minimum}")
+        if spec.maximum is not None and value > spec.maximum:
+            raise ValueError(f"maximum {spec.maximum}")
+    elif kind is str:
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError("texte non vide attendu")
+        value = value.strip()
+    elif kind is list:
+        if value is None and spec.default is None:
+            return None
+        if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) and item.strip() for item in value):
+            raise ValueError("liste de textes attendue")
+        value = [item.strip() for item in value]
+    elif kind is dict:
+        if value is None and spec.default is None:
+            return None
+        if not isinstance(value, dict) or not all(isinstance(item, str) for item in value.values()):
+            raise ValueError("objet de textes attendu")
+        value = dict(value)
+    if spec.choices and value not in spec.choices:
+        raise ValueError(f"valeurs possibles: {', '.join(spec.choices)}")
+    return value
+
+
+def validate_settings(values, allow_unknown=False):
+    """
+    Vérifie et normalise des paramètres (une mise à jour partielle ou un fichier complet)
+
+    Args:
+        values (dict): Les paramètres à vérifier
+        allow_unknown (bool): Conserver les clés absentes du schéma au lieu de les refuser
+
+    Returns:
+        tuple: (paramètres normalisés, liste des erreurs)
+    """
+    if not isinstance(values, dict):
+        return {}, ["les paramètres doivent être un objet JSON"]
+
+    clean, errors = {}, []
+    for name, value in values.items():
+        spec = FIELDS.get(name)
+        if spec is None:
+            if allow_unknown:
+                clean[name] = value
+            else:
+                errors.append(f"{name}: paramètre inconnu")
+            continue
+        try:
+            clean[name] = _check(spec, value)
+        except (ValueError, OverflowError) as e:
+            errors.append(f"{name}: {str(e)}")
+    return clean, errors
+
+
+class Settings:
+    """
+    Paramètres typés en lecture seule, lus comme attributs par les chemins critiques
+
+    Construit une fois par changement de configuration, à partir d'un instantané déjà
+    validé: la lecture d'un paramètre ne coûte qu'un accès d'attribut.
+    """
+
+    __slots__ = tuple(FIELDS)
+
+    def __init__(self, values, defaults=None):
+        """
+        Args:
+            values (dict): Instantané des paramètres validés
+            defaults (dict): Valeurs par défaut prioritaires sur celles du schéma
+        """
+        defaults = defaults or {}
+        for name, spec in FIELDS.items():
+            value = values.get(name, defaults.get(name, spec.default))
+            object.__setattr__(self, name, tuple(value) if isinstance(value, list) else value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Paramètres en lecture seule: utiliser ConfigManager.update_settings")
+
+    def __repr__(self):
+        return f"Settings({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
@@ -0,0 +1,230 @@
+"""
+Module de cache des métadonnées des symboles Binance (filtres, précision, permissions margin)
+"""
+import time
+import threading
+from loguru import logger
+
+from app.utils.rate_governor import rate_governor
+
+# Marchés gérés par le cache
+MARKETS = ("spot", "futures")
+
+
+def _parse_filters(filters):
+    """Extrait LOT_SIZE et MIN_NOTIONAL (ou NOTIONAL) d'une liste de filtres Binance"""
+    parsed = {"min_qty": None, "max_qty": None, "step_size": None, "min_notional": None,
+              "lot_size_filter": None, "min_notional_filter": None}
+    for filt in filters:
+        filter_type = filt.get("filterType")
+        if filter_type == "LOT_SIZE":
+            parsed["min_qty"] = float(filt["minQty"])
+            parsed["max_qty"] = float(filt["maxQty"])
+            parsed["step_size"] = float(filt["stepSize"])
+            parsed["lot_size_filter"] = filt
+        elif filter_type in ("MIN_NOTIONAL", "NOTIONAL"):
+            # Le spot utilise "minNotional", les futures "notional"
+            min_notional = filt.get("minNotional", filt.get("notional"))
+            if min_notional is not None:
+                parsed["min_notional"] = float(min_notional)
+                parsed["min_notional_filter"] = filt
+    return parsed
+
+
+def _step_precision(step_size):
+    """Nombre de décimales correspondant à un step_size (ex: 0.001 -> 3)"""
+    if not step_size:
+        return None
+    step_str = f"{step_size:.10f}".rstrip("0")
+    return len(step_str.split(".")[1]) if "." in step_str else 0
+
+
+def build_symbol_meta(symbol_info, market="spot"):
+    """
+    Construit l'entrée du cache pour un symbole à partir de la réponse exchangeInfo
+
+    Args:
+        symbol_info (dict): L'entrée "symbols" renvoyée par Binance pour ce symbole
+        market (str): "spot" ou "futures"
+
+    Returns:
+        dict: Les métadonnées utiles au trading (filtres, précision, permissions)
+    """
+    filters = _parse_filters(symbol_info.get("filters", []))
+    permissions = symbol_info.get("permissions", [])
+    quantity_precision = symbol_info.get("quantityPrecision")
+    if quantity_precision is None:
+        quantity_precision = _step_precision(filters["step_size"])
+
+    meta = {
+        "symbol": symbol_info["symbol"],
+        "market": market,
+        "status": symbol_info.get("status"),
+        "base_asset": symbol_info.get("baseAsset"),
+        "quote_asset": symbol_info.get("quoteAsset"),
+        "quantity_precision": quantity_precision,
+        "permissions": permissions,
+        "is_margin_trading_allowed": bool(symbol_info.get("isMarginTradingAllowed", "MARGIN" in permissions)),
+        "margin_pair": None,
+        "filters": symbol_info.get("filters", [])
+    }
+    meta.update(filters)
+    return meta
+
+
+class SymbolCache:
+    """
+    Cache partagé des métadonnées de symboles, indexé par symbole et rafraîchi selon un TTL
+
+    Le téléchargement complet de exchangeInfo n'a lieu qu'une fois par TTL et par marché.
+    Une fois le cache chargé, les données expirées sont servies pendant qu'un thread
+    les rafraîchit, et un symbole inconnu est récupéré individuellement. Un symbole
+    introuvable (faute de frappe, retrait de la cote) est mémorisé pendant miss_ttl
+    pour ne pas relancer cette requête à chaque alerte.
+    """
+
+    def __init__(self, ttl=300, miss_ttl=60):
+        """
+        Args:
+            ttl (float): Durée de validité en secondes des données d'un marché
+            miss_ttl (float): Durée en secondes pendant laquelle un symbole introuvable n'est pas redemandé
+        """
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._misses = {}  # symbole introuvable -> date de la dernière recherche
+        self._lock = threading.Lock()
+        self._markets = {market: {"symbols": {}, "loaded_at": 0.0, "refreshing": False} for market in MARKETS}
+        self._margin_pairs_loaded_at = 0.0
+
+    def get(self, client, symbol, market="spot"):
+        """
+        Retourne les métadonnées d'un symbole
+
+        Args:
+            client: Le client Binance utilisé si un téléchargement est nécessaire
+            symbol (str): Le symbole recherché (ex: "BTCUSDC")
+            market (str): "spot" ou "futures"
+
+        Returns:
+            dict: Les métadonnées du symbole, ou None s'il n'existe pas
+        """
+        self._ensure_fresh(client, market)
+        with self._lock:
+            meta = self._markets[market]["symbols"].get(symbol)
+        if meta is None and market == "spot":
+            meta = self._load_single_symbol(client, symbol)
+        return meta
+
+    def all(self, client, market="spot"):
+        """Retourne un instantané {symbole: métadonnées} de tout un marché"""
+        self._ensure_fresh(client, market)
+        with self._lock:
+            return dict(self._markets[market]["symbols"])
+
+    def get_margin_pair(self, client, symbol):
+        """
+        Retourne la paire cross margin d'un symbole (ou None si le symbole n'est pas marginable)
+
+        Les paires margin sont rafraîchies avec le même TTL que les métadonnées spot.
+        """
+        meta = self.get(client, symbol, "spot")
+        if time.time() - self._margin_pairs_loaded_at > self.ttl:
+            self._load_margin_pairs(client)
+            meta = self.get(client, symbol, "spot")
+        return meta.get("margin_pair") if meta else None
+
+    def refresh(self, client, market="spot"):
+        """Télécharge à nouveau toutes les métadonnées d'un marché et remplace l'index"""
+        started_at = time.perf_counter()
+        if market == "futures":
+            exchange_info = client.futures_exchange_info()
+        else:
+            exchange_info = client.get_exchange_info()
+
+        symbols = {s["symbol"]: build_symbol_meta(s, market) for s in exchange_info["symbols"]}
+        with self._lock:
+            if market == "spot":
+                # Conserver les paires margin déjà connues
+                previous = self._markets[market]["symbols"]
+                for symbol, meta in symbols.items():
+                    if symbol in previous:
+                        meta["margin_pair"] = previous[symbol]["margin_pair"]
+            self._markets[market]["symbols"] = symbols
+            self._markets[market]["loaded_at"] = time.time()
+        logger.info(f"Métadonnées {market} rafraîchies: {len(symbols)} symboles en {(time.perf_counter() - started_at) * 1000:.0f} ms")
+
+    def loaded_at(self, market="spot"):
+        """Date (timestamp) du dernier téléchargement complet d'un marché"""
+        with self._lock:
+            return self._markets[market]["loaded_at"]
+
+    def invalidate(self, market=None):
+        """Marque un marché (ou tous) comme expiré"""
+        with self._lock:
+            for name in ([market] if market else MARKETS):
+                self._markets[name]["loaded_at"] = 0.0
+            if market in (None, "spot"):
+                self._margin_pairs_loaded_at = 0.0
+
+    def _ensure_fresh(self, client, market):
+        """Charge le marché s'il est vide, ou lance un rafraîchissement en arrière-plan s'il a expiré"""
+        with self._lock:
+            state = self._markets[market]
+            empty = not state["symbols"]
+            expired = time.time() - state["loaded_at"] > self.ttl
+            if not empty and expired and not state["refreshing"]:
+                state["refreshing"] = True
+                start_background = True
+            else:
+                start_background = False
+
+        if empty:
+            self.refresh(client, market)
+        elif start_background:
+            thread = threading.Thread(target=self._background_refresh, args=(client, market), name=f"symbol-cache-{market}")
+            thread.daemon = True
+            thread.start()
+
+    def _background_refresh(self, client, market):
+        """Rafraîchit un marché sans bloquer les lecteurs"""
+        rate_governor.set_priority("maintenance")
+        try:
+            self.refresh(client, market)
+        except Exception as e:
+            logger.warning(f"Erreur lors du rafraîchissement des métadonnées {market}: {str(e)}")
+        finally:
+            with self._lock:
+                self._markets[market]["refreshing"] = False
+
+    def _load_single_symbol(self, client, symbol):
+        """Ajoute au cache un symbole absent de l'index (ex: nouvelle cotation)"""
+        with self._lock:
+            missed_at = self._misses.get(symbol)
+        if missed_at is not None and time.time() - missed_at < self.miss_ttl:
+            return None
+        # get_symbol_info télécharge tout exchangeInfo: un échec est mis en cache lui aussi
+        symbol_info = client.get_symbol_info(symbol)
+        if not symbol_info:
+            with self._lock:
+                self._misses[symbol] = time.time()
+            logger.warning(f"Symbole {symbol} introuvable, ignoré pendant {self.miss_ttl}s")
+            return None
+        meta = build_symbol_meta(symbol_info, "spot")
+        with self._lock:
+            self._markets["spot"]["symbols"][symbol] = meta
+        return meta
+
+    def _load_margin_pairs(self, client):
+        """Associe les paires cross margin aux métadonnées spot"""
+        pairs = client.get_margin_all_pairs()
+        with self._lock:
+            symbols = self._markets["spot"]["symbols"]
+            for pair in pairs:
+                meta = symbols.get(pair["symbol"])
+                if meta is not None:
+                    meta["margin_pair"] = pair
+            self._margin_pairs_loaded_at = time.time()
+
+
+# Cache partagé par toutes les instances de BinanceTrader du processus
+symbol_cache = SymbolCache()
@@ -0,0 +1,120 @@
+"""
+Module de résolution du symbole à shorter à partir d'un tweet ou du compte qui l'a publié
+"""
+import re
+import threading
+from loguru import logger
+
+# Noms courants des projets -> actif de base
+DEFAULT_ALIASES = {
+    "bitcoin": "BTC", "ethereum": "ETH", "ether": "ETH", "solana": "SOL", "ripple": "XRP",
+    "cardano": "ADA", "dogecoin": "DOGE", "polygon": "POL", "chainlink": "LINK", "uniswap": "UNI",
+    "avalanche": "AVAX", "polkadot": "DOT", "tron": "TRX", "litecoin": "LTC", "arbitrum": "ARB",
+    "optimism": "OP", "aave": "AAVE", "curve": "CRV", "cosmos": "ATOM", "aptos": "APT",
+    "toncoin": "TON", "shiba": "SHIB", "pepe": "PEPE", "stellar": "XLM", "filecoin": "FIL",
+    "injective": "INJ", "thorchain": "RUNE", "pancakeswap": "CAKE", "sushiswap": "SUSHI",
+    "compound": "COMP", "maker": "MKR", "lido": "LDO", "starknet": "STRK", "celestia": "TIA"
+}
+
+# Comptes officiels -> actif de base (les comptes du fichier de configuration s'y ajoutent)
+DEFAULT_ACCOUNT_ASSETS = {
+    "bitcoin": "BTC", "ethereum": "ETH", "solana": "SOL", "uniswap": "UNI", "aave": "AAVE",
+    "chainlink": "LINK", "arbitrum": "ARB", "optimism": "OP", "avax": "AVAX", "cardano": "ADA",
+    "polkadot": "DOT", "ripple": "XRP", "dogecoin": "DOGE", "curvefinance": "CRV",
+    "0xpolygon": "POL", "cosmos": "ATOM", "nearprotocol": "NEAR", "aptos": "APT",
+    "suinetwork": "SUI", "ton_blockchain": "TON", "trondao": "TRX", "litecoin": "LTC",
+    "pancakeswap": "CAKE", "lidofinance": "LDO", "starknet": "STRK", "injective": "INJ"
+}
+
+CASHTAG = re.compile(r"\$([A-Za-z][A-Za-z0-9]{1,14})\b")
+WORD = re.compile(r"[a-z0-9]+")
+
+
+class SymbolResolver:
+    """
+    Associe un tweet ou un compte à un symbole margin négociable
+
+    L'index (actifs de base listés, alias, meilleure paire de cotation) est construit
+    à partir du cache des métadonnées et reconstruit seulement quand ce cache est
+    rafraîchi: une résolution ne fait que des recherches dans des dictionnaires.
+    """
+
+    def __init__(self, symbol_cache, client, quote_preference=("USDC", "USDT"), account_assets=None, aliases=None):
+        """
+        Args:
+            symbol_cache (SymbolCache): Cache des métadonnées des symboles
+            client: Client Binance utilisé si le cache doit être chargé
+            quote_preference (tuple): Actifs de cotation acceptés, par ordre de préférence
+            account_assets (dict): Comptes Twitter -> actif de base, en plus des comptes par défaut
+            aliases (dict): Noms de projets -> actif de base, en plus des alias par défaut
+        """
+        self.symbol_cache = symbol_cache
+        self.client = client
+        self.quote_preference = tuple(quote_preference)
+        self.account_assets = {k.lower(): v.upper() for k, v in {**DEFAULT_ACCOUNT_ASSETS, **(account_assets or {})}.items()}
+        self.aliases = {k.lower(): v.upper() for k, v in {**DEFAULT_ALIASES, **(aliases or {})}.items()}
+        self.lock = threading.Lock()
+        self.best_symbols = {}  # actif de base -> meilleur symbole margin
+        self.built_from = None
+
+    def rebuild(self):
+        """Reconstruit l'index des actifs shortables à partir du cache des métadonnées"""
+        markets = self.symbol_cache.all(self.client, "spot")
+        candidates = {}
+        for meta in markets.values():
+            if meta["status"] != "TRADING" or not meta["is_margin_trading_allowed"]:
+                continue
+            if meta["quote_asset"] not in self.quote_preference:
+                continue
+            rank = self.quote_preference.index(meta["quote_asset"])
+            current = candidates.get(meta["base_asset"])
+            if current is None or rank < current[0]:
+                candidates[meta["base_asset"]] = (rank, meta["symbol"])
+
+        with self.lock:
+            self.best_symbols = {asset: symbol for asset, (_, symbol) in candidates.items()}
+            self.built_from = self.symbol_cache.loaded_at("spot")
+        logger.info(f"Index de résolution construit: {len(self.best_symbols)} actifs shortables")
+
+    def _ensure_index(self):
+        """Reconstruit l'index si le cache des métadonnées a été rafraîchi depuis"""
+        if not self.best_symbols or self.built_from != self.symbol_cache.loaded_at("spot"):
+            self.rebuild()
+
+    def symbol_for_asset(self, asset):
+        """Retourne le meilleur symbole margin pour un actif de base, ou None"""
+        self._ensure_index()
+        return self.best_symbols.get(asset.upper())
+
+    def resolve(self, tweet_text=None, account=None):
+        """
+        Détermine le symbole à shorter
+
+        Ordre de priorité: compte source connu, cashtag ($ETH) du tweet, nom de projet du tweet.
+
+        Args:
+            tweet_text (str): Le texte du tweet
+            account (str): Le compte Twitter qui a publié le tweet
+
+        Returns:
+            tuple: (symbol, asset, raison), ou None si aucun actif négociable n'a été trouvé
+        """
+        self._ensure_index()
+
+        if account:
+            asset = self.account_assets.get(account.lstrip("@").lower())
+            if asset and asset in self.best_symbols:
+                return self.best_symbols[asset], asset, f"compte @{account.lstrip('@')}"
+
+        if tweet_text:
+            for match in CASHTAG.finditer(tweet_text):
+                asset = match.group(1).upper()
+                if asset in self.best_symbols:
+                    return self.best_symbols[asset], asset, f"cashtag ${asset}"
+
+            for word in WORD.findall(tweet_text.lower()):
+                asset = self.aliases.get(word)
+                if asset and asset in self.best_symbols:
+                    return self.best_symbols[asset], asset, f"nom de projet '{word}'"
+
+        return None
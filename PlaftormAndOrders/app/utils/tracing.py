@@ -0,0 +1,135 @@
+"""
+Module de mesure des délais d'une alerte, de la publication du tweet à l'exécution de l'ordre
+"""
+import time
+import uuid
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from app.utils.metrics import registry
+
+# Alerte en cours de traitement, copiée dans les threads du pool avec la priorité du régulateur
+current_alert = contextvars.ContextVar("alert_id", default=None)
+
+
+def parse_timestamp(value):
+    """Convertit une date ISO 8601 ou un timestamp Unix en timestamp Unix, None si la valeur est invalide"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class AlertTracer:
+    """
+    Délais de chaque étape d'une alerte, corrélés par un identifiant d'alerte
+
+    Deux mesures alimentent les histogrammes de /metrics et la trace de l'alerte:
+    - span: durée d'une étape, mesurée avec l'horloge monotone en nanosecondes;
+    - mark: délai entre la publication du tweet et une étape (horloge murale, donc
+      sensible au décalage d'horloge avec Twitter et Binance).
+    L'alerte courante est une variable de contexte; entre les deux services, son
+    identifiant et la date du tweet voyagent dans le corps du webhook.
+    """
+
+    def __init__(self, metrics, max_traces=200):
+        """
+        Args:
+            metrics (MetricsRegistry): Registre où créer les histogrammes
+            max_traces (int): Nombre de traces d'alertes conservées pour /api/traces
+        """
+        self.spans = metrics.histogram("span_seconds", "Durée de chaque étape du traitement d'une alerte", ("span",))
+        self.stages = metrics.histogram(
+            "tweet_to_stage_seconds", "Délai entre la publication du tweet et chaque étape", ("stage",)
+        )
+        self.max_traces = max_traces
+        self.lock = threading.Lock()
+        self.traces = OrderedDict()
+
+    @contextmanager
+    def alert(self, alert_id=None, tweet_at=None):
+        """
+        Rattache à une alerte les mesures faites dans ce bloc (et les threads qu'il lance via copy_context)
+
+        Args:
+            alert_id (str): Identifiant reçu de l'autre service (généré s'il est absent)
+            tweet_at (float): Date de publication du tweet (timestamp Unix), origine des marks
+        """
+        alert_id = alert_id or uuid.uuid4().hex
+        with self.lock:
+            if alert_id not in self.traces:
+                self.traces[alert_id] = {
+                    "alert_id": alert_id,
+                    "tweet_at": tweet_at,
+                    "started_at": time.time(),
+                    "spans": {},
+                    "stages": {}
+                }
+                while len(self.traces) > self.max_traces:
+                    self.traces.popitem(last=False)
+        token = current_alert.set(alert_id)
+        try:
+            yield alert_id
+        finally:
+            current_alert.reset(token)
+
+    @contextmanager
+    def span(self, name):
+        """Mesure la durée du bloc comme étape name"""
+        started_at = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter_ns() - started_at) / 1e9)
+
+    def record(self, name, seconds):
+        """Enregistre la durée d'une étape mesurée ailleurs (en secondes)"""
+        self.spans.observe(seconds, name)
+        alert_id = current_alert.get()
+        if alert_id is not None:
+            with self.lock:
+                trace = self.traces.get(alert_id)
+                if trace is not None:
+                    trace["spans"][name] = round(seconds * 1000, 3)
+
+    def mark(self, stage, at=None):
+        """
+        Enregistre le délai entre la publication du tweet de l'alerte courante et une étape
+
+        Args:
+            stage (str): Nom de l'étape
+            at (float): Date de l'étape (timestamp Unix), maintenant par défaut
+        """
+        alert_id = current_alert.get()
+        if alert_id is None:
+            return
+        with self.lock:
+            trace = self.traces.get(alert_id)
+            if trace is None or trace["tweet_at"] is None:
+                return
+            elapsed = (at or time.time()) - trace["tweet_at"]
+            trace["stages"][stage] = round(elapsed * 1000, 1)
+        self.stages.observe(max(0.0, elapsed), stage)
+
+    def get_trace(self, alert_id):
+        """Retourne une copie de la trace d'une alerte, None si elle est inconnue"""
+        with self.lock:
+            trace = self.traces.get(alert_id)
+            return dict(trace, spans=dict(trace["spans"]), stages=dict(trace["stages"])) if trace else None
+
+    def recent(self, limit=20):
+        """Retourne les traces des dernières alertes, de la plus récente à la plus ancienne"""
+        with self.lock:
+            alert_ids = list(self.traces)[-limit:]
+        return [trace for trace in map(self.get_trace, reversed(alert_ids)) if trace]
+
+
+# Traceur partagé par tous les modules du processus
+tracer = AlertTracer(registry)
@@ -0,0 +1,205 @@
+"""
+Module du journal des opérations de trading (intentions et résultats), en ajout seul
+"""
+import json
+import time
+import queue
+import sqlite3
+import threading
+from loguru import logger
+
+# Derniers événements d'un short interrompu avant la fin (crash, erreur de vente)
+INCOMPLETE_EVENTS = ("intent", "loan_ok", "order_failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    trade_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    symbol TEXT,
+    asset TEXT,
+    quantity REAL,
+    order_id TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_trade_id ON events (trade_id);
+"""
+
+
+class TradeJournal:
+    """
+    Journal SQLite (mode WAL) des emprunts, ordres et remboursements
+
+    record() ne fait qu'ajouter l'événement à une file: un thread dédié écrit les
+    événements par lots, un lot par transaction (synchronisée sur disque), pour que
+    l'écriture ne pèse pas sur la latence du placement d'un ordre.
+    """
+
+    def __init__(self, path="trade_journal.db", flush_interval=0.01):
+        """
+        Args:
+            path (str): Fichier de la base SQLite
+            flush_interval (float): Délai maximum en secondes avant l'écriture d'un événement
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.written = 0
+        self.batches = 0
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.pending = 0
+
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        self.thread = threading.Thread(target=self._writer, name="trade-journal")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")
+        return connection
+
+    def record(self, trade_id, event, symbol=None, asset=None, quantity=None, order_id=None, **data):
+        """
+        Ajoute un événement au journal (sans attendre l'écriture)
+
+        Args:
+            trade_id (str): Identifiant de l'opération (un short, une fermeture)
+            event (str): Étape: intent, loan_ok, loan_failed, order_ok, order_failed, repay_ok, unwound...
+            symbol (str): Le symbole concerné
+            asset (str): L'actif emprunté ou remboursé
+            quantity (float): La quantité
+            order_id: L'identifiant de l'ordre Binance
+            **data: Détails supplémentaires, enregistrés en JSON
+        """
+        row = (
+            time.time(), trade_id, event, symbol, asset, quantity,
+            str(order_id) if order_id is not None else None,
+            json.dumps(data, default=str) if data else None
+        )
+        with self.lock:
+            self.pending += 1
+        self.queue.put(row)
+
+    def flush(self, timeout=5.0):
+        """
+        Attend que tous les événements enregistrés soient écrits sur disque
+
+        Returns:
+            bool: True si tout a été écrit avant le délai
+        """
+        deadline = time.time() + timeout
+        with self.idle:
+            while self.pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.idle.wait(remaining)
+        return True
+
+    def _writer(self):
+        """Écrit les événements par lots"""
+        connection = self._connect()
+        while True:
+            batch = [self.queue.get()]
+            # Regrouper ce qui arrive pendant flush_interval dans la même transaction
+            deadline = time.time() + self.flush_interval
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO events (ts, trade_id, event, symbol, asset, quantity, order_id, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        batch
+                    )
+            except Exception as e:
+                logger.error(f"Erreur d'écriture dans le journal des opérations: {str(e)}")
+            with self.idle:
+                self.written += len(batch)
+                self.batches += 1
+                self.pending -= len(batch)
+                self.idle.notify_all()
+
+    def history(self, trade_id=None):
+        """Retourne les événements enregistrés (d'une opération ou de toutes), dans l'ordre"""
+        self.flush()
+        connection = self._connect()
+        connection.row_factory = sqlite3.Row
+        try:
+            if trade_id:
+                rows = connection.execute("SELECT * FROM events WHERE trade_id = ? ORDER BY seq", (trade_id,))
+            else:
+                rows = connection.execute("SELECT * FROM events ORDER BY seq")
+            return [self._row_to_event(row) for row in rows]
+        finally:
+            connection.close()
+
+    def incomplete_trades(self):
+        """
+        Rejoue le journal et retourne les shorts interrompus avant la vente
+
+        Returns:
+            list: Pour chaque short, son dernier événement avec symbole, actif et quantité de l'intention,
+                  et l'emprunt confirmé (loan_ok) s'il y en a un: quantité et tranId, sinon None
+        """
+        self.flush()
+        connection = self._connect()
+        connection.row_factory = sqlite3.Row
+        try:
+            rows = connection.execute("""
+                SELECT last.*, intent.symbol AS intent_symbol, intent.asset AS intent_asset,
+                       intent.quantity AS intent_quantity, loan.seq AS loan_seq,
+                       loan.quantity AS loan_quantity, loan.data AS loan_data
+                FROM events AS last
+                JOIN (SELECT trade_id, MAX(seq) AS seq FROM events GROUP BY trade_id) AS latest
+                  ON last.seq = latest.seq
+                JOIN events AS intent ON intent.trade_id = last.trade_id AND intent.event = 'intent'
+                LEFT JOIN events AS loan ON loan.trade_id = last.trade_id AND loan.event = 'loan_ok'
+                WHERE last.event IN ({})
+                ORDER BY last.seq
+            """.format(", ".join("?" for _ in INCOMPLETE_EVENTS)), INCOMPLETE_EVENTS)
+            return [
+                {
+                    "trade_id": row["trade_id"],
+                    "last_event": row["event"],
+                    "symbol": row["intent_symbol"],
+                    "asset": row["intent_asset"],
+                    "quantity": row["intent_quantity"],
+                    "ts": row["ts"],
+                    "loan": {
+                        "quantity": row["loan_quantity"],
+                        "tran_id": json.loads(row["loan_data"]).get("tran_id") if row["loan_data"] else None
+                    } if row["loan_seq"] is not None else None
+                }
+                for row in rows
+            ]
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _row_to_event(row):
+        event = {key: row[key] for key in row.keys() if key != "data"}
+        event.update(json.loads(row["data"]) if row["data"] else {})
+        return event
+
+    def get_stats(self):
+        """Retourne le nombre d'événements écrits, de lots et en attente"""
+        with self.lock:
+            return {
+                "written": self.written,
+                "batches": self.batches,
+                "pending": self.pending
+            }
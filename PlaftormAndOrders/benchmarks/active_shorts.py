@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark - duration of get_active_shorts as the number of open margin positions grows
+
+Compares the former pricing path (one get_symbol_ticker request per borrowed asset)
+with the bulk path (one get_all_tickers request joined against the borrowed assets).
+The Binance API is replaced by an in-memory fake with a fixed response time.
+
+Usage: python benchmarks/active_shorts.py [--positions 1 10 100] [--api-latency 0.05]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+
+from app.utils.binance_trader import BinanceTrader
+
+
+class FakeMarginClient:
+    """Margin account with `positions` borrowed assets, answering after a simulated round-trip"""
+
+    def __init__(self, positions, api_latency):
+        self.api_latency = api_latency
+        self.requests = 0
+        self.assets = [f"COIN{i}" for i in range(positions)]
+
+    def _round_trip(self):
+        self.requests += 1
+        time.sleep(self.api_latency)
+
+    def get_margin_account(self, **params):
+        self._round_trip()
+        return {"userAssets": [
+            {"asset": asset, "free": "0", "locked": "0", "borrowed": "1.5", "interest": "0", "netAsset": "-1.5"}
+            for asset in self.assets
+        ]}
+
+    def get_symbol_ticker(self, symbol, **params):
+        self._round_trip()
+        return {"symbol": symbol, "price": "1.0"}
+
+    def get_all_tickers(self, **params):
+        self._round_trip()
+        return [{"symbol": f"{asset}USDT", "price": "1.0"} for asset in self.assets]
+
+
+class BenchmarkTrader(BinanceTrader):
+    """Trader wired to the fake client"""
+
+    def __init__(self, client):
+        self.fake_client = client
+        super().__init__("benchmark", "benchmark")
+
+    def _init_client(self):
+        return self.fake_client
+
+
+def per_asset_active_shorts(trader):
+    """Former implementation: one ticker request per borrowed asset"""
+    account = trader.client.get_margin_account()
+    shorts = []
+    for asset in account["userAssets"]:
+        if float(asset["borrowed"]) > 0:
+            ticker = trader.client.get_symbol_ticker(symbol=f"{asset['asset']}USDT")
+            shorts.append({"symbol": f"{asset['asset']}USDT", "entry_price": float(ticker["price"])})
+    return shorts
+
+
+def measure(positions, method, args):
+    """Run get_active_shorts `args.runs` times, return the durations and the requests per run"""
+    client = FakeMarginClient(positions, args.api_latency)
+    trader = BenchmarkTrader(client)
+    durations = []
+    for _ in range(args.runs):
+        started_at = time.perf_counter()
+        shorts = per_asset_active_shorts(trader) if method == "per_asset" else trader.get_active_shorts()
+        durations.append(time.perf_counter() - started_at)
+        assert len(shorts) == positions
+    return durations, client.requests // args.runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Simulated API response time in seconds")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per measurement")
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"api_latency={args.api_latency * 1000:.0f}ms  runs={args.runs}")
+    print(f"{'positions':>9} {'method':>10} {'requests':>9} {'mean_ms':>9} {'max_ms':>9}")
+    for positions in args.positions:
+        for method in ("per_asset", "bulk"):
+            durations, requests = measure(positions, method, args)
+            print(f"{positions:>9} {method:>10} {requests:>9} {statistics.mean(durations) * 1000:>9.0f} "
+                  f"{max(durations) * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark - order path under dashboard and maintenance load, with and without the rate governor
+
+A simulated exchange stands in for Binance behind a real python-binance Client: it
+enforces request-weight limits per window, returns the X-MBX / X-SAPI used-weight
+headers, answers 429 with Retry-After once a limit is crossed and 418 to clients that
+keep sending while banned. Limits and windows are scaled down so a run takes seconds.
+
+Dashboard threads poll the margin account and all prices, a maintenance thread
+refreshes borrowable amounts, and the order thread places a short (max borrowable,
+loan, sell) every --order-interval seconds.
+
+Usage: python benchmarks/rate_limits.py [--duration 6] [--dashboards 4]
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests
+from binance.client import Client
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from app.utils.rate_governor import GovernedAdapter, RateGovernor, RateLimitExceeded, request_weights
+
+# Same counters as Binance, with limits and windows scaled down
+SIMULATED_BUCKETS = {
+    "api": ("x-mbx-used-weight-1m", 400, 2),
+    "orders": ("x-mbx-order-count-10s", 20, 2),
+    "sapi_ip": ("x-sapi-used-ip-weight-1m", 600, 2),
+    "sapi_uid": ("x-sapi-used-uid-weight-1m", 20000, 2),
+    "fapi": ("x-mbx-used-weight-1m", 400, 2)
+}
+
+RESPONSES = {
+    "/api/v3/ping": {},
+    "/api/v3/ticker/price": [{"symbol": "BTCUSDC", "price": "60000"}],
+    "/sapi/v1/margin/account": {"userAssets": [], "marginLevel": "999"},
+    "/sapi/v1/margin/maxBorrowable": {"amount": "1.0", "borrowLimit": "5"},
+    "/sapi/v1/margin/loan": {"tranId": 1},
+    "/sapi/v1/margin/order": {"orderId": 1, "status": "FILLED"}
+}
+
+
+class SimulatedExchange(BaseAdapter):
+    """Transport adapter answering like Binance, weight limits and bans included"""
+
+    def __init__(self, buckets, latency, ban_seconds):
+        super().__init__()
+        self.buckets = buckets
+        self.latency = latency
+        self.ban_seconds = ban_seconds
+        self.lock = threading.Lock()
+        self.used = {name: 0 for name in buckets}
+        self.windows = {name: None for name in buckets}
+        self.banned_until = 0.0
+        self.statuses = {}
+
+    def send(self, request, **kwargs):
+        time.sleep(self.latency)
+        path = request.path_url.split("?")[0]
+        weights = request_weights(request.method, request.url)
+        now = time.time()
+        headers = {}
+        with self.lock:
+            for name, (_, _, window) in self.buckets.items():
+                if self.windows[name] != int(now // window):
+                    self.windows[name] = int(now // window)
+                    self.used[name] = 0
+            if now < self.banned_until:
+                # Still sending while banned: Binance escalates to an IP ban
+                status, retry_after = 418, self.ban_seconds * 2
+                self.banned_until = now + retry_after
+            else:
+                for name, weight in weights.items():
+                    self.used[name] += weight
+                over = [name for name in weights if self.used[name] > self.buckets[name][1]]
+                status, retry_after = (429, self.ban_seconds) if over else (200, None)
+                if over:
+                    self.banned_until = now + retry_after
+            for name in weights:
+                headers[self.buckets[name][0]] = str(self.used[name])
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+        body = RESPONSES.get(path, {})
+        if status != 200:
+            headers["Retry-After"] = str(retry_after)
+            body = {"code": -1003, "msg": "Too many requests"}
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = json.dumps(body).encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class SimulatedClient(Client):
+    """python-binance Client whose HTTP session goes through the given adapter"""
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        super().__init__("benchmark", "benchmark")
+
+    def _init_session(self):
+        session = super()._init_session()
+        session.mount("https://", self.adapter)
+        return session
+
+
+def run(governed, args):
+    """Run the load for args.duration seconds, return the exchange and the per-role results"""
+    exchange = SimulatedExchange(SIMULATED_BUCKETS, args.api_latency, args.ban_seconds)
+    governor = RateGovernor(buckets=SIMULATED_BUCKETS)
+    client = SimulatedClient(GovernedAdapter(governor, transport=exchange) if governed else exchange)
+    stop = threading.Event()
+    results = {"dashboard": {"ok": 0, "failed": 0}, "maintenance": {"ok": 0, "failed": 0},
+               "order": {"ok": 0, "failed": 0, "latencies": []}}
+    lock = threading.Lock()
+
+    def count(role, ok):
+        with lock:
+            results[role]["ok" if ok else "failed"] += 1
+
+    def dashboard():
+        governor.set_priority("dashboard")
+        while not stop.is_set():
+            try:
+                client.get_margin_account()
+                client.get_all_tickers()
+                count("dashboard", True)
+            except Exception:
+                count("dashboard", False)
+                stop.wait(0.05)
+
+    def maintenance():
+        governor.set_priority("maintenance")
+        while not stop.wait(0.05):
+            try:
+                client.get_max_margin_loan(asset="BTC")
+                count("maintenance", True)
+            except Exception:
+                count("maintenance", False)
+
+    def orders():
+        while not stop.wait(args.order_interval):
+            started_at = time.perf_counter()
+            try:
+                client.get_max_margin_loan(asset="BTC")
+                client.create_margin_loan(asset="BTC", amount="0.001")
+                client.create_margin_order(symbol="BTCUSDC", side="SELL", type="MARKET", quantity="0.001")
+                count("order", True)
+                with lock:
+                    results["order"]["latencies"].append(time.perf_counter() - started_at)
+            except (RateLimitExceeded, Exception):
+                count("order", False)
+
+    threads = [threading.Thread(target=dashboard) for _ in range(args.dashboards)]
+    threads += [threading.Thread(target=maintenance), threading.Thread(target=orders)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return exchange, governor, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=6.0, help="Seconds of load per run")
+    parser.add_argument("--dashboards", type=int, default=4, help="Dashboard polling threads")
+    parser.add_argument("--order-interval", type=float, default=0.5, help="Seconds between two shorts")
+    parser.add_argument("--api-latency", type=float, default=0.005, help="Simulated response time in seconds")
+    parser.add_argument("--ban-seconds", type=float, default=1.0, help="Retry-After sent with a 429")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()
+
+    print(f"duration={args.duration}s  dashboards={args.dashboards}  order_interval={args.order_interval}s")
+    print(f"{'mode':>10} {'orders_ok':>9} {'orders_ko':>9} {'order_p50_ms':>12} {'order_max_ms':>12} "
+          f"{'dash_ok':>7} {'dash_ko':>7} {'http_429':>8} {'http_418':>8}")
+    for governed in (False, True):
+        exchange, governor, results = run(governed, args)
+        latencies = results["order"]["latencies"] or [0]
+        print(f"{'governed' if governed else 'raw':>10} {results['order']['ok']:>9} {results['order']['failed']:>9} "
+              f"{statistics.median(latencies) * 1000:>12.0f} {max(latencies) * 1000:>12.0f} "
+              f"{results['dashboard']['ok']:>7} {results['dashboard']['failed']:>7} "
+              f"{exchange.statuses.get(429, 0):>8} {exchange.statuses.get(418, 0):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,14 +8,20 @@ import time
 import threading
 from datetime import datetime
 from pathlib import Path
+import requests
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from loguru import logger
 
 from app.utils.twitter_scraper import TwitterScraper
 from app.utils.sentiment_analyzer import SentimentAnalyzer
 from app.utils.binance_trader import BinanceTrader
 from app.utils.config_manager import ConfigManager
+from app.utils.settings_schema import SettingsError
+from app.utils.symbol_resolver import SymbolResolver
+from app.utils.tweet_sources import PollingSource, TwitterStreamSource, HttpFeedSource
+from app.utils.metrics import CONTENT_TYPE, registry
+from app.utils.tracing import format_timestamp, tracer, tweet_timestamp
 
 # Load environment variables
 load_dotenv()
@@ -40,16 +46,27 @@ config_manager = ConfigManager()
 twitter_scraper = None
 sentiment_analyzer = None
 binance_trader = None
+symbol_resolver = None
 
 # Global variables
 bot_running = False
-bot_thread = None
+tweet_source = None
+source_lock = threading.Lock()  # Serializes starting, stopping and replacing the tweet source
+tweet_lock = threading.Lock()
 last_tweet = None
+tweet_cursors = {}  # High-water mark (last processed tweet ID) per account
+TWEET_CURSOR_FILE = "tweet_cursor.json"
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")  # PlaftormAndOrders alert endpoint, optional
+alert_session = requests.Session()  # Keeps the connection to the webhook open between alerts
+
+# Tweets that reached the detection path, and alerts forwarded to the webhook
+TWEETS_PROCESSED = registry.counter("tweets_processed_total", "New tweets handed to hack detection")
+ALERTS_FORWARDED = registry.counter("alerts_forwarded_total", "Alerts posted to the webhook by result (ok, error)", ("result",))
 
 
 def initialize_components():
     """Initialize the main components of the application"""
-    global twitter_scraper, sentiment_analyzer, binance_trader
+    global twitter_scraper, sentiment_analyzer, binance_trader, symbol_resolver
     
     try:
         twitter_scraper = TwitterScraper(os.getenv("TARGET_TWITTER_ACCOUNT"))
@@ -58,6 +75,33 @@ def initialize_components():
             os.getenv("BINANCE_API_KEY"),
             os.getenv("BINANCE_API_SECRET")
         )
+        
+        # Reload edits made directly to config.json
+        settings = config_manager.get_typed_settings()
+        config_manager.watch(settings.config_watch_interval)
+        
+        # Build the contract index now so that resolving a tweet to a symbol never hits the API
+        symbol_resolver = SymbolResolver(binance_trader.symbol_cache, binance_trader.client)
+        if binance_trader.client:
+            try:
+                symbol_resolver.rebuild()
+            except Exception as e:
+                logger.warning(f"Unable to build the symbol index: {str(e)}")
+        
+        # Keep the futures balance and positions in memory, updated by the account stream
+        if settings.account_stream_enabled:
+            try:
+                binance_trader.start_account_stream(resync_interval=settings.account_resync_interval)
+            except Exception as e:
+                logger.warning(f"Unable to start the account stream, balances will be read over REST: {str(e)}")
+        
+        # Keep every futures price in memory, updated by the all-market ticker stream
+        if settings.price_stream_enabled:
+            try:
+                binance_trader.start_price_stream(max_age=settings.price_max_age)
+            except Exception as e:
+                logger.warning(f"Unable to start the price stream, prices will be read over REST: {str(e)}")
+        
         logger.info("All components have been successfully initialized")
         return True
     except Exception as e:
@@ -65,66 +109,231 @@ def initialize_components():
         return False
 
 
-def bot_loop():
-    """Main bot loop"""
-    global bot_running, last_tweet
+def load_tweet_cursors():
+    """Load the per-account high-water marks, migrating from last_tweet.json if needed"""
+    if os.path.exists(TWEET_CURSOR_FILE):
+        with open(TWEET_CURSOR_FILE, "r") as f:
+            return {account: int(tweet_id) for account, tweet_id in json.load(f).items()}
     
-    logger.info("Bot started")
+    if os.path.exists("last_tweet.json"):
+        with open("last_tweet.json", "r") as f:
+            previous_tweet = json.load(f)
+        account = config_manager.get_typed_settings().target_account
+        return {account.lower(): int(previous_tweet["id"])}
     
-    while bot_running:
-        try:
-            # Get current parameters
-            settings = config_manager.get_settings()
-            target_account = settings.get("target_account", os.getenv("TARGET_TWITTER_ACCOUNT"))
-            target_coin = settings.get("target_coin", os.getenv("DEFAULT_COIN"))
-            leverage = settings.get("leverage", 1)
-            
-            # Check if there's a new tweet
-            new_tweet = twitter_scraper.get_latest_tweet(target_account)
-            
-            if new_tweet and (not last_tweet or new_tweet["id"] != last_tweet["id"]):
-                logger.info(f"New tweet detected: {new_tweet['text']}")
-                
-                # Analyze tweet sentiment
-                is_hack = sentiment_analyzer.is_hack_event(new_tweet["text"])
-                
-                if is_hack:
-                    logger.warning(f"ALERT: Hack event detected in tweet: {new_tweet['text']}")
-                    
-                    # Execute short order on Binance
-                    if settings.get("trading_enabled", False):
-                        success = binance_trader.place_short_order(
-                            symbol=f"{target_coin}USDT",
-                            leverage=leverage
-                        )
-                        
-                        if success:
-                            logger.success(f"Short order successfully placed for {target_coin} with leverage of {leverage}x")
-                        else:
-                            logger.error(f"Failed to place short order for {target_coin}")
-                    else:
-                        logger.info("Trading disabled in settings. No order has been placed.")
-                else:
-                    logger.info("The tweet does not contain a hack event")
-                
-                # Update the latest tweet
-                last_tweet = new_tweet
-                
-                # Save the latest tweet
-                with open("last_tweet.json", "w") as f:
-                    json.dump(new_tweet, f)
-            
-            # Wait for the configured interval
-            time.sleep(int(os.getenv("CHECK_INTERVAL", 3)))
+    return {}
+
+
+def save_tweet_cursors():
+    """Persist the per-account high-water marks (temporary file then rename, called under tweet_lock)"""
+    temp_file = f"{TWEET_CURSOR_FILE}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(tweet_cursors, f)
+    os.replace(temp_file, TWEET_CURSOR_FILE)
+
+
+def get_since_id(account):
+    """Return the ID of the last processed tweet of an account"""
+    return tweet_cursors.get(account.lower())
+
+
+def get_target_accounts():
+    """Return the accounts to monitor ("target_accounts", or the single "target_account")"""
+    settings = config_manager.get_typed_settings()
+    return list(settings.target_accounts) or [settings.target_account]
+
+
+def on_settings_changed(settings, changed):
+    """Apply the ingestion mode, account list, poll interval and API budget to the running tweet source"""
+    if "ingestion_mode" in changed:
+        # The new source is built from the current settings: nothing else to push
+        restart_tweet_source()
+        return
+    if tweet_source is None:
+        return
+    if changed & {"target_accounts", "target_account"}:
+        accounts = get_target_accounts()
+        if tweet_source.sync_accounts(accounts):
+            logger.info(f"Monitored accounts updated: {accounts}")
+    if not isinstance(tweet_source, PollingSource):
+        return
+    if "check_interval" in changed:
+        interval = config_manager.get_typed_settings().check_interval
+        tweet_source.set_interval(interval)
+        logger.info(f"Poll interval updated: {interval}s")
+    if "twitter_requests_per_window" in changed:
+        budget = config_manager.get_typed_settings().twitter_requests_per_window
+        tweet_source.set_budget(budget)
+        logger.info(f"Twitter request budget updated: {budget} per window")
+
+
+config_manager.subscribe(on_settings_changed)
+
+
+def process_tweet(new_tweet):
+    """
+    Hack-detection path shared by every tweet source
+    
+    Tweets of different accounts can be processed concurrently; a given account is
+    only ever handled by one thread at a time (one poll in flight, or one stream).
+    """
+    global last_tweet
+    
+    # Get current parameters
+    settings = config_manager.get_typed_settings()
+    account = (new_tweet.get("author") or settings.target_account).lower()
+    tweet_id = int(new_tweet["id"])
+    
+    # Tweet IDs increase over time: anything at or below the cursor was already processed
+    with tweet_lock:
+        if tweet_id <= tweet_cursors.get(account, 0):
+            return
+    
+    logger.info(f"New tweet detected from {account}: {new_tweet['text']}")
+    TWEETS_PROCESSED.inc()
+    
+    # Every step of this tweet is timed under one alert ID, from the moment it was posted
+    tweet_at = tweet_timestamp(new_tweet)
+    with tracer.alert(tweet_at=tweet_at) as alert_id:
+        tracer.mark("detected")
+        handle_tweet(new_tweet, account, settings, alert_id, tweet_at)
+    
+    # Advance the cursor past this tweet
+    with tweet_lock:
+        last_tweet = new_tweet
+        tweet_cursors[account] = max(tweet_id, tweet_cursors.get(account, 0))
+        save_tweet_cursors()
+
+
+def handle_tweet(new_tweet, account, settings, alert_id, tweet_at):
+    """
+    Classify a tweet and act on it if it reports a hack
+    
+    With ALERT_WEBHOOK_URL set, the alert goes to PlaftormAndOrders, which places the
+    short; the local futures order is only the fallback when no webhook is configured.
+    """
+    leverage = settings.leverage
+    
+    # Analyze tweet sentiment
+    with tracer.span("classify"):
+        is_hack = sentiment_analyzer.is_hack_event(new_tweet["text"])
+    tracer.mark("classified")
+    
+    # Accounts with hack tweets, or near misses that passed the pre-filter, get polled more often
+    if isinstance(tweet_source, PollingSource):
+        if is_hack:
+            tweet_source.record_signal(new_tweet.get("author") or account, 1.0)
+        elif sentiment_analyzer.prefilter.is_candidate(new_tweet["text"]):
+            tweet_source.record_signal(new_tweet.get("author") or account, 0.1)
+    
+    if is_hack:
+        logger.warning(f"ALERT: Hack event detected in tweet: {new_tweet['text']}")
+        
+        if ALERT_WEBHOOK_URL:
+            send_alert(new_tweet, account, alert_id, tweet_at)
+        elif settings.trading_enabled:
+            # Execute short order on Binance
+            symbol = resolve_short_symbol(new_tweet["text"], account, settings.default_symbol)
+            success = binance_trader.place_short_order(
+                symbol=symbol,
+                leverage=leverage
+            )
             
+            if success:
+                logger.success(f"Short order successfully placed for {symbol} with leverage of {leverage}x")
+            else:
+                logger.error(f"Failed to place short order for {symbol}")
+        else:
+            logger.info("Trading disabled in settings. No order has been placed.")
+    else:
+        logger.info("The tweet does not contain a hack event")
+
+
+def resolve_short_symbol(tweet_text, account, default_symbol):
+    """Return the contract named by the tweet or tied to its account, the default symbol otherwise"""
+    if symbol_resolver:
+        try:
+            resolved = symbol_resolver.resolve(tweet_text, account)
+            if resolved:
+                logger.info(f"Symbol resolved to {resolved[0]} from {resolved[2]}")
+                return resolved[0]
+            logger.info(f"No tradeable asset found in the tweet, falling back to {default_symbol}")
         except Exception as e:
-            logger.error(f"Error in bot loop: {str(e)}")
-            time.sleep(5)  # Wait a bit longer in case of error
+            logger.warning(f"Symbol resolution failed, falling back to {default_symbol}: {str(e)}")
+    return default_symbol
+
+
+def send_alert(new_tweet, account, alert_id, tweet_at):
+    """
+    Forward a hack alert to PlaftormAndOrders (ALERT_WEBHOOK_URL)
+    
+    The alert ID and the tweet's timestamp travel with the alert, so the order side
+    records its spans under the same alert and times them from the same tweet.
+    """
+    payload = {
+        "alert": "1",
+        "tweet": new_tweet["text"],
+        "account": account,
+        "alert_id": alert_id,
+        "tweet_created_at": format_timestamp(tweet_at) if tweet_at else new_tweet.get("created_at")
+    }
+    try:
+        with tracer.span("webhook_post"):
+            response = alert_session.post(ALERT_WEBHOOK_URL, json=payload, timeout=5)
+        response.raise_for_status()
+        tracer.mark("alert_sent")
+        ALERTS_FORWARDED.inc("ok")
+        logger.success(f"Alert {alert_id} forwarded to {ALERT_WEBHOOK_URL}")
+        return True
+    except requests.RequestException as e:
+        ALERTS_FORWARDED.inc("error")
+        logger.error(f"Failed to forward alert {alert_id} to {ALERT_WEBHOOK_URL}: {str(e)}")
+        return False
+
+
+def create_tweet_source():
+    """Create the tweet source selected by the "ingestion_mode" setting"""
+    settings = config_manager.get_typed_settings()
+    mode = settings.ingestion_mode
+    
+    if mode == "stream":
+        return TwitterStreamSource(process_tweet, os.getenv("TWITTER_BEARER_TOKEN"), get_target_accounts())
+    if mode == "feed":
+        return HttpFeedSource(process_tweet, os.getenv("TWEET_FEED_URL"))
+    if mode != "poll":
+        logger.warning(f"Unknown ingestion mode '{mode}', falling back to polling")
+    
+    return PollingSource(
+        process_tweet,
+        twitter_scraper,
+        get_since_id=get_since_id,
+        get_accounts=get_target_accounts,
+        interval=settings.check_interval,
+        max_workers=settings.max_poll_workers,
+        requests_per_window=settings.twitter_requests_per_window,
+        adaptive=settings.adaptive_polling,
+        max_interval=settings.max_poll_interval
+    )
+
+
+def restart_tweet_source():
+    """Replace the running tweet source by one for the current "ingestion_mode" setting"""
+    global tweet_source
+    
+    with source_lock:
+        if not bot_running:
+            return
+        previous = tweet_source
+        if previous:
+            previous.stop()
+        tweet_source = create_tweet_source()
+        tweet_source.start()
+    logger.info(f"Tweet source switched from {previous.name if previous else None} to {tweet_source.name} mode")
 
 
 def start_bot():
     """Start the bot in a separate thread"""
-    global bot_running, bot_thread
+    global bot_running, tweet_source
     
     if not bot_running:
         # Check if components are initialized
@@ -132,22 +341,20 @@ def start_bot():
             if not initialize_components():
                 return False
         
-        # Load the last tweet if it exists
-        global last_tweet
-        if os.path.exists("last_tweet.json"):
-            try:
-                with open("last_tweet.json", "r") as f:
-                    last_tweet = json.load(f)
-                logger.info(f"Last tweet loaded: {last_tweet['text'][:50]}...")
-            except Exception as e:
-                logger.warning(f"Unable to load the last tweet: {str(e)}")
+        # Load the tweet cursors if they exist
+        global tweet_cursors
+        try:
+            tweet_cursors = load_tweet_cursors()
+            logger.info(f"Tweet cursors loaded: {tweet_cursors}")
+        except Exception as e:
+            logger.warning(f"Unable to load the tweet cursors: {str(e)}")
         
         # Start the bot
-        bot_running = True
-        bot_thread = threading.Thread(target=bot_loop)
-        bot_thread.daemon = True
-        bot_thread.start()
-        logger.info("Bot successfully started")
+        with source_lock:
+            bot_running = True
+            tweet_source = create_tweet_source()
+            tweet_source.start()
+        logger.info(f"Bot successfully started ({tweet_source.name} mode)")
         return True
     
     return False
@@ -158,25 +365,81 @@ def stop_bot():
     global bot_running
     
     if bot_running:
-        bot_running = False
+        with source_lock:
+            bot_running = False
+            if tweet_source:
+                tweet_source.stop()
         logger.info("Bot stopped")
         return True
     
     return False
 
 
+def polling_depths():
+    """Accounts due and polls in flight of the running polling source, None in other modes"""
+    if not isinstance(tweet_source, PollingSource):
+        return None
+    return tweet_source.scheduler.get_depths()
+
+
+def twitter_quota(index):
+    """One field of the last rate limit reported by the Twitter API (0: limit, 1: remaining)"""
+    quota = twitter_scraper.get_rate_limit() if twitter_scraper else None
+    return quota[index] if quota else None
+
+
+# Gauges read at every /metrics scrape: queue depths and the Twitter API quota
+registry.gauge("bot_running", "1 while the bot is running", lambda: int(bot_running))
+registry.gauge("twitter_polls_due", "Accounts due for a poll and waiting for a worker",
+               lambda: (polling_depths() or {}).get("due"))
+registry.gauge("twitter_polls_in_flight", "Polls running", lambda: (polling_depths() or {}).get("in_flight"))
+registry.gauge("twitter_rate_limit_limit", "Requests allowed per window on the tweets endpoint", lambda: twitter_quota(0))
+registry.gauge("twitter_rate_limit_remaining", "Requests left in the current window on the tweets endpoint",
+               lambda: twitter_quota(1))
+registry.gauge(
+    "twitter_api_calls_total", "Twitter API calls by endpoint",
+    lambda: dict(twitter_scraper.get_poll_stats()["api_calls"]) if twitter_scraper else None,
+    ("call",),
+    kind="counter"
+)
+
+
 @app.route("/")
 def index():
     """Main route"""
     return render_template("index.html", settings=config_manager.get_settings())
 
 
+@app.route("/api/traces")
+def get_traces():
+    """Return the latency trace of one alert (?alert_id=), or of the latest alerts"""
+    alert_id = request.args.get("alert_id")
+    if alert_id:
+        trace = tracer.get_trace(alert_id)
+        if not trace:
+            return jsonify({"success": False, "message": f"Alert {alert_id} not found"}), 404
+        return jsonify({"success": True, "trace": trace})
+    return jsonify({"success": True, "traces": tracer.recent(request.args.get("limit", 20, type=int))})
+
+
+@app.route("/metrics")
+def metrics():
+    """Metrics in the Prometheus text format: counters, gauges and latency histograms"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
 @app.route("/api/status")
 def get_status():
     """Return the current status of the bot"""
     return jsonify({
         "running": bot_running,
         "last_tweet": last_tweet,
+        "ingestion_mode": tweet_source.name if tweet_source else None,
+        "twitter_api": twitter_scraper.get_poll_stats() if twitter_scraper else None,
+        "polling": tweet_source.get_stats() if isinstance(tweet_source, PollingSource) else None,
+        "sentiment": sentiment_analyzer.get_stats() if sentiment_analyzer else None,
+        "account_state": binance_trader.account_state.get_stats() if binance_trader else None,
+        "price_book": binance_trader.price_book.get_stats() if binance_trader else None,
         "settings": config_manager.get_settings()
     })
 
@@ -198,8 +461,12 @@ def api_stop_bot():
 @app.route("/api/settings", methods=["POST"])
 def update_settings():
     """Update the bot settings"""
-    new_settings = request.json
-    config_manager.update_settings(new_settings)
+    new_settings = request.get_json(silent=True)
+    try:
+        config_manager.update_settings(new_settings)
+    except SettingsError as e:
+        logger.warning(f"Settings update rejected: {str(e)}")
+        return jsonify({"success": False, "errors": e.errors}), 400
     return jsonify({"success": True, "settings": config_manager.get_settings()})
 
 
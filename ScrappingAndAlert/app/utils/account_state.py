@@ -0,0 +1,386 @@
+"""
+Local account state (margin balances, futures balances and positions)
+
+The state is seeded once over REST then kept current by the Binance account
+stream (user data stream), or by a replayed stream for offline tests.
+"""
+import json
+import time
+import threading
+from binance import ThreadedWebsocketManager
+from loguru import logger
+
+MARKETS = ("margin", "futures")
+
+
+def _margin_entry(asset, free=0.0, locked=0.0, borrowed=0.0, interest=0.0):
+    """Margin asset entry, in the userAssets format with numeric values"""
+    return {
+        "asset": asset,
+        "free": float(free),
+        "locked": float(locked),
+        "borrowed": float(borrowed),
+        "interest": float(interest),
+        "netAsset": float(free) + float(locked) - float(borrowed) - float(interest)
+    }
+
+
+def load_events(path):
+    """Load recorded events (one JSON object per line)"""
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class AccountState:
+    """
+    Account balances and positions, in memory and guarded by a lock
+
+    A market is "live" once it was seeded over REST and a stream keeps it current:
+    reads are then served from memory, otherwise the caller falls back to REST.
+    The Binance margin stream does not carry borrowed amounts: they are updated
+    locally by apply_loan/apply_repay and corrected on every resync. Free balances
+    only ever come from the stream or REST.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.margin_assets = {}  # asset -> entry in the userAssets format
+        self.futures_balances = {}  # asset -> {"wallet", "cross_wallet", "available"}
+        self.futures_positions = {}  # symbol -> {"amount", "entry_price", "unrealized_pnl"}
+        self.seeded_at = {market: None for market in MARKETS}
+        self.live = {market: False for market in MARKETS}
+        self.events_applied = 0
+        self.last_event_at = None
+        self.listeners = []
+
+    def add_listener(self, listener):
+        """Add a function called with (asset, free balance) on every margin balance update"""
+        self.listeners.append(listener)
+
+    def _notify(self, changes):
+        for asset, free in changes:
+            for listener in self.listeners:
+                try:
+                    listener(asset, free)
+                except Exception as e:
+                    logger.warning(f"Error in an account state listener: {str(e)}")
+
+    def seed_margin(self, account):
+        """Seed the margin balances from a get_margin_account response"""
+        assets = {
+            a["asset"]: _margin_entry(a["asset"], a["free"], a["locked"], a["borrowed"], a["interest"])
+            for a in account["userAssets"]
+        }
+        with self.lock:
+            self.margin_assets = assets
+            self.seeded_at["margin"] = time.time()
+        logger.info(f"Margin state seeded: {len(assets)} assets")
+
+    def seed_futures(self, balances, positions=None):
+        """
+        Seed the futures state
+
+        Args:
+            balances (list): futures_account_balance response
+            positions (list): futures_position_information response (optional)
+        """
+        futures_balances = {
+            b["asset"]: {
+                "wallet": float(b["balance"]),
+                "cross_wallet": float(b.get("crossWalletBalance", b["balance"])),
+                "available": float(b["withdrawAvailable"])
+            }
+            for b in balances
+        }
+        futures_positions = {
+            p["symbol"]: {
+                "amount": float(p["positionAmt"]),
+                "entry_price": float(p["entryPrice"]),
+                "unrealized_pnl": float(p.get("unRealizedProfit", 0))
+            }
+            for p in positions or [] if float(p["positionAmt"]) != 0
+        }
+        with self.lock:
+            self.futures_balances = futures_balances
+            if positions is not None:
+                self.futures_positions = futures_positions
+            self.seeded_at["futures"] = time.time()
+        logger.info(f"Futures state seeded: {len(futures_balances)} balances, {len(futures_positions)} positions")
+
+    def set_live(self, market, live):
+        """Set whether a stream currently keeps the market up to date"""
+        with self.lock:
+            self.live[market] = live and self.seeded_at[market] is not None
+
+    def is_live(self, market):
+        """True if reads for this market can be served from memory"""
+        with self.lock:
+            return self.live[market]
+
+    def apply_event(self, event):
+        """
+        Apply an account stream message
+
+        Handled messages: outboundAccountPosition and balanceUpdate (margin),
+        ACCOUNT_UPDATE (futures). Others are ignored.
+        """
+        event_type = event.get("e")
+        changes = []
+        with self.lock:
+            if event_type == "outboundAccountPosition":
+                for balance in event.get("B", []):
+                    entry = self.margin_assets.setdefault(balance["a"], _margin_entry(balance["a"]))
+                    entry["free"] = float(balance["f"])
+                    entry["locked"] = float(balance["l"])
+                    self._update_net_asset(entry)
+                    changes.append((balance["a"], entry["free"]))
+            elif event_type == "balanceUpdate":
+                # Always followed by an outboundAccountPosition carrying the full balance
+                pass
+            elif event_type == "ACCOUNT_UPDATE":
+                update = event.get("a", {})
+                for balance in update.get("B", []):
+                    current = self.futures_balances.setdefault(
+                        balance["a"], {"wallet": 0.0, "cross_wallet": 0.0, "available": 0.0}
+                    )
+                    cross_wallet = float(balance["cw"])
+                    # The stream has no available balance: it follows the wallet changes
+                    current["available"] += cross_wallet - current["cross_wallet"]
+                    current["wallet"] = float(balance["wb"])
+                    current["cross_wallet"] = cross_wallet
+                for position in update.get("P", []):
+                    amount = float(position["pa"])
+                    if amount == 0:
+                        self.futures_positions.pop(position["s"], None)
+                    else:
+                        self.futures_positions[position["s"]] = {
+                            "amount": amount,
+                            "entry_price": float(position["ep"]),
+                            "unrealized_pnl": float(position.get("up", 0))
+                        }
+            else:
+                return False
+            self.events_applied += 1
+            self.last_event_at = time.time()
+        self._notify(changes)
+        return True
+
+    def apply_loan(self, asset, amount):
+        """
+        Update the borrowed amount locally after a successful margin loan
+
+        The free balance is left alone: only the account stream (or a REST read)
+        raises it, once Binance has actually credited the asset.
+        """
+        with self.lock:
+            entry = self.margin_assets.setdefault(asset, _margin_entry(asset))
+            entry["borrowed"] += float(amount)
+            self._update_net_asset(entry)
+
+    def apply_repay(self, asset, amount):
+        """Update the borrowed amount locally after a successful margin repayment (see apply_loan)"""
+        with self.lock:
+            entry = self.margin_assets.setdefault(asset, _margin_entry(asset))
+            entry["borrowed"] = max(0.0, entry["borrowed"] - float(amount))
+            self._update_net_asset(entry)
+
+    @staticmethod
+    def _update_net_asset(entry):
+        entry["netAsset"] = entry["free"] + entry["locked"] - entry["borrowed"] - entry["interest"]
+
+    def margin_asset(self, asset):
+        """Return a copy of the margin entry of an asset, or None"""
+        with self.lock:
+            entry = self.margin_assets.get(asset)
+            return dict(entry) if entry else None
+
+    def borrowed_assets(self):
+        """Return the margin entries of borrowed assets"""
+        with self.lock:
+            return [dict(entry) for entry in self.margin_assets.values() if entry["borrowed"] > 0]
+
+    def futures_balance(self, asset="USDT"):
+        """Return a copy of the futures balance of an asset, or None"""
+        with self.lock:
+            balance = self.futures_balances.get(asset)
+            return dict(balance) if balance else None
+
+    def futures_position(self, symbol):
+        """Return a copy of the futures position of a symbol, or None"""
+        with self.lock:
+            position = self.futures_positions.get(symbol)
+            return dict(position) if position else None
+
+    def get_stats(self):
+        """Return the market states (live, seed age) and the number of events applied"""
+        now = time.time()
+        with self.lock:
+            return {
+                "markets": {
+                    market: {
+                        "live": self.live[market],
+                        "seeded_age_s": round(now - self.seeded_at[market], 1) if self.seeded_at[market] else None
+                    }
+                    for market in MARKETS
+                },
+                "events_applied": self.events_applied,
+                "last_event_age_s": round(now - self.last_event_at, 1) if self.last_event_at else None
+            }
+
+
+class AccountStream:
+    """
+    Binance account stream (user data stream) feeding an AccountState
+
+    The state is seeded over REST on start then resynced periodically, which
+    corrects borrowed amounts (interest) and messages missed during a reconnect.
+    Received messages can be recorded to be replayed.
+    """
+
+    def __init__(self, state, client, api_key, api_secret, markets=("margin",), resync_interval=300, record_path=None):
+        """
+        Args:
+            state (AccountState): The state to keep up to date
+            client: Binance client used for the REST seed
+            api_key (str): API key (required by the stream)
+            api_secret (str): API secret
+            markets (tuple): Followed markets ("margin" and/or "futures")
+            resync_interval (float): Delay in seconds between two REST resyncs
+            record_path (str): File the received messages are recorded to (one JSON per line)
+        """
+        self.state = state
+        self.client = client
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.markets = tuple(markets)
+        self.resync_interval = resync_interval
+        self.record_path = record_path
+        self.record_lock = threading.Lock()
+        self.manager = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def seed(self, market):
+        """Seed a market over REST"""
+        if market == "margin":
+            self.state.seed_margin(self.client.get_margin_account())
+        else:
+            self.state.seed_futures(self.client.futures_account_balance(), self.client.futures_position_information())
+
+    def start(self):
+        """Seed the state over REST then start the stream and the periodic resync"""
+        for market in self.markets:
+            self.seed(market)
+
+        self.stop_event.clear()
+        self.manager = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret)
+        self.manager.start()
+        for market in self.markets:
+            callback = self._make_callback(market)
+            if market == "margin":
+                self.manager.start_margin_socket(callback=callback)
+            else:
+                self.manager.start_futures_user_socket(callback=callback)
+            self.state.set_live(market, True)
+
+        self.thread = threading.Thread(target=self._resync_loop, name="account-resync")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Account stream started for {', '.join(self.markets)}")
+
+    def stop(self):
+        """Stop the stream; reads fall back to REST"""
+        self.stop_event.set()
+        for market in self.markets:
+            self.state.set_live(market, False)
+        if self.manager:
+            self.manager.stop()
+            self.manager = None
+        logger.info("Account stream stopped")
+
+    def _make_callback(self, market):
+        def callback(message):
+            if message.get("e") == "error":
+                # Reconnects exhausted: fall back to REST until the next resync
+                logger.error(f"{market} account stream interrupted: {message.get('m')}")
+                self.state.set_live(market, False)
+                return
+            self._record(message)
+            self.state.apply_event(message)
+        return callback
+
+    def _record(self, message):
+        if not self.record_path:
+            return
+        with self.record_lock:
+            with open(self.record_path, "a") as f:
+                f.write(json.dumps(message) + "\n")
+
+    def _resync_loop(self):
+        """Periodically resync the state over REST"""
+        while not self.stop_event.wait(self.resync_interval):
+            for market in self.markets:
+                try:
+                    self.seed(market)
+                    self.state.set_live(market, True)
+                except Exception as e:
+                    logger.warning(f"Error resyncing {market}: {str(e)}")
+
+
+class ReplayStream:
+    """
+    Account stream replayed from recorded events, for offline tests
+
+    Same interface as AccountStream: the state is seeded from the given snapshots
+    then the events are applied in order.
+    """
+
+    def __init__(self, state, events, margin_account=None, futures_balances=None, futures_positions=None, interval=0.0):
+        """
+        Args:
+            state (AccountState): The state to feed
+            events (list): Stream messages, or the path of a file recorded by AccountStream
+            margin_account (dict): Initial snapshot in the get_margin_account format
+            futures_balances (list): Initial snapshot in the futures_account_balance format
+            futures_positions (list): Initial snapshot in the futures_position_information format
+            interval (float): Delay in seconds between two events (0 to apply them all at once)
+        """
+        self.state = state
+        self.events = load_events(events) if isinstance(events, str) else list(events)
+        self.margin_account = margin_account
+        self.futures_balances = futures_balances
+        self.futures_positions = futures_positions
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.done = threading.Event()
+
+    def start(self):
+        """Seed the state then replay the events in a thread"""
+        if self.margin_account is not None:
+            self.state.seed_margin(self.margin_account)
+            self.state.set_live("margin", True)
+        if self.futures_balances is not None:
+            self.state.seed_futures(self.futures_balances, self.futures_positions)
+            self.state.set_live("futures", True)
+
+        self.stop_event.clear()
+        self.done.clear()
+        self.thread = threading.Thread(target=self._replay, name="account-replay")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop the replay"""
+        self.stop_event.set()
+        for market in MARKETS:
+            self.state.set_live(market, False)
+
+    def _replay(self):
+        for event in self.events:
+            if self.stop_event.is_set():
+                break
+            self.state.apply_event(event)
+            if self.interval and self.stop_event.wait(self.interval):
+                break
+        self.done.set()
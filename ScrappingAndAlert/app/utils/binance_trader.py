@@ -2,14 +2,39 @@
 Module for interacting with the Binance API and placing trading orders
 """
 import os
+import time
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from loguru import logger
 
+from app.utils.symbol_cache import symbol_cache as shared_symbol_cache
+from app.utils.account_state import AccountState, AccountStream
+from app.utils.price_book import PriceBook, PriceStream
+from app.utils.tracing import tracer
+from app.utils.metrics import registry
+
+# Binance requests by endpoint, error responses, and shorts attempted and placed
+REQUEST_DURATION = registry.histogram(
+    "binance_request_seconds", "Duration of the Binance requests by endpoint", ("method", "endpoint")
+)
+REQUEST_ERRORS = registry.counter("binance_request_errors_total", "Binance error responses by HTTP status", ("status",))
+SHORTS_ATTEMPTED = registry.counter("short_orders_attempted_total", "Shorts attempted")
+SHORTS_SUCCEEDED = registry.counter("short_orders_succeeded_total", "Shorts placed")
+
+
+def timed_call(func, *args, **kwargs):
+    """Run a call and return its result with its duration in milliseconds"""
+    started_at = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started_at) * 1000
+
+
 class BinanceTrader:
     """Class for interacting with the Binance API and placing trading orders"""
     
-    def __init__(self, api_key=None, api_secret=None):
+    def __init__(self, api_key=None, api_secret=None, symbol_cache=None):
         """Initialize the Binance trader"""
         self.api_key = api_key or os.getenv("BINANCE_API_KEY")
         self.api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
@@ -18,17 +43,38 @@ class BinanceTrader:
             logger.warning("Binance API keys not found in environment variables")
         
         self.client = self._init_client()
+        self.symbol_cache = symbol_cache or shared_symbol_cache
+        
+        # Pool used to send the independent requests of an order at the same time
+        self.executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="binance")
+        
+        # Balances and positions kept in memory by the account stream (see start_account_stream)
+        self.account_state = AccountState()
+        self.account_stream = None
+        
+        # Prices kept in memory by the ticker stream (see start_price_stream)
+        self.price_book = PriceBook()
+        self.price_stream = None
     
     def _init_client(self):
         """Initialize the Binance client"""
         try:
             client = Client(self.api_key, self.api_secret)
+            client.session.hooks["response"].append(self._record_request)
             logger.info("Binance client successfully initialized")
             return client
         except Exception as e:
             logger.error(f"Error initializing Binance client: {str(e)}")
             return None
     
+    @staticmethod
+    def _record_request(response, *args, **kwargs):
+        """Time every Binance request by endpoint, up to the response headers (requests response hook)"""
+        REQUEST_DURATION.observe(response.elapsed.total_seconds(), response.request.method, urlsplit(response.url).path)
+        if response.status_code >= 400:
+            REQUEST_ERRORS.inc(str(response.status_code))
+        return response
+    
     def test_connection(self):
         """Test the connection to the Binance API"""
         try:
@@ -57,10 +103,14 @@ class BinanceTrader:
                 logger.error("Client Binance non initialisé")
                 return None
             
-            balances = self.client.futures_account_balance()
-            
-            # Filter to get USDT balance
-            usdt_balance = next((b for b in balances if b["asset"] == "USDT"), None)
+            if self.account_state.is_live("futures"):
+                usdt_balance = self.account_state.futures_balance("USDT")
+                usdt_balance = {"withdrawAvailable": usdt_balance["available"]} if usdt_balance else None
+            else:
+                balances = self.client.futures_account_balance()
+                
+                # Filter to get USDT balance
+                usdt_balance = next((b for b in balances if b["asset"] == "USDT"), None)
             
             if usdt_balance:
                 available_balance = float(usdt_balance["withdrawAvailable"])
@@ -73,6 +123,49 @@ class BinanceTrader:
             logger.error(f"Error retrieving futures balance: {str(e)}")
             return None
     
+    def start_account_stream(self, markets=("futures",), resync_interval=300, record_path=None):
+        """
+        Seed the account state over REST then keep it current with the Binance account stream
+        
+        While the stream is live, balances and positions are read from memory.
+        
+        Args:
+            markets (tuple): Markets to follow ("futures" and/or "margin")
+            resync_interval (float): Delay in seconds between two REST resyncs
+            record_path (str): File the received messages are recorded to, for replay (optional)
+        """
+        self.stop_account_stream()
+        self.account_stream = AccountStream(
+            self.account_state, self.client, self.api_key, self.api_secret,
+            markets=markets, resync_interval=resync_interval, record_path=record_path
+        )
+        self.account_stream.start()
+    
+    def stop_account_stream(self):
+        """Stop the account stream; reads fall back to REST"""
+        if self.account_stream:
+            self.account_stream.stop()
+            self.account_stream = None
+    
+    def start_price_stream(self, markets=("futures",), max_age=5.0):
+        """
+        Feed the price book with the all-market ticker stream
+        
+        Args:
+            markets (tuple): Markets to follow ("futures" and/or "spot")
+            max_age (float): Maximum age in seconds of a price usable without a REST call
+        """
+        self.stop_price_stream()
+        self.price_book.max_age = max_age
+        self.price_stream = PriceStream(self.price_book, self.client, markets=markets)
+        self.price_stream.start()
+    
+    def stop_price_stream(self):
+        """Stop the price stream; prices fall back to REST"""
+        if self.price_stream:
+            self.price_stream.stop()
+            self.price_stream = None
+    
     def set_leverage(self, symbol, leverage):
         """Set the leverage for a given symbol"""
         try:
@@ -121,6 +214,11 @@ class BinanceTrader:
         """
         Place a short sell order on the futures market
         
+        The margin type, leverage, balance, price and symbol filters do not depend on
+        each other: they are requested in parallel and the order is sent once all of
+        them are back. The price comes from the price book when the stream is live.
+        The duration of every stage is logged.
+        
         Args:
             symbol (str): The symbol to short (e.g., "BTCUSDT")
             leverage (int): The leverage to use (1-20)
@@ -133,46 +231,62 @@ class BinanceTrader:
                 logger.error("Client Binance non initialisé")
                 return False
             
-            # Set margin type to CROSSED (Cross Margin)
-            self.set_margin_type(symbol, "CROSSED")
+            SHORTS_ATTEMPTED.inc()
+            started_at = time.perf_counter()
+            stages = {}
             
-            # Définir le levier
-            self.set_leverage(symbol, leverage)
+            # Margin type (CROSSED), leverage, balance, price and filters are independent
+            futures = {
+                "set_margin_type": self.executor.submit(timed_call, self.set_margin_type, symbol, "CROSSED"),
+                "set_leverage": self.executor.submit(timed_call, self.set_leverage, symbol, leverage),
+                "get_futures_balance": self.executor.submit(timed_call, self.get_futures_balance),
+                "price": self.executor.submit(timed_call, self.price_book.price, self.client, symbol, "futures"),
+                "symbol_filters": self.executor.submit(timed_call, self.symbol_cache.get, self.client, symbol, "futures")
+            }
+            # Join: the order needs every one of them
+            results = {}
+            for stage, future in futures.items():
+                results[stage], stages[stage] = future.result()
+            stages["parallel_total"] = (time.perf_counter() - started_at) * 1000
             
             # Get available balance
-            available_balance = self.get_futures_balance()
+            available_balance = results["get_futures_balance"]
             
             if not available_balance or available_balance <= 0:
                 logger.error("Insufficient futures balance to place an order")
                 return False
             
             # Get current symbol price
-            ticker = self.client.futures_symbol_ticker(symbol=symbol)
-            current_price = float(ticker["price"])
+            current_price = results["price"]
             
             # Calculate quantity to short (taking leverage into account)
             # Use 95% of available balance to avoid insufficient margin errors
             quantity = (available_balance * 0.95 * leverage) / current_price
             
             # Round the quantity to the appropriate precision
-            exchange_info = self.client.futures_exchange_info()
-            symbol_info = next((s for s in exchange_info["symbols"] if s["symbol"] == symbol), None)
+            symbol_meta = results["symbol_filters"]
             
-            if not symbol_info:
+            if not symbol_meta:
                 logger.error(f"Symbol {symbol} not found in exchange information")
                 return False
             
             # Find the quantity precision
-            quantity_precision = symbol_info["quantityPrecision"]
-            quantity = round(quantity, quantity_precision)
+            quantity = round(quantity, symbol_meta["quantity_precision"])
             
             # Place the short sell order
-            order = self.client.futures_create_order(
+            order, stages["futures_create_order"] = timed_call(
+                self.client.futures_create_order,
                 symbol=symbol,
                 side="SELL",  # SELL for shorting
                 type="MARKET",
                 quantity=quantity
             )
+            stages["total"] = (time.perf_counter() - started_at) * 1000
+            logger.info("Order latency breakdown: " + ", ".join(f"{stage}={ms:.0f}ms" for stage, ms in stages.items()))
+            SHORTS_SUCCEEDED.inc()
+            tracer.mark("order_accepted")
+            for stage, ms in stages.items():
+                tracer.record("place_short_order" if stage == "total" else f"short.{stage}", ms / 1000)
             
             logger.success(f"Short order successfully placed for {symbol}: {quantity} at {current_price} USDT with leverage of {leverage}x")
             logger.info(f"Order details: {order}")
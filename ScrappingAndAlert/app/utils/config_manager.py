@@ -3,11 +3,59 @@ Application configuration management module
 """
 import os
 import json
+import threading
 from pathlib import Path
 from loguru import logger
 
+from app.utils.settings_schema import Settings, SettingsError, validate_settings
+
+
+class FrozenSettings(dict):
+    """
+    Read-only settings snapshot
+    
+    Changes go through ConfigManager.update_settings, which publishes a new snapshot:
+    a reader never sees a half-applied update.
+    """
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Settings are read-only: use ConfigManager.update_settings")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def copy(self):
+        """Return a mutable copy"""
+        return thaw(self)
+
+
+def freeze(value):
+    """Copy a JSON value into an immutable one (read-only dicts, lists as tuples)"""
+    if isinstance(value, dict):
+        return FrozenSettings((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Mutable copy of a value frozen by freeze"""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
 class ConfigManager:
-    """Configuration manager for the GentleMate application"""
+    """
+    Configuration manager for the GentleMate application
+    
+    get_settings returns the current snapshot without taking a lock. Writes are
+    serialized: the new snapshot is written to disk (temporary file, then rename),
+    published with a single assignment, and subscribers are notified. Edits made
+    directly to the file are reloaded by watch().
+    """
     
     def __init__(self, config_file="config.json"):
         """Initialize the configuration manager"""
@@ -16,10 +64,29 @@ class ConfigManager:
             "trading_enabled": False,
             "target_account": os.getenv("TARGET_TWITTER_ACCOUNT", "DamienMATHIS4"),
             "target_coin": os.getenv("DEFAULT_COIN", "USDC"),
+            "default_symbol": "BTCUSDT",
             "leverage": 1,
-            "check_interval": int(os.getenv("CHECK_INTERVAL", 3))
+            "check_interval": int(os.getenv("CHECK_INTERVAL", 3)),
+            "ingestion_mode": os.getenv("INGESTION_MODE", "poll"),
+            "target_accounts": [],
+            "max_poll_workers": 8,
+            "twitter_requests_per_window": 900,
+            "adaptive_polling": True,
+            "max_poll_interval": 300,
+            "account_stream_enabled": True,
+            "account_resync_interval": 300,
+            "price_stream_enabled": True,
+            "price_max_age": 5,
+            "config_watch_interval": 1.0
         }
-        self.settings = self._load_settings()
+        self.write_lock = threading.Lock()
+        self.subscribers = []
+        self.file_signature = None
+        self.watch_thread = None
+        self.watch_stop = threading.Event()
+        self.settings = freeze(self._load_settings())
+        self.typed = Settings(self.settings, self.default_settings)
+        self.file_signature = self._file_signature()
     
     def _load_settings(self):
         """Load settings from the configuration file"""
@@ -27,8 +94,12 @@ class ConfigManager:
             if Path(self.config_file).exists():
                 with open(self.config_file, "r") as f:
                     settings = json.load(f)
+                clean, errors = validate_settings(settings, allow_unknown=True)
+                if errors:
+                    # Invalid settings fall back to their default value
+                    logger.error(f"Invalid settings ignored in {self.config_file}: {'; '.join(errors)}")
                 logger.info(f"Settings loaded from {self.config_file}")
-                return settings
+                return clean
             else:
                 logger.info(f"Configuration file {self.config_file} not found, using default settings")
                 self._save_settings(self.default_settings)
@@ -38,10 +109,17 @@ class ConfigManager:
             return self.default_settings
     
     def _save_settings(self, settings):
-        """Save settings to the configuration file"""
+        """
+        Save settings to the configuration file
+        
+        Writes a temporary file and renames it, so the file is never left truncated.
+        """
         try:
-            with open(self.config_file, "w") as f:
+            temp_file = f"{self.config_file}.tmp"
+            with open(temp_file, "w") as f:
                 json.dump(settings, f, indent=4)
+            os.replace(temp_file, self.config_file)
+            self.file_signature = self._file_signature()
             logger.info(f"Settings saved to {self.config_file}")
             return True
         except Exception as e:
@@ -49,12 +127,140 @@ class ConfigManager:
             return False
     
     def get_settings(self):
-        """Return the current settings"""
+        """Return the current (read-only) settings snapshot"""
         return self.settings
     
+    def get_typed_settings(self):
+        """Return the current settings in typed form (Settings), read as attributes"""
+        return self.typed
+    
+    def subscribe(self, callback):
+        """
+        Subscribe a function to settings changes
+        
+        Args:
+            callback (callable): Called with (new snapshot, changed keys) after every change
+        """
+        with self.write_lock:
+            self.subscribers = self.subscribers + [callback]
+    
+    def unsubscribe(self, callback):
+        """Unsubscribe a function from settings changes"""
+        with self.write_lock:
+            self.subscribers = [subscriber for subscriber in self.subscribers if subscriber is not callback]
+    
+    def _publish(self, settings, save=True):
+        """
+        Publish a new snapshot, saved to disk if save is set (called under write_lock)
+        
+        Returns:
+            tuple: (saved successfully, changed keys)
+        """
+        previous = self.settings
+        saved = self._save_settings(settings) if save else True
+        frozen = freeze(settings)
+        self.typed = Settings(frozen, self.default_settings)
+        self.settings = frozen
+        changed = {key for key in set(previous) | set(self.settings) if previous.get(key) != self.settings.get(key)}
+        return saved, changed
+    
+    def _notify(self, settings, changed):
+        """Notify subscribers of a change (outside the lock: a subscriber may update the settings)"""
+        if not changed:
+            return
+        for callback in self.subscribers:
+            try:
+                callback(settings, changed)
+            except Exception as e:
+                logger.error(f"Error notifying a settings change: {str(e)}")
+    
+    def _file_signature(self):
+        """Modification time and size of the configuration file, None if it is missing"""
+        try:
+            stat = os.stat(self.config_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def reload(self):
+        """
+        Reload the configuration file if it changed since it was last read
+        
+        An unreadable or invalid file is ignored: the current settings stay in place.
+        
+        Returns:
+            bool: True if a new snapshot was published
+        """
+        signature = self._file_signature()
+        if signature is None or signature == self.file_signature:
+            return False
+        
+        try:
+            with open(self.config_file, "r") as f:
+                settings = json.load(f)
+        except (OSError, ValueError) as e:
+            # File being written: the next change will reload it
+            self.file_signature = signature
+            logger.error(f"Unreadable configuration file, change ignored: {str(e)}")
+            return False
+        
+        settings, errors = validate_settings(settings, allow_unknown=True)
+        if errors:
+            self.file_signature = signature
+            logger.error(f"Invalid configuration, change ignored: {'; '.join(errors)}")
+            return False
+        
+        with self.write_lock:
+            self.file_signature = signature
+            _, changed = self._publish(settings, save=False)
+            snapshot = self.settings
+        if changed:
+            logger.info(f"Settings reloaded from {self.config_file}: {sorted(changed)}")
+        self._notify(snapshot, changed)
+        return bool(changed)
+    
+    def watch(self, interval=1.0):
+        """
+        Watch the configuration file and reload its changes
+        
+        Args:
+            interval (float): Seconds between two checks (modification time and size)
+        """
+        if self.watch_thread and self.watch_thread.is_alive():
+            return
+        self.watch_stop.clear()
+        self.watch_thread = threading.Thread(target=self._watch_loop, args=(interval,), name="config-watch")
+        self.watch_thread.daemon = True
+        self.watch_thread.start()
+        logger.info(f"Watching {self.config_file} (interval: {interval}s)")
+    
+    def stop_watching(self):
+        """Stop watching the configuration file"""
+        self.watch_stop.set()
+    
+    def _watch_loop(self, interval):
+        """Configuration file watch loop"""
+        while not self.watch_stop.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Error reloading settings: {str(e)}")
+    
     def update_settings(self, new_settings):
-        """Update the settings"""
-        self.settings.update(new_settings)
-        self._save_settings(self.settings)
+        """
+        Update the settings
+        
+        Raises:
+            SettingsError: If a value is invalid or a setting unknown (nothing is changed)
+        """
+        new_settings, errors = validate_settings(new_settings)
+        if errors:
+            raise SettingsError(errors)
+        with self.write_lock:
+            settings = thaw(self.settings)
+            settings.update(new_settings)
+            _, changed = self._publish(settings)
+            snapshot = self.settings
         logger.info(f"Settings updated: {new_settings}")
-        return self.settings
+        self._notify(snapshot, changed)
+        return snapshot
@@ -0,0 +1,59 @@
+"""
+Local pre-filter rejecting tweets that cannot be hack announcements before the LLM is called
+"""
+import re
+import threading
+import time
+import unicodedata
+
+# The Claude prompt only answers true when the tweet contains the word "hack",
+# so any tweet without it (hacked, hacker, #hack, ...) is a guaranteed negative.
+DEFAULT_KEYWORDS = ("hack",)
+
+
+class HackPrefilter:
+    """
+    Compiled keyword filter run on every tweet before the LLM
+
+    Text is NFKC-normalized first, so stylized Unicode letters often used on
+    crypto Twitter (e.g. mathematical bold or full-width "hack") still match.
+    """
+
+    def __init__(self, keywords=DEFAULT_KEYWORDS):
+        """
+        Args:
+            keywords (iterable): Words or regular expressions that make a tweet a candidate
+        """
+        self.keywords = tuple(keywords)
+        self.pattern = re.compile("|".join(f"(?:{keyword})" for keyword in self.keywords), re.IGNORECASE)
+        self.lock = threading.Lock()
+        self.evaluated = 0
+        self.escalated = 0
+        self.filter_time = 0.0
+
+    def is_candidate(self, text):
+        """
+        Check whether a tweet must be sent to the LLM
+
+        Returns:
+            bool: False if the tweet is an obvious negative, True if it must be escalated
+        """
+        started_at = time.perf_counter()
+        candidate = self.pattern.search(unicodedata.normalize("NFKC", text)) is not None
+        elapsed = time.perf_counter() - started_at
+        with self.lock:
+            self.evaluated += 1
+            self.escalated += int(candidate)
+            self.filter_time += elapsed
+        return candidate
+
+    def get_stats(self):
+        """Return the number of tweets evaluated and escalated, and the time spent filtering"""
+        with self.lock:
+            return {
+                "evaluated": self.evaluated,
+                "escalated": self.escalated,
+                "rejected": self.evaluated - self.escalated,
+                "escalation_rate": round(self.escalated / self.evaluated, 3) if self.evaluated else None,
+                "avg_filter_us": round(self.filter_time / self.evaluated * 1e6, 2) if self.evaluated else None
+            }
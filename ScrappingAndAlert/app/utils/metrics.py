@@ -0,0 +1,203 @@
+"""
+Application metrics, exported in the Prometheus text format
+"""
+import math
+import bisect
+import threading
+from loguru import logger
+
+# Upper bounds of the duration histograms in seconds, from 0.5 ms to 5 minutes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Content type Prometheus expects for the text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    """Escape a label value"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    """Format the labels of a sample ({name="value",...}), empty if there are none"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f"{name}=\"{_escape(value)}\"" for name, value in pairs) + "}"
+
+
+def _value(value):
+    """Format the value of a sample"""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return f"{value:.9g}"
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Args:
+            name (str): Full metric name (ending in _total)
+            documentation (str): Description exported in the HELP line
+            labelnames (tuple): Label names, in the order of the values given to inc
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, *labelvalues, amount=1):
+        """Add amount to the series of the given labels"""
+        with self.lock:
+            self.series[labelvalues] = self.series.get(labelvalues, 0) + amount
+
+    def render(self):
+        """Return the metric's lines in the Prometheus text format"""
+        with self.lock:
+            series = dict(self.series)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in sorted(series.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_value(value)}")
+        return lines
+
+
+class Gauge:
+    """
+    Value read by a function at export time
+
+    Nothing is computed between two exports: the function reads the current state
+    (queue depth, remaining quota) or statistics a module already keeps, in which
+    case kind="counter" exports the value as a counter.
+    """
+
+    def __init__(self, name, documentation, collect, labelnames=(), kind="gauge"):
+        """
+        Args:
+            name (str): Full metric name
+            documentation (str): Description exported in the HELP line
+            collect (callable): Returns a number, a dict {label values: number},
+                or None when the value is not available
+            labelnames (tuple): Label names of the keys returned by collect
+            kind (str): Exported type, "gauge" or "counter"
+        """
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self):
+        """Return the metric's lines in the Prometheus text format"""
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.error(f"Error reading metric {self.name}: {str(e)}")
+            values = None
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if values is None:
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in sorted(values.items()):
+            if value is not None:
+                labelvalues = labelvalues if isinstance(labelvalues, tuple) else (labelvalues,)
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, one series per combination of label values
+
+    observe() is a binary search and two additions under a lock; the cumulative
+    counts are only computed at export time.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): Full metric name
+            documentation (str): Description exported in the HELP line
+            labelnames (tuple): Label names, in the order of the values given to observe
+            buckets (tuple): Upper bounds of the buckets (the +Inf bucket is added)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [count of each bucket..., +Inf count, sum]
+
+    def observe(self, value, *labelvalues):
+        """Add an observation (in seconds for a duration) to the series of the given labels"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labelvalues)
+            if series is None:
+                series = self.series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        """Return the metric's lines in the Prometheus text format"""
+        with self.lock:
+            series = {labelvalues: list(values) for labelvalues, values in self.series.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (None,), values[:-1]):
+                cumulative += count
+                le = "+Inf" if bound is None else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_value(values[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics exported by /metrics, prefixed with a namespace"""
+
+    def __init__(self, namespace="shortthehack"):
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _register(self, metric):
+        """Add a metric, or return the one already registered under that name"""
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Return the histogram called name (created on the first call)"""
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    def counter(self, name, documentation, labelnames=()):
+        """Return the counter called name (created on the first call)"""
+        return self._register(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def gauge(self, name, documentation, collect, labelnames=(), kind="gauge"):
+        """Register a value read by collect at every export (see Gauge)"""
+        return self._register(Gauge(f"{self.namespace}_{name}", documentation, collect, labelnames, kind))
+
+    def render(self):
+        """Return every metric in the Prometheus text format"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registry shared by every module of the process
+registry = MetricsRegistry()
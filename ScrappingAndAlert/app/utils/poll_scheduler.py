@@ -0,0 +1,255 @@
+"""
+Scheduling of Twitter polls across many accounts under a shared rate-limit budget
+"""
+import heapq
+import math
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every poll worker
+
+    The bucket holds up to `burst` tokens and refills at `requests_per_window / window`
+    tokens per second, so the long-run request rate never exceeds the API budget.
+    """
+
+    def __init__(self, requests_per_window, window=900.0, burst=None):
+        """
+        Args:
+            requests_per_window (int): Number of requests allowed per window
+            window (float): Length of the rate-limit window in seconds (15 minutes for Twitter)
+            burst (int): Maximum number of requests that can be sent back to back
+        """
+        self.rate = requests_per_window / window
+        self.capacity = burst or max(1, min(requests_per_window, 10))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, stop_event=None):
+        """
+        Take a token, waiting until one is available
+
+        Returns:
+            bool: True once a token was taken, False if stop_event was set while waiting
+        """
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def set_rate(self, requests_per_window, window=900.0):
+        """Change the budget without losing the tokens already accumulated"""
+        with self.lock:
+            self._refill()
+            self.rate = requests_per_window / window
+
+
+class PollScheduler:
+    """
+    Min-heap of accounts ordered by their next due time
+
+    An account is never handed out twice at the same time: it leaves the heap when
+    it is taken and comes back when its poll is rescheduled.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.accounts = set()
+        self.queued = set()
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+
+    def sync_accounts(self, accounts):
+        """Add new accounts (due immediately) and forget removed ones"""
+        accounts = set(accounts)
+        with self.lock:
+            now = time.monotonic()
+            for account in accounts - self.queued - self.in_flight:
+                heapq.heappush(self.heap, (now, account))
+                self.queued.add(account)
+            self.accounts = accounts
+            # Removed accounts are dropped lazily when they reach the top of the heap
+        self.wakeup.set()
+
+    def next_due(self, stop_event):
+        """
+        Wait for the next due account and take it
+
+        Returns:
+            tuple: (account, due_time), or (None, None) if stop_event was set
+        """
+        while not stop_event.is_set():
+            with self.lock:
+                while self.heap and self.heap[0][1] not in self.accounts:
+                    self.queued.discard(heapq.heappop(self.heap)[1])
+                if self.heap:
+                    due, account = self.heap[0]
+                    wait = due - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self.heap)
+                        self.queued.discard(account)
+                        self.in_flight.add(account)
+                        return account, due
+                else:
+                    wait = 1.0
+                self.wakeup.clear()
+            self.wakeup.wait(min(wait, 1.0))
+        return None, None
+
+    def get_depths(self):
+        """Return how many accounts are due and waiting for a worker, and how many polls are running"""
+        now = time.monotonic()
+        with self.lock:
+            due = sum(1 for due_at, account in self.heap if due_at <= now and account in self.accounts)
+            return {"due": due, "in_flight": len(self.in_flight)}
+
+    def reschedule(self, account, delay):
+        """Put an account back in the heap once its poll is over"""
+        with self.lock:
+            self.in_flight.discard(account)
+            if account in self.accounts:
+                heapq.heappush(self.heap, (time.monotonic() + delay, account))
+                self.queued.add(account)
+        self.wakeup.set()
+
+
+class AdaptivePollPolicy:
+    """
+    Poll interval of each account, from the remaining API quota and the account's activity
+
+    The request rate is the configured budget, lowered to what the quota reported by
+    the API (remaining requests until the window resets) can sustain. That rate is
+    split across accounts in proportion to the square root of their weight, which
+    minimizes the average detection latency for a fixed number of requests: an
+    account's weight grows with its recent tweets and hack signals and decays with
+    a half-life. When the quota runs low the intervals stretch smoothly; once it is
+    exhausted, every account waits for the reset.
+    """
+
+    def __init__(self, requests_per_window, window=900.0, min_interval=3.0, max_interval=300.0,
+                 half_life=3600.0, hack_weight=20.0, reserve=0.05):
+        """
+        Args:
+            requests_per_window (int): API requests allowed per window, for all accounts
+            window (float): Length of the rate-limit window in seconds
+            min_interval (float): Shortest interval between two polls of an account
+            max_interval (float): Longest interval while quota is left
+            half_life (float): Seconds after which activity and hack signals count half
+            hack_weight (float): Weight of one hack signal compared to one tweet
+            reserve (float): Share of the reported limit kept unused
+        """
+        self.default_rate = requests_per_window / window
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.half_life = half_life
+        self.hack_weight = hack_weight
+        self.reserve = reserve
+        self.quota = None  # (limit, remaining, reset timestamp) reported by the API
+        self.scores = {}  # account -> [activity, hack signals, updated_at]
+        self.lock = threading.Lock()
+
+    def set_budget(self, requests_per_window, window=900.0):
+        """Change the configured request budget"""
+        with self.lock:
+            self.default_rate = requests_per_window / window
+
+    def update_quota(self, limit, remaining, reset_at):
+        """Record the quota reported by the API (x-rate-limit-* headers)"""
+        with self.lock:
+            self.quota = (limit, remaining, reset_at)
+
+    def _decayed(self, account, now):
+        """Return the account's scores decayed to now (called under the lock)"""
+        score = self.scores.setdefault(account, [0.0, 0.0, now])
+        factor = 0.5 ** ((now - score[2]) / self.half_life)
+        score[0] *= factor
+        score[1] *= factor
+        score[2] = now
+        return score
+
+    def record_poll(self, account, new_tweets):
+        """Count the tweets found by a poll of an account"""
+        with self.lock:
+            self._decayed(account, time.time())[0] += new_tweets
+
+    def record_signal(self, account, strength=1.0):
+        """Raise an account's hack likelihood (a detected or suspected hack tweet)"""
+        with self.lock:
+            self._decayed(account, time.time())[1] += strength
+
+    def _weight(self, account, now):
+        activity, hacks, _ = self._decayed(account, now)
+        return 1.0 + activity + self.hack_weight * hacks
+
+    def rate(self, now=None):
+        """
+        Requests per second the accounts may use right now
+
+        Returns:
+            float: The rate, 0 if the quota is exhausted until the reset
+        """
+        now = now or time.time()
+        with self.lock:
+            return self._rate(now)
+
+    def _rate(self, now):
+        if not self.quota or self.quota[2] <= now:
+            return self.default_rate
+        limit, remaining, reset_at = self.quota
+        usable = remaining - self.reserve * limit
+        if usable < 1:
+            return 0.0
+        return min(self.default_rate, usable / (reset_at - now))
+
+    def interval(self, account, accounts):
+        """
+        Delay before the next poll of an account
+
+        Args:
+            account (str): The account just polled
+            accounts (iterable): Every polled account, sharing the rate
+        """
+        now = time.time()
+        with self.lock:
+            rate = self._rate(now)
+            if rate <= 0:
+                # Quota exhausted: nothing to gain before the reset
+                return max(self.min_interval, self.quota[2] - now + 1)
+            weight = math.sqrt(self._weight(account, now))
+            total = sum(math.sqrt(self._weight(other, now)) for other in accounts) or weight
+            interval = total / (rate * weight)
+            if self.quota and self.quota[2] > now:
+                # A low quota only lasts until the reset: past it the full budget applies again
+                interval = min(interval, self.quota[2] - now + total / (self.default_rate * weight))
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def get_stats(self, accounts=()):
+        """Return the current rate, the reported quota and each account's weight"""
+        now = time.time()
+        with self.lock:
+            return {
+                "rate_per_min": round(self._rate(now) * 60, 1),
+                "quota": {
+                    "limit": self.quota[0],
+                    "remaining": self.quota[1],
+                    "reset_in_s": round(self.quota[2] - now)
+                } if self.quota else None,
+                "weights": {account: round(self._weight(account, now), 2) for account in accounts}
+            }
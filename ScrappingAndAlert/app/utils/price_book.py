@@ -0,0 +1,242 @@
+"""
+Local price book, fed by the all-market ticker stream
+"""
+import time
+import threading
+from binance import ThreadedWebsocketManager
+from loguru import logger
+
+MARKETS = ("spot", "futures")
+
+
+class PriceBook:
+    """
+    Last known price of every symbol, in memory
+
+    A price is usable if it was updated less than max_age seconds ago, or if the
+    market stream is live and sent a message less than max_age seconds ago (the
+    stream only sends the symbols whose price changed). Otherwise the price is
+    fetched over REST and kept.
+    """
+
+    def __init__(self, max_age=5.0):
+        """
+        Args:
+            max_age (float): Maximum age in seconds of a price usable without a REST call
+        """
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.prices = {market: {} for market in MARKETS}  # symbol -> (price, timestamp)
+        self.live = {market: False for market in MARKETS}
+        self.last_message_at = {market: None for market in MARKETS}
+        self.hits = 0
+        self.fallbacks = 0
+
+    def update(self, market, ticks, received_at=None):
+        """
+        Record received prices
+
+        Args:
+            market (str): "spot" or "futures"
+            ticks (iterable): (symbol, price) pairs
+            received_at (float): Reception time (now by default)
+        """
+        received_at = received_at or time.time()
+        with self.lock:
+            book = self.prices[market]
+            for symbol, price in ticks:
+                book[symbol] = (float(price), received_at)
+            self.last_message_at[market] = received_at
+
+    def set_live(self, market, live):
+        """Set whether a stream currently keeps the market up to date"""
+        with self.lock:
+            self.live[market] = live
+
+    def _is_fresh(self, market, updated_at, now):
+        if now - updated_at <= self.max_age:
+            return True
+        last_message_at = self.last_message_at[market]
+        return self.live[market] and last_message_at is not None and now - last_message_at <= self.max_age
+
+    def get(self, symbol, market="spot"):
+        """Return the in-memory price if usable, None otherwise"""
+        now = time.time()
+        with self.lock:
+            entry = self.prices[market].get(symbol)
+            if entry and self._is_fresh(market, entry[1], now):
+                self.hits += 1
+                return entry[0]
+        return None
+
+    def price(self, client, symbol, market="spot"):
+        """
+        Return the price of a symbol, from memory if usable, otherwise over REST
+
+        Returns:
+            float: The price (raises if the REST call fails)
+        """
+        price = self.get(symbol, market)
+        if price is not None:
+            return price
+
+        if market == "spot":
+            ticker = client.get_symbol_ticker(symbol=symbol)
+        else:
+            ticker = client.futures_symbol_ticker(symbol=symbol)
+        price = float(ticker["price"])
+        with self.lock:
+            self.fallbacks += 1
+            self.prices[market][symbol] = (price, time.time())
+        return price
+
+    def all_prices(self, client, market="spot"):
+        """
+        Return the prices of every symbol of a market
+
+        Read from memory if the stream is live, otherwise fetched in a single REST call.
+
+        Returns:
+            dict: symbol -> price
+        """
+        now = time.time()
+        with self.lock:
+            last_message_at = self.last_message_at[market]
+            if self.live[market] and last_message_at is not None and now - last_message_at <= self.max_age:
+                self.hits += 1
+                return {symbol: price for symbol, (price, _) in self.prices[market].items()}
+
+        if market == "spot":
+            tickers = client.get_all_tickers()
+        else:
+            tickers = client.futures_symbol_ticker()
+        self.update(market, ((ticker["symbol"], ticker["price"]) for ticker in tickers))
+        with self.lock:
+            self.fallbacks += 1
+        return {ticker["symbol"]: float(ticker["price"]) for ticker in tickers}
+
+    def get_stats(self):
+        """Return the stream states, symbol counts and in-memory / REST reads"""
+        now = time.time()
+        with self.lock:
+            return {
+                "markets": {
+                    market: {
+                        "live": self.live[market],
+                        "symbols": len(self.prices[market]),
+                        "last_message_age_s": round(now - self.last_message_at[market], 1) if self.last_message_at[market] else None
+                    }
+                    for market in MARKETS
+                },
+                "hits": self.hits,
+                "rest_fallbacks": self.fallbacks
+            }
+
+
+def ticks_from_message(message):
+    """Extract the (symbol, price) pairs of a ticker stream message"""
+    if isinstance(message, dict):
+        if message.get("e") == "error":
+            return None
+        # Multiplexed messages ({"stream": ..., "data": [...]})
+        message = message.get("data", [message])
+    return [(tick["s"], tick["c"]) for tick in message if "s" in tick and "c" in tick]
+
+
+class PriceStream:
+    """Binance all-market mini-ticker stream feeding a PriceBook"""
+
+    def __init__(self, book, client, markets=("spot",)):
+        """
+        Args:
+            book (PriceBook): The book to feed
+            client: Binance client used to load every price on start
+            markets (tuple): Followed markets ("spot" and/or "futures")
+        """
+        self.book = book
+        self.client = client
+        self.markets = tuple(markets)
+        self.manager = None
+
+    def start(self):
+        """Load every price over REST then start the stream"""
+        for market in self.markets:
+            self.book.all_prices(self.client, market)
+
+        self.manager = ThreadedWebsocketManager()
+        self.manager.start()
+        for market in self.markets:
+            callback = self._make_callback(market)
+            if market == "spot":
+                self.manager.start_miniticker_socket(callback=callback)
+            else:
+                self.manager.start_all_ticker_futures_socket(callback=callback)
+            self.book.set_live(market, True)
+        logger.info(f"Price stream started for {', '.join(self.markets)}")
+
+    def stop(self):
+        """Stop the stream; prices fall back to REST"""
+        for market in self.markets:
+            self.book.set_live(market, False)
+        if self.manager:
+            self.manager.stop()
+            self.manager = None
+        logger.info("Price stream stopped")
+
+    def _make_callback(self, market):
+        def callback(message):
+            ticks = ticks_from_message(message)
+            if ticks is None:
+                # Reconnects exhausted: fall back to REST
+                logger.error(f"{market} price stream interrupted: {message.get('m')}")
+                self.book.set_live(market, False)
+                return
+            self.book.update(market, ticks)
+        return callback
+
+
+class ReplayPriceSource:
+    """
+    Price stream replayed from recorded messages, for offline tests
+
+    Same interface as PriceStream.
+    """
+
+    def __init__(self, book, messages, market="spot", interval=0.0):
+        """
+        Args:
+            book (PriceBook): The book to feed
+            messages (list): Messages in the stream format (lists of mini-tickers)
+            market (str): The replayed market
+            interval (float): Delay in seconds between two messages
+        """
+        self.book = book
+        self.messages = list(messages)
+        self.market = market
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Replay the messages in a thread"""
+        self.book.set_live(self.market, True)
+        self.stop_event.clear()
+        self.done.clear()
+        self.thread = threading.Thread(target=self._replay, name="price-replay")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop the replay"""
+        self.stop_event.set()
+        self.book.set_live(self.market, False)
+
+    def _replay(self):
+        for message in self.messages:
+            if self.stop_event.is_set():
+                break
+            self.book.update(self.market, ticks_from_message(message) or [])
+            if self.interval and self.stop_event.wait(self.interval):
+                break
+        self.done.set()
@@ -3,19 +3,37 @@ Module for analyzing tweet sentiment using the Claude API
 """
 import os
 import json
+import threading
+import time
 from anthropic import Anthropic
 from loguru import logger
 
+from app.utils.hack_prefilter import HackPrefilter
+from app.utils.verdict_cache import VerdictCache
+from app.utils.metrics import registry
+
+# Verdicts by where they came from (prefilter, cache, llm), and the latency of the LLM calls
+VERDICTS = registry.counter("hack_verdicts_total", "Tweet verdicts (hack, not_hack, error) by source", ("verdict", "source"))
+LLM_DURATION = registry.histogram("llm_call_seconds", "Duration of the Claude API calls")
+
 class SentimentAnalyzer:
     """Class for analyzing tweet sentiment using the Claude API"""
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, verdict_cache_file="verdict_cache.json"):
         """Initialize the sentiment analyzer"""
         self.api_key = api_key or os.getenv("CLAUDE_API_KEY")
         if not self.api_key:
             logger.warning("Claude API key not found in environment variables")
         
         self.client = self._init_client()
+        
+        # Obvious negatives are rejected locally instead of costing an API call
+        self.prefilter = HackPrefilter()
+        # Retweets and cross-posts of the same announcement reuse the first verdict
+        self.verdict_cache = VerdictCache(verdict_cache_file)
+        self.stats_lock = threading.Lock()
+        self.llm_calls = 0
+        self.llm_time = 0.0
     
     def _init_client(self):
         """Initialize the Claude client"""
@@ -38,6 +56,17 @@ class SentimentAnalyzer:
             bool: True if the text contains information about a hack, False otherwise
         """
         try:
+            if not self.prefilter.is_candidate(text):
+                logger.info("Tweet analysis: is_hack=False (rejected by the local pre-filter)")
+                VERDICTS.inc("not_hack", "prefilter")
+                return False
+            
+            cached_verdict = self.verdict_cache.get(text)
+            if cached_verdict is not None:
+                logger.info(f"Tweet analysis: is_hack={cached_verdict} (cached verdict)")
+                VERDICTS.inc("hack" if cached_verdict else "not_hack", "cache")
+                return cached_verdict
+            
             if not self.client:
                 logger.error("Claude client not initialized")
                 return False
@@ -53,6 +82,7 @@ class SentimentAnalyzer:
             """
             
             # Call the Claude API
+            started_at = time.perf_counter()
             response = self.client.messages.create(
                 model="claude-3-sonnet-20240229",
                 max_tokens=100,
@@ -63,6 +93,12 @@ class SentimentAnalyzer:
                 ]
             )
             
+            llm_time = time.perf_counter() - started_at
+            LLM_DURATION.observe(llm_time)
+            with self.stats_lock:
+                self.llm_calls += 1
+                self.llm_time += llm_time
+            
             # Extract the response
             content = response.content[0].text
             
@@ -71,16 +107,38 @@ class SentimentAnalyzer:
                 result = json.loads(content)
                 is_hack = result.get("is_hack", False)
                 logger.info(f"Tweet analysis: is_hack={is_hack}")
-                return is_hack
             except json.JSONDecodeError:
                 # If the response is not a valid JSON, check if it contains "true"
                 logger.warning(f"Non-JSON Claude response: {content}")
-                return "true" in content.lower()
+                is_hack = "true" in content.lower()
+            
+            self.verdict_cache.put(text, is_hack)
+            VERDICTS.inc("hack" if is_hack else "not_hack", "llm")
+            return is_hack
             
         except Exception as e:
             logger.error(f"Error analyzing tweet: {str(e)}")
+            VERDICTS.inc("error", "llm")
             return False
     
+    def get_stats(self):
+        """
+        Return pre-filter and LLM statistics
+        
+        saved_ms estimates the time not spent waiting for the LLM, from the tweets
+        rejected locally or answered from the verdict cache, and the average latency
+        of the calls actually made.
+        """
+        stats = self.prefilter.get_stats()
+        with self.stats_lock:
+            avg_llm_ms = self.llm_time / self.llm_calls * 1000 if self.llm_calls else None
+            stats["llm_calls"] = self.llm_calls
+        stats["avg_llm_ms"] = round(avg_llm_ms, 1) if avg_llm_ms is not None else None
+        stats["verdict_cache"] = self.verdict_cache.get_stats()
+        avoided_calls = stats["rejected"] + stats["verdict_cache"]["hits"]
+        stats["saved_ms"] = round(avoided_calls * avg_llm_ms, 1) if avg_llm_ms is not None else None
+        return stats
+    
     def test_connection(self):
         """Test the connection to the Claude API"""
         try:
@@ -0,0 +1,142 @@
+"""
+Settings schema module: type and bounds of every setting, typed access
+"""
+import math
+from collections import namedtuple
+
+Field = namedtuple("Field", ["kind", "default", "minimum", "maximum", "choices"])
+
+
+def field(kind, default=None, minimum=None, maximum=None, choices=None):
+    """Describe a setting: type (bool, int, float, str, list of str, dict str -> str), default and bounds"""
+    return Field(kind, default, minimum, maximum, choices)
+
+
+FIELDS = {
+    "trading_enabled": field(bool, False),
+    "target_account": field(str, ""),
+    "target_coin": field(str, "USDC"),
+    "default_symbol": field(str, "BTCUSDT"),
+    "leverage": field(int, 1, minimum=1, maximum=20),
+    "check_interval": field(int, 3, minimum=1),
+    "ingestion_mode": field(str, "poll", choices=("poll", "stream", "feed")),
+    "target_accounts": field(list, ()),
+    "max_poll_workers": field(int, 8, minimum=1, maximum=64),
+    "twitter_requests_per_window": field(int, 900, minimum=1),
+    "adaptive_polling": field(bool, True),
+    "max_poll_interval": field(float, 300.0, minimum=1),
+    "account_stream_enabled": field(bool, True),
+    "account_resync_interval": field(float, 300.0, minimum=1),
+    "price_stream_enabled": field(bool, True),
+    "price_max_age": field(float, 5.0, minimum=0),
+    "config_watch_interval": field(float, 1.0, minimum=0.05)
+}
+
+
+class SettingsError(ValueError):
+    """Settings rejected by the schema; errors holds one message per invalid setting"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _check(spec, value):
+    """Return the normalized value of a setting, or raise ValueError"""
+    kind = spec.kind
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise ValueError("boolean expected")
+    elif kind in (int, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("number expected")
+        # JSON accepts Infinity and NaN, which no bound check can stop
+        if not math.isfinite(value):
+            raise ValueError("finite number expected")
+        if kind is int:
+            if value != int(value):
+                raise ValueError("integer expected")
+            value = int(value)
+        else:
+            value = float(value)
+        if spec.minimum is not None and value < spec.minimum:
+            raise ValueError(f"minimum {spec.minimum}")
+        if spec.maximum is not None and value > spec.maximum:
+            raise ValueError(f"maximum {spec.maximum}")
+    elif kind is str:
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError("non-empty string expected")
+        value = value.strip()
+    elif kind is list:
+        if value is None and spec.default is None:
+            return None
+        if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) and item.strip() for item in value):
+            raise ValueError("list of strings expected")
+        value = [item.strip() for item in value]
+    elif kind is dict:
+        if value is None and spec.default is None:
+            return None
+        if not isinstance(value, dict) or not all(isinstance(item, str) for item in value.values()):
+            raise ValueError("object of strings expected")
+        value = dict(value)
+    if spec.choices and value not in spec.choices:
+        raise ValueError(f"allowed values: {', '.join(spec.choices)}")
+    return value
+
+
+def validate_settings(values, allow_unknown=False):
+    """
+    Check and normalize settings (a partial update or a whole file)
+
+    Args:
+        values (dict): The settings to check
+        allow_unknown (bool): Keep keys missing from the schema instead of rejecting them
+
+    Returns:
+        tuple: (normalized settings, list of errors)
+    """
+    if not isinstance(values, dict):
+        return {}, ["settings must be a JSON object"]
+
+    clean, errors = {}, []
+    for name, value in values.items():
+        spec = FIELDS.get(name)
+        if spec is None:
+            if allow_unknown:
+                clean[name] = value
+            else:
+                errors.append(f"{name}: unknown setting")
+            continue
+        try:
+            clean[name] = _check(spec, value)
+        except (ValueError, OverflowError) as e:
+            errors.append(f"{name}: {str(e)}")
+    return clean, errors
+
+
+class Settings:
+    """
+    Read-only typed settings, read as attributes by the hot paths
+
+    Built once per configuration change from an already validated snapshot: reading
+    a setting costs a single attribute access.
+    """
+
+    __slots__ = tuple(FIELDS)
+
+    def __init__(self, values, defaults=None):
+        """
+        Args:
+            values (dict): Snapshot of the validated settings
+            defaults (dict): Default values taking precedence over the schema ones
+        """
+        defaults = defaults or {}
+        for name, spec in FIELDS.items():
+            value = values.get(name, defaults.get(name, spec.default))
+            object.__setattr__(self, name, tuple(value) if isinstance(value, list) else value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are read-only: use ConfigManager.update_settings")
+
+    def __repr__(self):
+        return f"Settings({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
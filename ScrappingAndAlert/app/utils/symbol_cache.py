@@ -0,0 +1,228 @@
+"""
+Binance symbol metadata cache module (filters, precision, margin permissions)
+"""
+import time
+import threading
+from loguru import logger
+
+# Markets handled by the cache
+MARKETS = ("spot", "futures")
+
+
+def _parse_filters(filters):
+    """Extract LOT_SIZE and MIN_NOTIONAL (or NOTIONAL) from a list of Binance filters"""
+    parsed = {"min_qty": None, "max_qty": None, "step_size": None, "min_notional": None,
+              "lot_size_filter": None, "min_notional_filter": None}
+    for filt in filters:
+        filter_type = filt.get("filterType")
+        if filter_type == "LOT_SIZE":
+            parsed["min_qty"] = float(filt["minQty"])
+            parsed["max_qty"] = float(filt["maxQty"])
+            parsed["step_size"] = float(filt["stepSize"])
+            parsed["lot_size_filter"] = filt
+        elif filter_type in ("MIN_NOTIONAL", "NOTIONAL"):
+            # Spot uses "minNotional", futures use "notional"
+            min_notional = filt.get("minNotional", filt.get("notional"))
+            if min_notional is not None:
+                parsed["min_notional"] = float(min_notional)
+                parsed["min_notional_filter"] = filt
+    return parsed
+
+
+def _step_precision(step_size):
+    """Number of decimals matching a step_size (e.g. 0.001 -> 3)"""
+    if not step_size:
+        return None
+    step_str = f"{step_size:.10f}".rstrip("0")
+    return len(step_str.split(".")[1]) if "." in step_str else 0
+
+
+def build_symbol_meta(symbol_info, market="spot"):
+    """
+    Build the cache entry for a symbol from the exchangeInfo response
+
+    Args:
+        symbol_info (dict): The "symbols" entry returned by Binance for this symbol
+        market (str): "spot" or "futures"
+
+    Returns:
+        dict: The metadata needed for trading (filters, precision, permissions)
+    """
+    filters = _parse_filters(symbol_info.get("filters", []))
+    permissions = symbol_info.get("permissions", [])
+    quantity_precision = symbol_info.get("quantityPrecision")
+    if quantity_precision is None:
+        quantity_precision = _step_precision(filters["step_size"])
+
+    meta = {
+        "symbol": symbol_info["symbol"],
+        "market": market,
+        "status": symbol_info.get("status"),
+        "base_asset": symbol_info.get("baseAsset"),
+        "quote_asset": symbol_info.get("quoteAsset"),
+        "contract_type": symbol_info.get("contractType"),
+        "quantity_precision": quantity_precision,
+        "permissions": permissions,
+        "is_margin_trading_allowed": bool(symbol_info.get("isMarginTradingAllowed", "MARGIN" in permissions)),
+        "margin_pair": None,
+        "filters": symbol_info.get("filters", [])
+    }
+    meta.update(filters)
+    return meta
+
+
+class SymbolCache:
+    """
+    Shared symbol metadata cache, indexed by symbol and refreshed on a TTL
+
+    The full exchangeInfo download only happens once per TTL and per market.
+    Once the cache is loaded, expired data is served while a thread refreshes it,
+    and an unknown symbol is fetched on its own. A symbol that cannot be found
+    (typo, delisting) is remembered for miss_ttl so that lookup is not repeated
+    on every alert.
+    """
+
+    def __init__(self, ttl=300, miss_ttl=60):
+        """
+        Args:
+            ttl (float): Validity in seconds of the data of a market
+            miss_ttl (float): Time in seconds during which a symbol that was not found is not looked up again
+        """
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._misses = {}  # symbol not found -> time of the last lookup
+        self._lock = threading.Lock()
+        self._markets = {market: {"symbols": {}, "loaded_at": 0.0, "refreshing": False} for market in MARKETS}
+        self._margin_pairs_loaded_at = 0.0
+
+    def get(self, client, symbol, market="spot"):
+        """
+        Return the metadata of a symbol
+
+        Args:
+            client: The Binance client used if a download is needed
+            symbol (str): The symbol to look up (e.g. "BTCUSDT")
+            market (str): "spot" or "futures"
+
+        Returns:
+            dict: The symbol metadata, or None if it does not exist
+        """
+        self._ensure_fresh(client, market)
+        with self._lock:
+            meta = self._markets[market]["symbols"].get(symbol)
+        if meta is None and market == "spot":
+            meta = self._load_single_symbol(client, symbol)
+        return meta
+
+    def all(self, client, market="spot"):
+        """Return a {symbol: metadata} snapshot of a whole market"""
+        self._ensure_fresh(client, market)
+        with self._lock:
+            return dict(self._markets[market]["symbols"])
+
+    def get_margin_pair(self, client, symbol):
+        """
+        Return the cross margin pair of a symbol (or None if the symbol is not marginable)
+
+        Margin pairs are refreshed with the same TTL as the spot metadata.
+        """
+        meta = self.get(client, symbol, "spot")
+        if time.time() - self._margin_pairs_loaded_at > self.ttl:
+            self._load_margin_pairs(client)
+            meta = self.get(client, symbol, "spot")
+        return meta.get("margin_pair") if meta else None
+
+    def refresh(self, client, market="spot"):
+        """Download all the metadata of a market again and replace the index"""
+        started_at = time.perf_counter()
+        if market == "futures":
+            exchange_info = client.futures_exchange_info()
+        else:
+            exchange_info = client.get_exchange_info()
+
+        symbols = {s["symbol"]: build_symbol_meta(s, market) for s in exchange_info["symbols"]}
+        with self._lock:
+            if market == "spot":
+                # Keep the margin pairs already known
+                previous = self._markets[market]["symbols"]
+                for symbol, meta in symbols.items():
+                    if symbol in previous:
+                        meta["margin_pair"] = previous[symbol]["margin_pair"]
+            self._markets[market]["symbols"] = symbols
+            self._markets[market]["loaded_at"] = time.time()
+        logger.info(f"{market.capitalize()} metadata refreshed: {len(symbols)} symbols in {(time.perf_counter() - started_at) * 1000:.0f} ms")
+
+    def invalidate(self, market=None):
+        """Mark a market (or all of them) as expired"""
+        with self._lock:
+            for name in ([market] if market else MARKETS):
+                self._markets[name]["loaded_at"] = 0.0
+            if market in (None, "spot"):
+                self._margin_pairs_loaded_at = 0.0
+
+    def loaded_at(self, market="spot"):
+        """Timestamp of the last full download of a market"""
+        with self._lock:
+            return self._markets[market]["loaded_at"]
+
+    def _ensure_fresh(self, client, market):
+        """Load the market if it is empty, or start a background refresh if it has expired"""
+        with self._lock:
+            state = self._markets[market]
+            empty = not state["symbols"]
+            expired = time.time() - state["loaded_at"] > self.ttl
+            if not empty and expired and not state["refreshing"]:
+                state["refreshing"] = True
+                start_background = True
+            else:
+                start_background = False
+
+        if empty:
+            self.refresh(client, market)
+        elif start_background:
+            thread = threading.Thread(target=self._background_refresh, args=(client, market), name=f"symbol-cache-{market}")
+            thread.daemon = True
+            thread.start()
+
+    def _background_refresh(self, client, market):
+        """Refresh a market without blocking readers"""
+        try:
+            self.refresh(client, market)
+        except Exception as e:
+            logger.warning(f"Error refreshing {market} metadata: {str(e)}")
+        finally:
+            with self._lock:
+                self._markets[market]["refreshing"] = False
+
+    def _load_single_symbol(self, client, symbol):
+        """Add a symbol missing from the index to the cache (e.g. a new listing)"""
+        with self._lock:
+            missed_at = self._misses.get(symbol)
+        if missed_at is not None and time.time() - missed_at < self.miss_ttl:
+            return None
+        # get_symbol_info downloads the whole exchangeInfo: a miss is cached too
+        symbol_info = client.get_symbol_info(symbol)
+        if not symbol_info:
+            with self._lock:
+                self._misses[symbol] = time.time()
+            logger.warning(f"Symbol {symbol} not found, skipped for {self.miss_ttl}s")
+            return None
+        meta = build_symbol_meta(symbol_info, "spot")
+        with self._lock:
+            self._markets["spot"]["symbols"][symbol] = meta
+        return meta
+
+    def _load_margin_pairs(self, client):
+        """Attach the cross margin pairs to the spot metadata"""
+        pairs = client.get_margin_all_pairs()
+        with self._lock:
+            symbols = self._markets["spot"]["symbols"]
+            for pair in pairs:
+                meta = symbols.get(pair["symbol"])
+                if meta is not None:
+                    meta["margin_pair"] = pair
+            self._margin_pairs_loaded_at = time.time()
+
+
+# Cache shared by every BinanceTrader instance of the process
+symbol_cache = SymbolCache()
@@ -0,0 +1,116 @@
+"""
+Symbol resolution module: the futures contract to short for a tweet or the account that posted it
+"""
+import re
+import threading
+from loguru import logger
+
+# Common project names -> base asset
+DEFAULT_ALIASES = {
+    "bitcoin": "BTC", "ethereum": "ETH", "ether": "ETH", "solana": "SOL", "ripple": "XRP",
+    "cardano": "ADA", "dogecoin": "DOGE", "polygon": "POL", "chainlink": "LINK", "uniswap": "UNI",
+    "avalanche": "AVAX", "polkadot": "DOT", "tron": "TRX", "litecoin": "LTC", "arbitrum": "ARB",
+    "optimism": "OP", "aave": "AAVE", "curve": "CRV", "cosmos": "ATOM", "aptos": "APT",
+    "toncoin": "TON", "shiba": "SHIB", "pepe": "PEPE", "stellar": "XLM", "filecoin": "FIL",
+    "injective": "INJ", "thorchain": "RUNE", "pancakeswap": "CAKE", "sushiswap": "SUSHI",
+    "compound": "COMP", "maker": "MKR", "lido": "LDO", "starknet": "STRK", "celestia": "TIA"
+}
+
+# Official accounts -> base asset
+DEFAULT_ACCOUNT_ASSETS = {
+    "bitcoin": "BTC", "ethereum": "ETH", "solana": "SOL", "uniswap": "UNI", "aave": "AAVE",
+    "chainlink": "LINK", "arbitrum": "ARB", "optimism": "OP", "avax": "AVAX", "cardano": "ADA",
+    "polkadot": "DOT", "ripple": "XRP", "dogecoin": "DOGE", "curvefinance": "CRV",
+    "0xpolygon": "POL", "cosmos": "ATOM", "nearprotocol": "NEAR", "aptos": "APT",
+    "suinetwork": "SUI", "ton_blockchain": "TON", "trondao": "TRX", "litecoin": "LTC",
+    "pancakeswap": "CAKE", "lidofinance": "LDO", "starknet": "STRK", "injective": "INJ"
+}
+
+CASHTAG = re.compile(r"\$([A-Za-z][A-Za-z0-9]{1,14})\b")
+WORD = re.compile(r"[a-z0-9]+")
+
+
+class SymbolResolver:
+    """
+    Map a tweet or an account to a tradeable perpetual futures contract
+
+    The index (listed base assets, best quote per asset) is built from the symbol
+    metadata cache and only rebuilt when that cache is refreshed: a resolution is
+    a few dictionary lookups.
+    """
+
+    def __init__(self, symbol_cache, client, quote_preference=("USDT", "USDC"), account_assets=None, aliases=None):
+        """
+        Args:
+            symbol_cache (SymbolCache): Symbol metadata cache
+            client: Binance client used if the cache has to be loaded
+            quote_preference (tuple): Accepted quote assets, in order of preference
+            account_assets (dict): Twitter accounts -> base asset, on top of the default accounts
+            aliases (dict): Project names -> base asset, on top of the default aliases
+        """
+        self.symbol_cache = symbol_cache
+        self.client = client
+        self.quote_preference = tuple(quote_preference)
+        self.account_assets = {k.lower(): v.upper() for k, v in {**DEFAULT_ACCOUNT_ASSETS, **(account_assets or {})}.items()}
+        self.aliases = {k.lower(): v.upper() for k, v in {**DEFAULT_ALIASES, **(aliases or {})}.items()}
+        self.lock = threading.Lock()
+        self.best_symbols = {}  # base asset -> best futures symbol
+        self.built_from = None
+
+    def rebuild(self):
+        """Rebuild the index of shortable assets from the futures metadata"""
+        markets = self.symbol_cache.all(self.client, "futures")
+        candidates = {}
+        for meta in markets.values():
+            if meta["status"] != "TRADING" or meta["contract_type"] not in (None, "PERPETUAL"):
+                continue
+            # A stablecoin quoted in another stablecoin is not a short on the hacked project
+            if meta["quote_asset"] not in self.quote_preference or meta["base_asset"] in self.quote_preference:
+                continue
+            rank = self.quote_preference.index(meta["quote_asset"])
+            current = candidates.get(meta["base_asset"])
+            if current is None or rank < current[0]:
+                candidates[meta["base_asset"]] = (rank, meta["symbol"])
+
+        with self.lock:
+            self.best_symbols = {asset: symbol for asset, (_, symbol) in candidates.items()}
+            self.built_from = self.symbol_cache.loaded_at("futures")
+        logger.info(f"Resolution index built: {len(self.best_symbols)} shortable assets")
+
+    def _ensure_index(self):
+        """Rebuild the index if the metadata cache has been refreshed since"""
+        if not self.best_symbols or self.built_from != self.symbol_cache.loaded_at("futures"):
+            self.rebuild()
+
+    def resolve(self, tweet_text=None, account=None):
+        """
+        Find the contract to short
+
+        Priority: known source account, cashtag ($ETH) in the tweet, project name in the tweet.
+
+        Args:
+            tweet_text (str): The text of the tweet
+            account (str): The Twitter account that posted the tweet
+
+        Returns:
+            tuple: (symbol, asset, reason), or None if no tradeable asset was found
+        """
+        self._ensure_index()
+
+        if account:
+            asset = self.account_assets.get(account.lstrip("@").lower())
+            if asset and asset in self.best_symbols:
+                return self.best_symbols[asset], asset, f"account @{account.lstrip('@')}"
+
+        if tweet_text:
+            for match in CASHTAG.finditer(tweet_text):
+                asset = match.group(1).upper()
+                if asset in self.best_symbols:
+                    return self.best_symbols[asset], asset, f"cashtag ${asset}"
+
+            for word in WORD.findall(tweet_text.lower()):
+                asset = self.aliases.get(word)
+                if asset and asset in self.best_symbols:
+                    return self.best_symbols[asset], asset, f"project name '{word}'"
+
+        return None
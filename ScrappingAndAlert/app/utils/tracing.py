@@ -0,0 +1,160 @@
+"""
+Latency of each alert, from the tweet being posted to the order being placed
+"""
+import time
+import uuid
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from app.utils.metrics import registry
+
+# Twitter snowflake IDs carry their creation time in milliseconds since this epoch
+TWITTER_EPOCH_MS = 1288834974657
+
+# Alert being processed by the current thread
+current_alert = contextvars.ContextVar("alert_id", default=None)
+
+
+def parse_timestamp(value):
+    """Convert an ISO 8601 date or a Unix timestamp to a Unix timestamp, None if the value is invalid"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def tweet_timestamp(tweet):
+    """
+    Return when a tweet was posted, as a Unix timestamp (None if unknown)
+
+    created_at only has second resolution; the tweet ID has the millisecond, and is
+    used whenever it agrees with created_at (IDs of test feeds are not snowflakes).
+    """
+    created_at = parse_timestamp(tweet.get("created_at"))
+    try:
+        from_id = ((int(tweet.get("id")) >> 22) + TWITTER_EPOCH_MS) / 1000
+    except (TypeError, ValueError):
+        from_id = None
+    if from_id is not None and created_at is not None and created_at <= from_id < created_at + 1:
+        return from_id
+    return created_at
+
+
+def format_timestamp(timestamp):
+    """Format a Unix timestamp as an ISO 8601 UTC date with milliseconds"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="milliseconds")
+
+
+class AlertTracer:
+    """
+    Duration of each step of an alert, correlated by an alert ID
+
+    Two measurements feed the /metrics histograms and the alert's trace:
+    - span: duration of a step, measured with the monotonic clock in nanoseconds;
+    - mark: delay between the tweet being posted and a step (wall clock, so subject
+      to clock skew with Twitter).
+    The current alert is a context variable; the alert ID and the tweet's timestamp
+    are sent to PlaftormAndOrders with the webhook, which carries on the same trace.
+    """
+
+    def __init__(self, metrics, max_traces=200):
+        """
+        Args:
+            metrics (MetricsRegistry): Registry where the histograms are created
+            max_traces (int): Number of alert traces kept for /api/traces
+        """
+        self.spans = metrics.histogram("span_seconds", "Duration of each step of an alert", ("span",))
+        self.stages = metrics.histogram(
+            "tweet_to_stage_seconds", "Delay between the tweet being posted and each step", ("stage",)
+        )
+        self.max_traces = max_traces
+        self.lock = threading.Lock()
+        self.traces = OrderedDict()
+
+    @contextmanager
+    def alert(self, alert_id=None, tweet_at=None):
+        """
+        Attach the measurements made in this block to an alert
+
+        Args:
+            alert_id (str): Alert ID (generated if missing)
+            tweet_at (float): When the tweet was posted (Unix timestamp), origin of the marks
+        """
+        alert_id = alert_id or uuid.uuid4().hex
+        with self.lock:
+            if alert_id not in self.traces:
+                self.traces[alert_id] = {
+                    "alert_id": alert_id,
+                    "tweet_at": tweet_at,
+                    "started_at": time.time(),
+                    "spans": {},
+                    "stages": {}
+                }
+                while len(self.traces) > self.max_traces:
+                    self.traces.popitem(last=False)
+        token = current_alert.set(alert_id)
+        try:
+            yield alert_id
+        finally:
+            current_alert.reset(token)
+
+    @contextmanager
+    def span(self, name):
+        """Measure the duration of the block as step name"""
+        started_at = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter_ns() - started_at) / 1e9)
+
+    def record(self, name, seconds):
+        """Record the duration of a step measured elsewhere (in seconds)"""
+        self.spans.observe(seconds, name)
+        alert_id = current_alert.get()
+        if alert_id is not None:
+            with self.lock:
+                trace = self.traces.get(alert_id)
+                if trace is not None:
+                    trace["spans"][name] = round(seconds * 1000, 3)
+
+    def mark(self, stage, at=None):
+        """
+        Record the delay between the current alert's tweet and a step
+
+        Args:
+            stage (str): Name of the step
+            at (float): When the step happened (Unix timestamp), now by default
+        """
+        alert_id = current_alert.get()
+        if alert_id is None:
+            return
+        with self.lock:
+            trace = self.traces.get(alert_id)
+            if trace is None or trace["tweet_at"] is None:
+                return
+            elapsed = (at or time.time()) - trace["tweet_at"]
+            trace["stages"][stage] = round(elapsed * 1000, 1)
+        self.stages.observe(max(0.0, elapsed), stage)
+
+    def get_trace(self, alert_id):
+        """Return a copy of an alert's trace, None if it is unknown"""
+        with self.lock:
+            trace = self.traces.get(alert_id)
+            return dict(trace, spans=dict(trace["spans"]), stages=dict(trace["stages"])) if trace else None
+
+    def recent(self, limit=20):
+        """Return the traces of the latest alerts, most recent first"""
+        with self.lock:
+            alert_ids = list(self.traces)[-limit:]
+        return [trace for trace in map(self.get_trace, reversed(alert_ids)) if trace]
+
+
+# Tracer shared by every module of the process
+tracer = AlertTracer(registry)
@@ -0,0 +1,434 @@
+"""
+Tweet ingestion sources: polling, Twitter filtered stream and HTTP push feed
+"""
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import tweepy
+from loguru import logger
+
+from app.utils.poll_scheduler import AdaptivePollPolicy, PollScheduler, RateLimiter
+from app.utils.tracing import tracer
+from app.utils.twitter_scraper import format_tweet
+from app.utils.metrics import registry
+
+# Polls by result, and how late they start compared to their due time
+POLLS = registry.counter("twitter_polls_total", "Polls of a Twitter account by result (ok, error)", ("result",))
+POLL_LAG = registry.histogram("twitter_poll_lag_seconds", "Delay between a poll's due time and its start")
+
+
+class TweetSource:
+    """
+    Base class for tweet sources
+
+    A source calls on_tweet(tweet) for every tweet it receives, from its own thread.
+    Every source feeds the same downstream hack-detection path.
+    """
+
+    name = "base"
+
+    def __init__(self, on_tweet):
+        """Initialize the source with the callback receiving tweets"""
+        self.on_tweet = on_tweet
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start receiving tweets in a background thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"tweet-source-{self.name}")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Tweet source '{self.name}' started")
+
+    def stop(self):
+        """Stop receiving tweets"""
+        self.running = False
+        logger.info(f"Tweet source '{self.name}' stopped")
+
+    def _run(self):
+        raise NotImplementedError
+
+    def sync_accounts(self, accounts):
+        """
+        Follow a new list of accounts (a source that cannot choose its accounts only warns)
+
+        Returns:
+            bool: True if the source now follows these accounts
+        """
+        logger.warning(f"Tweet source '{self.name}' cannot change its accounts: update the feed to follow {accounts}")
+        return False
+
+    def _emit(self, tweet):
+        """Hand a tweet to the downstream path without letting its errors kill the source"""
+        try:
+            self.on_tweet(tweet)
+        except Exception as e:
+            logger.error(f"Error processing tweet {tweet.get('id')}: {str(e)}")
+
+
+class PollingSource(TweetSource):
+    """
+    Poll the Twitter API for any number of accounts
+
+    Accounts are polled by a bounded worker pool, in the order of their next due
+    time, and every request draws from one shared rate-limit budget. Only tweets
+    newer than the account's cursor are fetched (since_id), and every one of them
+    is emitted in chronological order.
+
+    In adaptive mode, each account's next poll comes from an AdaptivePollPolicy:
+    the budget follows the quota reported by the API and goes first to active
+    accounts and accounts with hack signals. Consecutive failures of an account
+    back off exponentially up to max_interval.
+    """
+
+    name = "poll"
+
+    def __init__(self, on_tweet, twitter_scraper, get_since_id, get_accounts, interval,
+                 max_workers=8, requests_per_window=900, window=900.0, adaptive=True, max_interval=300.0):
+        """
+        Args:
+            on_tweet (callable): Callback receiving each tweet
+            twitter_scraper (TwitterScraper): Scraper used for the API calls
+            get_since_id (callable): Returns the last processed tweet ID of an account
+            get_accounts (callable): Returns the list of accounts to poll when the source starts;
+                later changes are pushed with sync_accounts
+            interval (float): Poll interval in seconds (the shortest one in adaptive mode),
+                changed later with set_interval
+            max_workers (int): Maximum number of polls running at the same time
+            requests_per_window (int): API requests allowed per rate-limit window, for all accounts
+            window (float): Length of the rate-limit window in seconds
+            adaptive (bool): Derive each account's interval from the quota and its activity
+            max_interval (float): Longest interval between two polls of an account while quota is left
+        """
+        super().__init__(on_tweet)
+        self.twitter_scraper = twitter_scraper
+        self.get_since_id = get_since_id
+        self.get_accounts = get_accounts
+        self.interval = interval
+        self.max_workers = max_workers
+        self.scheduler = PollScheduler()
+        self.window = window
+        self.rate_limiter = RateLimiter(requests_per_window, window)
+        self.adaptive = adaptive
+        self.policy = AdaptivePollPolicy(requests_per_window, window, min_interval=interval, max_interval=max_interval)
+        self.failures = {}
+        self.stop_event = threading.Event()
+        self.stats_lock = threading.Lock()
+        self.account_stats = {}
+
+    def start(self):
+        self.stop_event.clear()
+        super().start()
+
+    def stop(self):
+        super().stop()
+        self.stop_event.set()
+
+    def _run(self):
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="twitter-poll")
+        free_workers = threading.BoundedSemaphore(self.max_workers)
+        self.scheduler.sync_accounts(self.get_accounts())
+        try:
+            while self.running:
+                # Only take an account when a worker can start it right away
+                if not free_workers.acquire(timeout=1.0):
+                    continue
+                account, due = self.scheduler.next_due(self.stop_event)
+                if account is None or not self.rate_limiter.acquire(self.stop_event):
+                    free_workers.release()
+                    break
+                executor.submit(self._poll_account, account, due, free_workers)
+        finally:
+            executor.shutdown(wait=False)
+
+    def sync_accounts(self, accounts):
+        """Poll a new list of accounts (new ones are due immediately, removed ones are dropped)"""
+        self.scheduler.sync_accounts(accounts)
+        return True
+
+    def set_interval(self, interval):
+        """Change the poll interval (applies from the next poll of each account)"""
+        self.interval = interval
+        self.policy.min_interval = interval
+
+    def set_budget(self, requests_per_window):
+        """Change the API requests allowed per window, for all accounts"""
+        self.rate_limiter.set_rate(requests_per_window, self.window)
+        self.policy.set_budget(requests_per_window, self.window)
+
+    def record_signal(self, account, strength=1.0):
+        """Poll an account more often after a hack tweet (strength 1) or a suspicious one (lower)"""
+        self.policy.record_signal(account, strength)
+
+    def _poll_account(self, account, due, free_workers):
+        """Fetch and emit the new tweets of one account, then schedule its next poll"""
+        started_at = time.monotonic()
+        failed = False
+        new_tweets = 0
+        try:
+            with tracer.span("scrape"):
+                tweets = self.twitter_scraper.get_new_tweets(account, since_id=self.get_since_id(account))
+            failed = tweets is None
+            new_tweets = len(tweets or [])
+            for tweet in tweets or []:
+                self._emit(tweet)
+        except Exception as e:
+            logger.error(f"Error polling {account}: {str(e)}")
+            failed = True
+        finally:
+            delay = self._next_delay(account, new_tweets, failed)
+            self._record_poll(account, started_at - due, time.monotonic() - started_at, failed, delay)
+            self.scheduler.reschedule(account, delay)
+            free_workers.release()
+
+    def _next_delay(self, account, new_tweets, failed):
+        """Delay before the next poll of an account"""
+        failures = self.failures[account] = self.failures.get(account, 0) + 1 if failed else 0
+        if not self.adaptive:
+            return max(self.interval, 5) if failed else self.interval
+
+        quota = self.twitter_scraper.get_rate_limit()
+        if quota:
+            self.policy.update_quota(*quota)
+        self.policy.record_poll(account, new_tweets)
+        delay = self.policy.interval(account, self.scheduler.accounts)
+        if failures:
+            # Back off smoothly on repeated errors; a rate-limit reset wait is already in delay
+            delay = max(delay, min(self.policy.max_interval, self.interval * 2 ** min(failures, 10)))
+        return delay
+
+    def _record_poll(self, account, lag, duration, failed, delay):
+        POLLS.inc("error" if failed else "ok")
+        POLL_LAG.observe(max(0.0, lag))
+        with self.stats_lock:
+            stats = self.account_stats.setdefault(account, {"polls": 0, "errors": 0, "lag_ms": 0.0, "duration_ms": 0.0})
+            stats["polls"] += 1
+            stats["errors"] += int(failed)
+            stats["lag_ms"] = round(lag * 1000, 1)
+            stats["duration_ms"] = round(duration * 1000, 1)
+            stats["interval_s"] = round(delay, 1)
+
+    def get_stats(self):
+        """
+        Return poll statistics
+
+        lag_ms is how late the last poll of an account started compared to its due time;
+        it grows when the rate-limit budget or the worker pool is the bottleneck.
+        interval_s is the delay chosen after that poll.
+        """
+        with self.stats_lock:
+            accounts = {account: dict(stats) for account, stats in self.account_stats.items()}
+        lags = [stats["lag_ms"] for stats in accounts.values()]
+        return {
+            "accounts": len(accounts),
+            "polls": sum(stats["polls"] for stats in accounts.values()),
+            "avg_lag_ms": round(sum(lags) / len(lags), 1) if lags else None,
+            "max_lag_ms": max(lags) if lags else None,
+            **self.scheduler.get_depths(),
+            "adaptive": self.policy.get_stats(accounts) if self.adaptive else None,
+            "per_account": accounts
+        }
+
+
+class TwitterStreamSource(TweetSource):
+    """Receive tweets pushed by the Twitter API v2 filtered stream"""
+
+    name = "stream"
+
+    def __init__(self, on_tweet, bearer_token, accounts):
+        """
+        Args:
+            on_tweet (callable): Callback receiving each tweet
+            bearer_token (str): Twitter bearer token
+            accounts (list): Accounts whose tweets are streamed
+        """
+        super().__init__(on_tweet)
+        self.bearer_token = bearer_token
+        self.accounts = list(accounts)
+        self.stream_client = None
+
+    def _run(self):
+        source = self
+
+        class _Client(tweepy.StreamingClient):
+            def on_response(self, response):
+                author = None
+                if response.includes and response.includes.get("users"):
+                    author = response.includes["users"][0].username
+                source._emit(format_tweet(response.data, author))
+
+            def on_errors(self, errors):
+                logger.error(f"Twitter stream errors: {errors}")
+
+        self.stream_client = _Client(self.bearer_token, wait_on_rate_limit=True)
+        self._sync_rules()
+        # Blocks until disconnect() is called
+        self.stream_client.filter(
+            tweet_fields=["created_at", "text", "public_metrics"],
+            expansions=["author_id"],
+            user_fields=["username"]
+        )
+
+    def sync_accounts(self, accounts):
+        """Stream a new list of accounts (the rules of a connected stream apply without reconnecting)"""
+        self.accounts = list(accounts)
+        if self.running and self.stream_client:
+            self._sync_rules()
+        return True
+
+    def _sync_rules(self):
+        """Make the stream rules one "from:" rule per account, changing only the rules that differ"""
+        existing = self.stream_client.get_rules()
+        current = {rule.value: rule.id for rule in existing.data} if existing and existing.data else {}
+        wanted = {f"from:{account}": account for account in self.accounts}
+        stale = [rule_id for value, rule_id in current.items() if value not in wanted]
+        if stale:
+            self.stream_client.delete_rules(stale)
+        missing = [tweepy.StreamRule(value, tag=account) for value, account in wanted.items() if value not in current]
+        if missing:
+            self.stream_client.add_rules(missing)
+        logger.info(f"Twitter stream rules set for {self.accounts}")
+
+    def stop(self):
+        super().stop()
+        if self.stream_client:
+            self.stream_client.disconnect()
+
+
+class HttpFeedSource(TweetSource):
+    """
+    Read tweets pushed as newline-delimited JSON over a long-lived HTTP response
+
+    Any relay able to push tweets in this format can be used, including FakeFeedServer.
+    Empty lines are treated as keep-alives; a connection silent for longer than
+    read_timeout is considered dead and reopened.
+    """
+
+    name = "feed"
+
+    def __init__(self, on_tweet, url, reconnect_delay=1.0, max_reconnect_delay=30.0, read_timeout=60.0):
+        """
+        Args:
+            on_tweet (callable): Callback receiving each tweet
+            url (str): URL of the feed
+            reconnect_delay (float): Initial delay before reconnecting after a disconnection
+            max_reconnect_delay (float): Upper bound of the reconnection backoff
+            read_timeout (float): Maximum silence in seconds before reconnecting
+        """
+        super().__init__(on_tweet)
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.read_timeout = read_timeout
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while self.running:
+            try:
+                with requests.get(self.url, stream=True, timeout=(5, self.read_timeout)) as response:
+                    response.raise_for_status()
+                    logger.info(f"Connected to tweet feed {self.url}")
+                    delay = self.reconnect_delay
+                    # chunk_size=1 hands over each line as soon as it arrives instead of filling a buffer
+                    for line in response.iter_lines(chunk_size=1):
+                        if not self.running:
+                            break
+                        if line:
+                            self._emit(json.loads(line))
+            except Exception as e:
+                if self.running:
+                    logger.warning(f"Tweet feed {self.url} disconnected: {str(e)}")
+
+            if self.running:
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+
+class FakeFeedServer:
+    """
+    Local push feed for tests and development
+
+    Serves newline-delimited JSON on every path; each call to publish() is pushed
+    immediately to all connected clients, and an empty keep-alive line is sent
+    after keepalive_interval seconds of silence.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, keepalive_interval=1.0):
+        """Create the server; port 0 picks a free port"""
+        self._subscribers = []
+        self._lock = threading.Lock()
+        feed = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                subscriber = queue.Queue()
+                with feed._lock:
+                    feed._subscribers.append(subscriber)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                try:
+                    while True:
+                        try:
+                            tweet = subscriber.get(timeout=keepalive_interval)
+                        except queue.Empty:
+                            self.wfile.write(b"\n")
+                            self.wfile.flush()
+                            continue
+                        if tweet is None:
+                            break
+                        self.wfile.write(json.dumps(tweet).encode() + b"\n")
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with feed._lock:
+                        feed._subscribers.remove(subscriber)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """URL to give to HttpFeedSource"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        """Serve the feed in a background thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-feed-server")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def publish(self, tweet):
+        """Push a tweet to every connected client"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(tweet)
+
+    def subscriber_count(self):
+        """Number of clients currently connected"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def stop(self):
+        """Disconnect the clients and stop the server"""
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(None)
+        self.server.shutdown()
+        self.server.server_close()
@@ -2,31 +2,169 @@
 Module to retrieve tweets from a specific Twitter account
 """
 import os
+import re
+import json
+import threading
+from pathlib import Path
 import tweepy
 from loguru import logger
 
+# Endpoint polled for every account: its rate limit is the polling budget
+USERS_TWEETS_PATH = re.compile(r"/2/users/\d+/tweets")
+
+
+def format_tweet(tweet, author=None):
+    """Convert a tweepy Tweet into the dict format used by the bot (shared by every tweet source)"""
+    return {
+        "id": tweet.id,
+        "text": tweet.text,
+        "created_at": tweet.created_at.isoformat() if tweet.created_at else None,
+        "metrics": tweet.public_metrics if hasattr(tweet, "public_metrics") else {},
+        "author": author
+    }
+
+
 class TwitterScraper:
     """Class for scraping tweets from a specific Twitter account"""
     
-    def __init__(self, target_account=None):
+    def __init__(self, target_account=None, user_id_cache_file="user_ids.json"):
         """Initialize the Twitter scraper"""
         self.bearer_token = os.getenv("TWITTER_BEARER_TOKEN")
         if not self.bearer_token:
             logger.warning("Twitter authentication token not found in environment variables")
         
         self.target_account = target_account or os.getenv("TARGET_TWITTER_ACCOUNT", "DamienMATHIS4")
+        self.rate_limit = None  # (limit, remaining, reset timestamp) of the tweets endpoint
         self.client = self._init_client()
+        
+        # Persistent username -> user_id cache, so a poll costs a single API call
+        self.user_id_cache_file = user_id_cache_file
+        self.user_id_cache_lock = threading.Lock()
+        self.user_ids = self._load_user_ids()
+        
+        # API call accounting, to measure the cost of a poll
+        self.poll_count = 0
+        self.api_calls = {"get_user": 0, "get_users_tweets": 0}
+        self.stats_lock = threading.Lock()
     
     def _init_client(self):
         """Initialize the Twitter client"""
         try:
             client = tweepy.Client(bearer_token=self.bearer_token)
+            # tweepy drops the response headers: read the rate limit from every response
+            client.session.hooks["response"].append(self._record_rate_limit)
             logger.info("Twitter client successfully initialized")
             return client
         except Exception as e:
             logger.error(f"Error initializing Twitter client: {str(e)}")
             return None
     
+    def _record_rate_limit(self, response, *args, **kwargs):
+        """Keep the x-rate-limit-* headers of the tweets endpoint (requests response hook)"""
+        headers = response.headers
+        if "x-rate-limit-remaining" in headers and USERS_TWEETS_PATH.search(response.url or ""):
+            try:
+                self.rate_limit = (
+                    int(headers["x-rate-limit-limit"]),
+                    int(headers["x-rate-limit-remaining"]),
+                    float(headers["x-rate-limit-reset"])
+                )
+            except (KeyError, ValueError):
+                pass
+        return response
+    
+    def get_rate_limit(self):
+        """
+        Return the last rate limit reported for the tweets endpoint
+        
+        Returns:
+            tuple: (limit, remaining, reset timestamp), or None before the first response
+        """
+        return self.rate_limit
+    
+    def _load_user_ids(self):
+        """Load the username -> user_id cache from disk"""
+        try:
+            if Path(self.user_id_cache_file).exists():
+                with open(self.user_id_cache_file, "r") as f:
+                    user_ids = json.load(f)
+                logger.info(f"{len(user_ids)} Twitter user IDs loaded from {self.user_id_cache_file}")
+                return user_ids
+        except Exception as e:
+            logger.warning(f"Unable to load the Twitter user ID cache: {str(e)}")
+        return {}
+    
+    def _save_user_ids(self):
+        """
+        Save the username -> user_id cache to disk (called under user_id_cache_lock)
+        
+        Writes a temporary file and renames it, so the file is never left truncated.
+        """
+        try:
+            temp_file = f"{self.user_id_cache_file}.tmp"
+            with open(temp_file, "w") as f:
+                json.dump(self.user_ids, f, indent=4)
+            os.replace(temp_file, self.user_id_cache_file)
+        except Exception as e:
+            logger.warning(f"Unable to save the Twitter user ID cache: {str(e)}")
+    
+    def get_user_id(self, username):
+        """Return the user ID of an account, resolving it through the API only on a cache miss"""
+        key = username.lower()
+        user_id = self.user_ids.get(key)
+        if user_id:
+            return user_id
+        
+        self._count_call("get_user")
+        user = self.client.get_user(username=username)
+        if not user or not user.data:
+            return None
+        
+        with self.user_id_cache_lock:
+            self.user_ids[key] = user.data.id
+            self._save_user_ids()
+        return user.data.id
+    
+    def invalidate_user_id(self, username):
+        """Forget the cached user ID of an account after a failed lookup"""
+        with self.user_id_cache_lock:
+            if self.user_ids.pop(username.lower(), None) is not None:
+                logger.info(f"Cached user ID for {username} invalidated")
+                self._save_user_ids()
+    
+    def _count_call(self, endpoint):
+        """Count an API call (polls of several accounts run concurrently)"""
+        with self.stats_lock:
+            self.api_calls[endpoint] += 1
+    
+    def get_poll_stats(self):
+        """Return the number of polls and the API calls they cost"""
+        total_calls = sum(self.api_calls.values())
+        return {
+            "polls": self.poll_count,
+            "api_calls": dict(self.api_calls),
+            "calls_per_poll": round(total_calls / self.poll_count, 2) if self.poll_count else None,
+            "cached_user_ids": len(self.user_ids)
+        }
+    
+    def _fetch_users_tweets(self, target, user_id, **params):
+        """Call get_users_tweets, invalidating the cached user ID if the lookup fails"""
+        self._count_call("get_users_tweets")
+        try:
+            tweets = self.client.get_users_tweets(
+                id=user_id,
+                tweet_fields=["created_at", "text", "public_metrics"],
+                **params
+            )
+        except (tweepy.errors.NotFound, tweepy.errors.BadRequest):
+            # The cached ID no longer matches the account, resolve it again on the next poll
+            self.invalidate_user_id(target)
+            raise
+        
+        if tweets and tweets.errors and not tweets.data:
+            self.invalidate_user_id(target)
+        return tweets
+    
     def get_latest_tweet(self, username=None):
         """Retrieve the latest tweet from a Twitter account"""
         target = username or self.target_account
@@ -36,35 +174,24 @@ class TwitterScraper:
                 logger.error("Twitter client not initialized")
                 return None
             
+            with self.stats_lock:
+                self.poll_count += 1
+            
             # Get user information
-            user = self.client.get_user(username=target)
-            if not user or not user.data:
+            user_id = self.get_user_id(target)
+            if not user_id:
                 logger.error(f"Twitter user {target} not found")
                 return None
             
-            user_id = user.data.id
-            
             # Get user tweets (max 10, we'll take the first one)
-            tweets = self.client.get_users_tweets(
-                id=user_id,
-                max_results=10,
-                tweet_fields=["created_at", "text", "public_metrics"]
-            )
+            tweets = self._fetch_users_tweets(target, user_id, max_results=10)
             
             if not tweets or not tweets.data:
                 logger.warning(f"No tweets found for user {target}")
                 return None
             
             # Take the most recent tweet
-            latest_tweet = tweets.data[0]
-            
-            # Format tweet data
-            tweet_data = {
-                "id": latest_tweet.id,
-                "text": latest_tweet.text,
-                "created_at": latest_tweet.created_at.isoformat(),
-                "metrics": latest_tweet.public_metrics if hasattr(latest_tweet, "public_metrics") else {}
-            }
+            tweet_data = format_tweet(tweets.data[0], target)
             
             logger.info(f"Tweet retrieved for {target}: {tweet_data['text'][:50]}...")
             return tweet_data
@@ -73,6 +200,70 @@ class TwitterScraper:
             logger.error(f"Error retrieving tweet for {target}: {str(e)}")
             return None
     
+    def get_new_tweets(self, username=None, since_id=None, max_pages=5):
+        """
+        Retrieve every tweet posted after since_id, oldest first
+        
+        Without since_id, only the most recent tweet is returned, so that the caller
+        can start its cursor from it instead of processing the account's history.
+        
+        Args:
+            username (str): The account to fetch (defaults to the target account)
+            since_id (int): ID of the last tweet already processed
+            max_pages (int): Maximum number of result pages fetched in one call
+            
+        Returns:
+            list: The new tweets in chronological order, or None on error
+        """
+        target = username or self.target_account
+        
+        try:
+            if not self.client:
+                logger.error("Twitter client not initialized")
+                return None
+            
+            with self.stats_lock:
+                self.poll_count += 1
+            
+            user_id = self.get_user_id(target)
+            if not user_id:
+                logger.error(f"Twitter user {target} not found")
+                return None
+            
+            if not since_id:
+                tweets = self._fetch_users_tweets(target, user_id, max_results=5)
+                return [format_tweet(tweets.data[0], target)] if tweets and tweets.data else []
+            
+            new_tweets = []
+            pagination_token = None
+            for _ in range(max_pages):
+                params = {"since_id": since_id, "max_results": 100}
+                if pagination_token:
+                    params["pagination_token"] = pagination_token
+                tweets = self._fetch_users_tweets(target, user_id, **params)
+                if not tweets or not tweets.data:
+                    break
+                new_tweets.extend(tweets.data)
+                pagination_token = (tweets.meta or {}).get("next_token")
+                if not pagination_token:
+                    break
+            else:
+                logger.warning(f"More than {max_pages} pages of new tweets for {target}, older ones are skipped")
+            
+            # The API returns the most recent tweets first
+            new_tweets = sorted(new_tweets, key=lambda tweet: tweet.id)
+            if new_tweets:
+                logger.info(f"{len(new_tweets)} new tweet(s) retrieved for {target}")
+            return [format_tweet(tweet, target) for tweet in new_tweets]
+            
+        except tweepy.errors.TooManyRequests:
+            # The scheduler reads the reset time from the headers and waits for it
+            logger.warning(f"Twitter rate limit reached while polling {target}")
+            return None
+        except Exception as e:
+            logger.error(f"Error retrieving new tweets for {target}: {str(e)}")
+            return None
+    
     def test_connection(self):
         """Test the connection to the Twitter API"""
         try:
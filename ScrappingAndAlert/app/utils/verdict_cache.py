@@ -0,0 +1,184 @@
+"""
+LRU/TTL cache of hack verdicts, keyed by normalized tweet text and persisted to disk
+"""
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from loguru import logger
+
+RETWEET_PREFIX = re.compile(r"^\s*rt\s+@\w+:\s*", re.IGNORECASE)
+URLS = re.compile(r"https?://\S+", re.IGNORECASE)
+MENTIONS = re.compile(r"@\w+")
+NON_WORDS = re.compile(r"[^\w]+")
+
+
+def normalize_tweet_text(text):
+    """
+    Reduce a tweet to the words that decide the verdict
+
+    Retweet prefixes, URLs (t.co links differ for every copy), mentions, case,
+    punctuation and spacing are removed, so retweets and cross-posts of the same
+    announcement share one key.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = RETWEET_PREFIX.sub("", text)
+    text = URLS.sub(" ", text)
+    text = MENTIONS.sub(" ", text)
+    return NON_WORDS.sub(" ", text.casefold()).strip()
+
+
+def verdict_key(text):
+    """Content hash of the normalized text"""
+    return hashlib.sha256(normalize_tweet_text(text).encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """
+    Thread-safe LRU cache of verdicts with a TTL, saved to a JSON file
+
+    put() only marks the cache dirty: a background thread writes it at most once
+    every flush_interval, so no file is written on the alert path. Pending verdicts
+    are also written when the process exits.
+    """
+
+    def __init__(self, path="verdict_cache.json", max_size=10000, ttl=7 * 24 * 3600, flush_interval=5.0):
+        """
+        Args:
+            path (str): File the cache is persisted to (None to keep it in memory only)
+            max_size (int): Maximum number of verdicts kept, least recently used evicted first
+            ttl (float): Lifetime of a verdict in seconds
+            flush_interval (float): Delay in seconds between a new verdict and the write that saves it
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (verdict, stored_at)
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.saves = 0
+        self.wakeup = threading.Event()
+        self._load()
+
+        if self.path:
+            thread = threading.Thread(target=self._flush_loop, name="verdict-cache")
+            thread.daemon = True
+            thread.start()
+            atexit.register(self.flush)
+
+    def get(self, text):
+        """
+        Return the cached verdict of a tweet
+
+        Returns:
+            bool: The verdict, or None if the tweet (or an equivalent one) was never analyzed
+        """
+        key = verdict_key(text)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, text, verdict):
+        """Store the verdict of a tweet (written to disk in the background)"""
+        with self.lock:
+            key = verdict_key(text)
+            self.entries[key] = (bool(verdict), time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            self.dirty = True
+        self.wakeup.set()
+
+    def flush(self):
+        """Write the cache now if it changed since the last write"""
+        # Writes are serialized, and each one saves a snapshot at least as recent as the previous
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                snapshot = list(self.entries.items())
+                self.dirty = False
+            if not self._save(snapshot):
+                with self.lock:
+                    self.dirty = True
+
+    def _flush_loop(self):
+        """Write the cache flush_interval after the first verdict that changed it"""
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def get_stats(self):
+        """Return the cache size, hits, misses and hit rate"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "saves": self.saves,
+                "dirty": self.dirty
+            }
+
+    def _load(self):
+        """Load the verdicts that have not expired yet"""
+        if not self.path or not Path(self.path).exists():
+            return
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+            now = time.time()
+            for key, (verdict, stored_at) in stored:
+                if now - stored_at <= self.ttl:
+                    self.entries[key] = (verdict, stored_at)
+            logger.info(f"{len(self.entries)} cached verdicts loaded from {self.path}")
+        except Exception as e:
+            logger.warning(f"Unable to load the verdict cache: {str(e)}")
+
+    def _save(self, snapshot):
+        """
+        Write the cache to a uniquely named temporary file then rename it, so a crash
+        never leaves a torn file
+
+        Returns:
+            bool: True if the cache was written
+        """
+        if not self.path:
+            return True
+        temp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            with tempfile.NamedTemporaryFile("w", dir=directory, prefix=f"{os.path.basename(self.path)}.",
+                                             suffix=".tmp", delete=False) as f:
+                temp_path = f.name
+                json.dump(snapshot, f)
+            os.replace(temp_path, self.path)
+            self.saves += 1
+            return True
+        except Exception as e:
+            logger.warning(f"Unable to save the verdict cache: {str(e)}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark - detection latency of fixed and adaptive polling under the same API budget
+
+Accounts tweet at very different rates (a few busy accounts, a long tail of quiet
+ones) and one account posts a burst of hack tweets halfway through. The fake API
+enforces a quota per window, reports it in the same form as the x-rate-limit-*
+headers, and another consumer of the same token uses --external of the quota, so
+a scheduler that ignores the headers runs into 429s. Windows and the activity
+half-life are scaled down so a run takes seconds.
+
+Usage: python benchmarks/adaptive_polling.py [--accounts 40] [--budget 20] [--duration 20]
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+
+from app.utils.tweet_sources import PollingSource
+
+
+class FakeTwitterApi:
+    """Serves the tweets posted so far and enforces a per-window quota, after a simulated round-trip"""
+
+    def __init__(self, tweets, limit, window, external, api_latency):
+        self.tweets = tweets  # account -> [(id, posted_at, is_hack)] in posting order
+        self.limit = limit
+        self.window = window
+        self.external = external
+        self.api_latency = api_latency
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.used = 0
+        self.requests = 0
+        self.rejected = 0
+
+    def _remaining(self, now):
+        """Quota left in the current window (called under the lock)"""
+        if now >= self.window_start + self.window:
+            self.window_start += self.window * int((now - self.window_start) // self.window)
+            self.used = 0
+        # The other consumer spends its share evenly over the window
+        external_used = self.external * self.limit * (now - self.window_start) / self.window
+        return max(0, int(self.limit - self.used - external_used))
+
+    def get_new_tweets(self, username, since_id=None):
+        time.sleep(self.api_latency)
+        with self.lock:
+            self.requests += 1
+            if self._remaining(time.time()) <= 0:
+                self.rejected += 1
+                return None
+            self.used += 1
+        now = time.monotonic()
+        return [
+            {"id": tweet_id, "text": "hack" if is_hack else "gm", "author": username, "posted_at": posted_at}
+            for tweet_id, posted_at, is_hack in self.tweets[username]
+            if posted_at <= now and tweet_id > (since_id or 0)
+        ]
+
+    def get_rate_limit(self):
+        with self.lock:
+            now = time.time()
+            remaining = self._remaining(now)
+            return self.limit, remaining, self.window_start + self.window
+
+
+def make_tweets(accounts, args, start):
+    """Poisson tweets per account, with Pareto-distributed rates, plus a burst of hack tweets"""
+    rng = random.Random(args.seed)
+    posts = []
+    for account in accounts:
+        rate = args.base_rate * rng.paretovariate(1.2)
+        posted_at = start + rng.expovariate(rate)
+        while posted_at < start + args.duration:
+            posts.append((posted_at, account, False))
+            posted_at += rng.expovariate(rate)
+    hacked = accounts[-1]
+    for i in range(args.hack_tweets):
+        posts.append((start + args.duration / 2 + i * 0.5, hacked, True))
+
+    tweets = {account: [] for account in accounts}
+    for tweet_id, (posted_at, account, is_hack) in enumerate(sorted(posts), start=1):
+        tweets[account].append((tweet_id, posted_at, is_hack))
+    return tweets
+
+
+def run(adaptive, args):
+    """Poll every account for args.duration seconds, return the latencies and the fake API"""
+    accounts = [f"account_{i}" for i in range(args.accounts)]
+    start = time.monotonic()
+    tweets = make_tweets(accounts, args, start)
+    api = FakeTwitterApi(tweets, int(args.budget * args.window), args.window, args.external, args.api_latency)
+    cursors = {}
+    latencies = {"all": [], "hack": []}
+    lock = threading.Lock()
+    source = None
+
+    def on_tweet(tweet):
+        with lock:
+            latencies["all"].append(time.monotonic() - tweet["posted_at"])
+            cursors[tweet["author"]] = max(tweet["id"], cursors.get(tweet["author"], 0))
+            if tweet["text"] == "hack":
+                latencies["hack"].append(time.monotonic() - tweet["posted_at"])
+        if tweet["text"] == "hack":
+            source.record_signal(tweet["author"])
+
+    source = PollingSource(
+        on_tweet,
+        api,
+        get_since_id=lambda account: cursors.get(account),
+        get_accounts=lambda: accounts,
+        # Fixed mode: the interval that spends the whole budget evenly
+        interval=args.min_interval if adaptive else args.accounts / args.budget,
+        max_workers=args.workers,
+        requests_per_window=int(args.budget * args.window),
+        window=args.window,
+        adaptive=adaptive,
+        max_interval=args.accounts / args.budget * 10
+    )
+    source.policy.half_life = args.half_life
+    source.start()
+    # Keep polling after the last post so slow-polled accounts get counted too
+    time.sleep(args.duration + args.tail)
+    source.stop()
+    total = sum(len(account_tweets) for account_tweets in tweets.values())
+    return latencies, api, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=40)
+    parser.add_argument("--budget", type=float, default=20.0, help="API requests per second shared by all accounts")
+    parser.add_argument("--window", type=float, default=10.0, help="Rate-limit window in seconds")
+    parser.add_argument("--external", type=float, default=0.3, help="Share of the quota used by another consumer")
+    parser.add_argument("--min-interval", type=float, default=0.2, help="Shortest poll interval in adaptive mode")
+    parser.add_argument("--half-life", type=float, default=10.0, help="Half-life of account activity in seconds")
+    parser.add_argument("--base-rate", type=float, default=0.05, help="Tweets per second of the quietest accounts")
+    parser.add_argument("--hack-tweets", type=int, default=5, help="Hack tweets posted by one account halfway through")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Simulated API response time in seconds")
+    parser.add_argument("--workers", type=int, default=16, help="Size of the poll worker pool")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of polling per mode")
+    parser.add_argument("--tail", type=float, default=10.0, help="Seconds of polling after the last post")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"accounts={args.accounts}  budget={args.budget} req/s  external={args.external:.0%}  duration={args.duration}s")
+    print(f"{'mode':>9} {'tweets':>7} {'detected':>9} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'hack_ms':>9} "
+          f"{'requests':>9} {'http_429':>9}")
+    for adaptive in (False, True):
+        latencies, api, total = run(adaptive, args)
+        detected = sorted(latencies["all"]) or [0]
+        p95 = detected[min(len(detected) - 1, int(len(detected) * 0.95))]
+        hack = statistics.mean(latencies["hack"]) * 1000 if latencies["hack"] else float("nan")
+        print(f"{'adaptive' if adaptive else 'fixed':>9} {total:>7} {len(latencies['all']):>9} "
+              f"{statistics.mean(detected) * 1000:>9.0f} {statistics.median(detected) * 1000:>9.0f} "
+              f"{p95 * 1000:>9.0f} {hack:>9.0f} {api.requests:>9} {api.rejected:>9}")
+
+
+if __name__ == "__main__":
+    main()
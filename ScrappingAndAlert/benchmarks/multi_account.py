@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark - per-account detection latency of the polling source as the account count grows
+
+Each simulated account posts one tweet at a random time; the detection latency is the
+delay between the post and the moment the tweet reaches the detection callback.
+The Twitter API is replaced by an in-memory fake with a fixed response time.
+
+Usage: python benchmarks/multi_account.py [--accounts 1 10 100 500] [--budget 60]
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+
+from app.utils.tweet_sources import PollingSource
+
+
+class FakeTwitterScraper:
+    """Serves the tweets posted so far, after a simulated API round-trip"""
+
+    def __init__(self, post_times, api_latency):
+        self.post_times = post_times
+        self.api_latency = api_latency
+
+    def get_new_tweets(self, username, since_id=None):
+        time.sleep(self.api_latency)
+        posted_at = self.post_times[username]
+        if since_id or time.monotonic() < posted_at:
+            return []
+        return [{"id": 1, "text": "We have been hacked", "author": username, "posted_at": posted_at}]
+
+    def get_rate_limit(self):
+        return None
+
+
+def run(account_count, args):
+    """Poll account_count accounts until every tweet is detected, return the latencies"""
+    start = time.monotonic()
+    accounts = [f"account_{i}" for i in range(account_count)]
+    post_times = {account: start + random.uniform(0, args.duration) for account in accounts}
+    latencies = []
+    detected = set()
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def on_tweet(tweet):
+        with lock:
+            latencies.append(time.monotonic() - tweet["posted_at"])
+            detected.add(tweet["author"])
+            if len(detected) == account_count:
+                done.set()
+
+    source = PollingSource(
+        on_tweet,
+        FakeTwitterScraper(post_times, args.api_latency),
+        get_since_id=lambda account: 1 if account in detected else None,
+        get_accounts=lambda: accounts,
+        interval=args.interval,
+        max_workers=args.workers,
+        # The budget is given per second, the source expects it per window
+        requests_per_window=args.budget * 900,
+        window=900.0
+    )
+    source.start()
+    done.wait(args.duration + account_count / args.budget + 30)
+    source.stop()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument("--budget", type=float, default=60.0, help="API requests per second shared by all accounts")
+    parser.add_argument("--interval", type=float, default=1.0, help="Poll interval per account in seconds")
+    parser.add_argument("--api-latency", type=float, default=0.1, help="Simulated API response time in seconds")
+    parser.add_argument("--workers", type=int, default=16, help="Size of the poll worker pool")
+    parser.add_argument("--duration", type=float, default=5.0, help="Window during which tweets are posted")
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"budget={args.budget} req/s  interval={args.interval}s  api_latency={args.api_latency * 1000:.0f}ms  workers={args.workers}")
+    print(f"{'accounts':>8} {'detected':>9} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9} {'threads':>8}")
+    for account_count in args.accounts:
+        latencies = sorted(run(account_count, args))
+        if not latencies:
+            print(f"{account_count:>8} {0:>9}")
+            continue
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{account_count:>8} {len(latencies):>9} {statistics.mean(latencies) * 1000:>9.0f} "
+              f"{statistics.median(latencies) * 1000:>9.0f} {p95 * 1000:>9.0f} {latencies[-1] * 1000:>9.0f} "
+              f"{threading.active_count():>8}")
+
+
+if __name__ == "__main__":
+    main()